@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Append-only archive of the retrieved tweets, as NDJSON files (one JSON document per
+line), to feed other programs without dumping the whole Scraper.scraped_info every time.
+"""
+import logging \
+    , gzip \
+    , io \
+    , json \
+    , os \
+    , re \
+    , threading \
+    , time \
+    , zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+"""
+Extension of the files for each compression method
+"""
+EXTENSIONS = { None: ".ndjson", "gzip": ".ndjson.gz", "zstd": ".ndjson.zst" }
+
+
+def open_archive (path, mode):
+    """
+    Opens an archive file, with the compression given by its extension
+
+    Args:
+        -> path: Path of the file
+
+        -> mode: "rb" or "wb"
+
+    Returns:
+        -> A binary file object
+    """
+    if path.endswith (EXTENSIONS ["gzip"]):
+        return gzip.open (path, mode)
+
+    if path.endswith (EXTENSIONS ["zstd"]):
+        if not zstandard:
+            raise ValueError ("The module 'zstandard' is needed to open " + path)
+
+        if mode == "wb":
+            return zstandard.ZstdCompressor ().stream_writer (open (path, "wb"))
+
+        return io.BufferedReader (
+                    zstandard.ZstdDecompressor ().stream_reader (open (path, "rb"))
+        )
+
+    return open (path, mode)
+
+
+class ArchiveWriter:
+    """
+    Writes each tweet as a line of the current file on 'directory', with the format:
+        {"screen_name": <user from whose timeline it was retrieved>, "tweet": {...}}
+
+    The lines are kept on memory until there are 'buffer_size' bytes of them (or flush()
+    is called), so the disk is written in big chunks. The files are never modified once
+    they're closed: a new one is started when the current one reaches 'max_bytes'
+    (uncompressed) or 'max_age' seconds.
+
+    The files are named '<prefix>-<creation date (UTC)>-<sequence>.ndjson', plus '.gz'
+    or '.zst' if they are compressed, so their alphabetical order is also the order in
+    which they were written.
+    """
+
+    """
+    Uncompressed bytes after which a new file is started
+    """
+    max_bytes = 64 * 1024 * 1024
+
+    """
+    Seconds after which a new file is started
+    """
+    max_age = 24 * 60 * 60
+
+    """
+    Bytes to keep on memory before writing them to the file
+    """
+    buffer_size = 256 * 1024
+
+    def __init__ (self, directory, prefix = "tweets", compression = None
+                    , max_bytes = None, max_age = None, buffer_size = None):
+        """
+        Args:
+            -> directory: Directory where the files are created
+
+            -> prefix (optional): Start of the name of the files
+
+            -> compression (optional): None, "gzip" or "zstd" (only if the module
+                    'zstandard' is installed; otherwise, gzip is used)
+
+            -> max_bytes (optional): Uncompressed bytes on each file
+
+            -> max_age (optional): Seconds to keep writing on each file
+
+            -> buffer_size (optional): Bytes to keep on memory before writing them
+        """
+        logger = logging.getLogger (__name__ + ".ArchiveWriter")
+
+        if compression not in EXTENSIONS:
+            raise ValueError ("Unknown compression: " + str (compression))
+
+        if compression == "zstd" and not zstandard:
+            logger.warning ("Module 'zstandard' not available. Using gzip")
+            compression = "gzip"
+
+        os.makedirs (directory, exist_ok = True)
+
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+
+        if max_age is not None:
+            self.max_age = max_age
+
+        if buffer_size is not None:
+            self.buffer_size = buffer_size
+
+        self.lock = threading.Lock ()
+
+        self.lines = []
+        self.buffered = 0
+
+        # The file is only created when there's something to write on it
+        self.file = None
+        self.path = None
+        self.written = 0
+        self.opened_at = None
+
+
+    def write (self, screen_name, tweets):
+        """
+        Adds the given tweets to the archive
+
+        Args:
+            -> screen_name: User from whose timeline the tweets were retrieved
+
+            -> tweets: List with the tweets (dictionaries or model.Tweet)
+        """
+        lines = []
+        for t in tweets:
+            data = t if isinstance (t, dict) else t.to_dict ()
+            lines.append (
+                json.dumps ({ "screen_name": screen_name, "tweet": data }
+                            , ensure_ascii = False
+                ).encode ("utf-8") + b"\n"
+            )
+
+        with self.lock:
+            self.lines.extend (lines)
+            self.buffered += sum (len (l) for l in lines)
+
+            if self.buffered >= self.buffer_size:
+                self._flush ()
+
+
+    def flush (self):
+        """
+        Writes the buffered lines to the file, so other programs can read them
+        """
+        with self.lock:
+            self._flush ()
+
+
+    def rotate (self):
+        """
+        Closes the current file (after writing the buffered lines). The next lines will
+        be written on a new one
+        """
+        with self.lock:
+            self._flush ()
+            self._close_file ()
+
+
+    def close (self):
+        """
+        Writes the buffered lines and closes the file
+        """
+        self.rotate ()
+
+
+    def __enter__ (self):
+        return self
+
+
+    def __exit__ (self, *exc_info):
+        self.close ()
+
+
+    def _flush (self):
+        """
+        Writes the buffered lines, starting a new file when needed. Must be called with
+        'lock' held
+        """
+        if not self.lines:
+            return
+
+        if self.file and (self.written >= self.max_bytes
+                            or (time.time () - self.opened_at) >= self.max_age):
+            self._close_file ()
+
+        if not self.file:
+            self._open_file ()
+
+        self.file.write (b"".join (self.lines))
+        self.file.flush ()
+
+        self.written += self.buffered
+        self.lines = []
+        self.buffered = 0
+
+
+    def _open_file (self):
+        """
+        Creates a new file, with a name that comes after the ones already written
+        """
+        logger = logging.getLogger (__name__ + ".ArchiveWriter._open_file")
+
+        name = self.prefix + "-" + time.strftime ("%Y%m%dT%H%M%S", time.gmtime ())
+        extension = EXTENSIONS [self.compression]
+
+        # More than one file may be started on the same second
+        n = 0
+        while any (os.path.exists (os.path.join (self.directory
+                                                , "{0}-{1:03d}{2}".format (name, n, e)
+                                    ))
+                    for e in EXTENSIONS.values ()):
+            n += 1
+
+        path = os.path.join (self.directory, "{0}-{1:03d}{2}".format (name, n, extension))
+
+        logger.info ("Writing tweets on " + path)
+
+        self.file = open_archive (path, "wb")
+        self.path = path
+        self.written = 0
+        self.opened_at = time.time ()
+
+
+    def _close_file (self):
+        if self.file:
+            self.file.close ()
+
+        self.file = None
+        self.path = None
+
+
+class ArchiveReader:
+    """
+    Reads the lines of the files written by an ArchiveWriter, in the same order they were
+    written, and keeps the position of the last one processed so, on the next run, it
+    can go on from there (see save()).
+
+    The file being written can also be read: the lines not yet written are just read
+    on the next call.
+    """
+
+    def __init__ (self, directory, prefix = "tweets", state_path = None):
+        """
+        Args:
+            -> directory: Directory with the files
+
+            -> prefix (optional): Start of the name of the files (as on ArchiveWriter)
+
+            -> state_path (optional): File to save the position on, with save(). If it
+                    already exists, the reading starts from the position saved there
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.state_path = state_path
+
+        # Name of the file and uncompressed bytes already processed from it
+        self.position = None
+
+        if state_path and os.path.exists (state_path):
+            with open (state_path) as f:
+                self.position = tuple (json.load (f))
+
+
+    def files (self):
+        """
+        Gets the files of the archive
+
+        Returns:
+            -> A list with their names, from oldest to newest
+        """
+        pattern = re.compile (re.escape (self.prefix) + r"-\d{8}T\d{6}-\d{3}\.ndjson")
+
+        return sorted (f for f in os.listdir (self.directory)
+                        if pattern.match (f)
+                            and any (f.endswith (ext) for ext in EXTENSIONS.values ())
+        )
+
+
+    def __iter__ (self):
+        """
+        Reads the lines after 'position'. Each one is considered processed (and
+        'position' moves past it) once the next one is requested.
+
+        Returns:
+            -> An iterator of tuples (screen_name, tweet)
+        """
+        logger = logging.getLogger (__name__ + ".ArchiveReader")
+
+        for name in self.files ():
+            offset = 0
+
+            if self.position:
+                last_name, last_offset = self.position
+                if name < last_name:
+                    continue
+
+                if name == last_name:
+                    offset = last_offset
+
+            with open_archive (os.path.join (self.directory, name), "rb") as f:
+                # On compressed files, the skipped data still has to be decompressed
+                if offset:
+                    f.seek (offset)
+
+                while True:
+                    try:
+                        line = f.readline ()
+                    except (EOFError, zlib.error):
+                        # A compressed file that is still being written
+                        break
+
+                    # The rest of the line hasn't been written yet
+                    if not line.endswith (b"\n"):
+                        break
+
+                    offset += len (line)
+
+                    try:
+                        data = json.loads (line)
+                    except ValueError:
+                        logger.warning ("Invalid line on " + name + ", before offset "
+                                        + str (offset)
+                        )
+                        self.position = (name, offset)
+                        continue
+
+                    yield (data ["screen_name"], data ["tweet"])
+
+                    self.position = (name, offset)
+
+
+    def save (self):
+        """
+        Saves 'position' on 'state_path', to go on from there on the next run
+        """
+        if not self.state_path or not self.position:
+            return
+
+        # Replaces the file at once, so it's never left half-written
+        tmp_path = self.state_path + ".tmp"
+        with open (tmp_path, "w") as f:
+            json.dump (list (self.position), f)
+
+        os.replace (tmp_path, self.state_path)
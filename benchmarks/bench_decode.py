@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compares the time and memory needed to decode (and parse) a timeline response with each
+of the JSON libraries installed, with and without the info removed by 'projection'.
+
+Usage:
+    python3 benchmarks/bench_decode.py [recorded_response.json]
+
+Without a recorded response, a synthetic one is generated (see bench_parse.py), with
+entities, media and cards on every tweet. The "projected" version is always obtained by
+removing those from the response.
+"""
+import os \
+    , sys \
+    , json
+
+sys.path.insert (0, os.path.join (os.path.dirname (os.path.abspath (__file__)), ".."))
+
+import scraper \
+    , json_decoder
+
+from bench_parse import synthetic_response, measure
+
+
+"""
+Keys of each tweet that aren't sent when 'projection' is set
+"""
+PROJECTED_KEYS = ("entities", "extended_entities", "card", "ext", "ext_alt_text")
+
+
+def add_unused_info (response):
+    """
+    Adds to each tweet the kind of info that the scraper doesn't use
+    """
+    for tweet_id, tweet in response ["globalObjects"]["tweets"].items ():
+        tweet ["entities"] = {
+            "hashtags": [ { "text": "tag", "indices": [0, 4] } ]
+            , "urls": [ { "url": "https://t.co/x", "expanded_url": "https://example.com"
+                        , "display_url": "example.com", "indices": [5, 20] } ]
+            , "user_mentions": [ { "screen_name": "someone", "id_str": "2"
+                                , "indices": [21, 29] } ]
+        }
+        tweet ["extended_entities"] = { "media": [ {
+            "id_str": tweet_id, "media_url_https": "https://pbs.example.com/" + tweet_id
+            , "type": "photo", "sizes": { s: { "w": 1200, "h": 800, "resize": "fit" }
+                                            for s in ("thumb", "small", "medium", "large")
+            }
+            , "ext_media_color": { "palette": [ { "rgb": { "red": 1, "green": 2
+                                                            , "blue": 3 }
+                                                , "percentage": 50.0 } ] * 5 }
+        } ] }
+        tweet ["card"] = { "name": "summary", "binding_values": {
+            k: { "type": "STRING", "string_value": "value " * 5 }
+            for k in ("title", "description", "domain", "vanity_url", "card_url")
+        } }
+
+    return response
+
+
+def project (response):
+    """
+    Removes the keys that aren't sent when 'projection' is set
+    """
+    for tweet in response ["globalObjects"]["tweets"].values ():
+        for k in PROJECTED_KEYS:
+            tweet.pop (k, None)
+
+    return response
+
+
+if __name__ == "__main__":
+    if len (sys.argv) > 1:
+        with open (sys.argv [1], "rb") as in_file:
+            full = in_file.read ()
+    else:
+        full = json.dumps (add_unused_info (synthetic_response ())).encode ()
+
+    projected = json.dumps (project (json.loads (full))).encode ()
+
+    print ("Full response: {0:.1f} KiB; projected: {1:.1f} KiB\n".format (
+                len (full) / 1024
+                , len (projected) / 1024
+        )
+    )
+
+    sc = scraper.Scraper (token_cache = False, profile_cache = False
+                        , response_cache = False, rate_limiter = False, breaker = False
+    )
+    username = "bench"
+    sc.scraped_info [username] = {
+        "id": "VXNlcjox", "rest_id": "1", "screen_name": username, "name": "Bench"
+        , "profile_image_url": "https://example.com/1"
+    }
+
+    for name, loads in json_decoder.BACKENDS.items ():
+        for label, document in (("full", full), ("projected", projected)):
+            measure (name + " " + label, lambda: loads (document))
+            measure (name + " " + label + " + parse"
+                    , lambda: sc.parse_timeline (username, loads (document))
+            )
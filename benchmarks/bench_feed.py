@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compares the time and memory needed to print the tweets of many users as a single
+chronological feed: the previous cli.print_tweets (a list with every tweet, sorted, and
+each message built by concatenation and printed on its own) against
+feed.merge_timelines + feed.FeedWriter, on each of its formats.
+
+Usage:
+    python3 benchmarks/bench_feed.py [number_of_users] [tweets_per_user]
+
+The output is written to os.devnull, so only the work to produce it is measured.
+"""
+import os \
+    , sys
+
+from datetime import datetime
+
+sys.path.insert (0, os.path.join (os.path.dirname (os.path.abspath (__file__)), ".."))
+
+import feed
+
+from bench_parse import measure
+
+
+def synthetic_timelines (n_users, n_tweets):
+    """
+    Generates the timelines of 'n_users' users, with 'n_tweets' tweets each, ordered
+    from newest to oldest (like the ones on Scraper.scraped_info)
+    """
+    timelines = {}
+
+    for u in range (n_users):
+        username = "user" + str (u)
+        user = { "username": username, "displayname": "User " + str (u)
+                , "uid": str (u), "avatar": None
+        }
+
+        timelines [username] = [ {
+                "tweet_id": str (1000000 + i * n_users + u)
+                , "permalink": "https://twitter.com/" + username + "/status/"
+                                + str (1000000 + i * n_users + u)
+                , "stats": { "likes": i, "retweets": u, "replies": 0 }
+                , "text": "Tweet " + str (i) + " from " + username + " " + "lorem " * 20
+                , "tweet_age": 1600000000 + i * 60 + u
+                , "pinned": False
+                , "user": user
+                , "retweet": False
+            }
+            for i in reversed (range (n_tweets))
+        ]
+
+    return timelines
+
+
+def legacy_print (timelines, out):
+    """
+    The previous cli.sort_tweets + cli.print_tweets (with a key instead of the 'cmp'
+    that Python 3 no longer accepts)
+    """
+    all_tweets = []
+    for x in timelines.values ():
+        all_tweets += x
+
+    for tweet in sorted (all_tweets, key = lambda t: t ["tweet_age"]):
+        msg = u"{}\n".format ("=" * 100)
+        msg += u"\n## [{0}]({1}) \n".format (tweet ["tweet_id"], tweet ["permalink"])
+
+        if tweet ["pinned"]:
+            msg += u"Pinned tweet\n"
+
+        if tweet ["retweet"]:
+            msg += u"Retweet from {}\n".format (tweet ["retweet_info"]["retweeter"])
+
+        msg += u"User: {0} [@{2}]({1}/{2})\n".format (tweet ["user"]["displayname"]
+                                                    , "https://twitter.com"
+                                                    , tweet ["user"]["username"]
+        )
+        msg += u"Date: {0}\n".format (str (datetime.fromtimestamp (tweet ["tweet_age"])))
+        msg += u"\n\t{0}\n{1}\n\t{0}\n".format ("-" * 100, "\t" + tweet ["text"])
+        msg += u"\t{0} replies  - {1} retweets  - {2} likes\n".format (
+                        tweet ["stats"]["replies"]
+                        , tweet ["stats"]["retweets"]
+                        , tweet ["stats"]["likes"]
+        )
+
+        print (msg, file = out)
+
+
+def feed_print (timelines, out, fmt):
+    """
+    Prints the feed with feed.FeedWriter
+    """
+    writer = feed.FeedWriter (out, fmt, render = lambda t: "\t" + t ["text"])
+    writer.write_all (feed.merge_timelines (timelines))
+    writer.flush ()
+
+
+if __name__ == "__main__":
+    n_users = int (sys.argv [1]) if len (sys.argv) > 1 else 100
+    n_tweets = int (sys.argv [2]) if len (sys.argv) > 2 else 1000
+
+    timelines = synthetic_timelines (n_users, n_tweets)
+    print ("Printing " + str (n_users * n_tweets) + " tweets from " + str (n_users)
+            + " users\n"
+    )
+
+    with open (os.devnull, "w") as out:
+        measure ("Previous print_tweets", lambda: legacy_print (timelines, out)
+                , repeat = 3
+        )
+
+        for fmt in feed.FORMATS:
+            measure ("FeedWriter (" + fmt + ")"
+                    , lambda: feed_print (timelines, out, fmt)
+                    , repeat = 3
+            )
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compares the time and memory needed to parse a timeline response by converting every
+tweet on "globalObjects" (as it was done before) against converting only those on the
+timeline (Scraper.parse_timeline).
+
+Usage:
+    python3 benchmarks/bench_parse.py [recorded_response.json [username]]
+
+Without a recorded response, a synthetic one is generated, where most of the tweets on
+"globalObjects" are retweeted or quoted tweets that aren't on the timeline.
+"""
+import os \
+    , sys \
+    , json \
+    , time \
+    , tracemalloc
+
+from datetime import datetime
+
+sys.path.insert (0, os.path.join (os.path.dirname (os.path.abspath (__file__)), ".."))
+
+import scraper
+
+
+def synthetic_response (n_entries = 2000, extra_per_entry = 3):
+    """
+    Generates a timeline response with 'n_entries' tweets on the timeline and
+    'extra_per_entry' tweets (quoted or retweeted) outside of it for each one
+    """
+    tweets = {}
+    users = {}
+    entries = []
+    next_id = 10 ** 18
+
+    for i in range (n_entries):
+        entry_id = str (next_id + i)
+        tweet = {
+            "created_at": "Wed Oct 10 20:19:24 +0000 2018"
+            , "full_text": "Tweet number " + str (i) + " " + "lorem ipsum " * 10
+            , "favorite_count": i, "retweet_count": i, "reply_count": i
+            , "conversation_id_str": entry_id
+            , "user_id_str": "1"
+            , "entities": { "hashtags": [], "urls": [], "user_mentions": [] }
+        }
+
+        for j in range (extra_per_entry):
+            extra_id = str (next_id + n_entries * (j + 1) + i)
+            extra_user = str (100 + (i + j) % 50)
+            users [extra_user] = {
+                "id_str": extra_user, "name": "User " + extra_user
+                , "screen_name": "user" + extra_user
+                , "profile_image_url_https": "https://example.com/" + extra_user
+            }
+            tweets [extra_id] = dict (tweet
+                                    , conversation_id_str = extra_id
+                                    , user_id_str = extra_user
+            )
+
+            if j == 0 and i % 2:
+                tweet ["retweeted_status_id_str"] = extra_id
+            elif j == 1:
+                tweet ["quoted_status_id_str"] = extra_id
+
+        tweets [entry_id] = tweet
+        entries.append ({ "content": { "item": { "content": {
+            "tweet": { "id": entry_id }
+        }}}})
+
+    entries.append ({ "content": { "operation": { "cursor": {
+        "value": "top", "cursorType": "Top"
+    }}}})
+    entries.append ({ "content": { "operation": { "cursor": {
+        "value": "bottom", "cursorType": "Bottom"
+    }}}})
+
+    users ["1"] = { "id_str": "1", "name": "Bench", "screen_name": "bench" }
+
+    return {
+        "globalObjects": { "tweets": tweets, "users": users }
+        , "timeline": { "instructions": [ { "addEntries": { "entries": entries } } ] }
+    }
+
+
+def parse_eager (sc, username, response):
+    """
+    The previous algorithm: converts every tweet on "globalObjects", and then orders
+    them according to the timeline
+    """
+    elems = response ["globalObjects"]["tweets"]
+    user = sc.scraped_info [username]
+    tweets = {}
+
+    for k in elems:
+        tweets [k] = {
+            "tweet_id": k
+            , "profile_pic": None
+            , "permalink": "https://twitter.com/" + username + "/status/" + k
+            , "stats": {
+                  "likes": elems [k]["favorite_count"]
+                , "retweets": elems [k]["retweet_count"]
+                , "replies": elems [k]["reply_count"]
+            }
+            , "text": elems [k]["full_text"]
+            , "tweet_age": int (datetime.strptime (elems [k]["created_at"]
+                                                    , sc.date_format
+                                ).timestamp ())
+            , "pinned": False
+            , "conversation": elems [k]["conversation_id_str"]
+            , "user": {
+                  "username": user ["screen_name"]
+                , "displayname": user ["name"]
+                , "uid": user ["id"]
+                , "avatar": user ["profile_image_url"]
+            }
+            , "retweet": False
+        }
+
+    timeline = []
+    for x in response ["timeline"]["instructions"][0]["addEntries"]["entries"]:
+        content = x ["content"]
+        if "operation" not in content:
+            searched_id = content ["item"]["content"]["tweet"]["id"]
+            if searched_id in tweets:
+                timeline.append (tweets [searched_id])
+
+    return timeline
+
+
+def measure (name, function, repeat = 5):
+    """
+    Prints the best time of 'repeat' runs of the function, and its allocation peak
+    """
+    times = []
+    for _ in range (repeat):
+        start = time.perf_counter ()
+        function ()
+        times.append (time.perf_counter () - start)
+
+    tracemalloc.start ()
+    result = function ()
+    _, peak = tracemalloc.get_traced_memory ()
+    tracemalloc.stop ()
+
+    print ("{0:<28} {1:>10.2f} ms {2:>12.1f} KiB".format (name
+                                                        , min (times) * 1000
+                                                        , peak / 1024
+            )
+    )
+    return result
+
+
+if __name__ == "__main__":
+    username = "bench"
+
+    if len (sys.argv) > 1:
+        with open (sys.argv [1], "r") as in_file:
+            response = json.load (in_file)
+
+        username = sys.argv [2] if len (sys.argv) > 2 else username
+    else:
+        response = synthetic_response ()
+
+    print ("Tweets on globalObjects: {0}; entries on the timeline: {1}\n".format (
+                len (response ["globalObjects"]["tweets"])
+                , len (response ["timeline"]["instructions"][0]["addEntries"]["entries"])
+        )
+    )
+
+    sc = scraper.Scraper (token_cache = False, profile_cache = False
+                        , response_cache = False, rate_limiter = False, breaker = False
+    )
+    sc.scraped_info [username] = {
+        "id": "VXNlcjox", "rest_id": "1", "screen_name": username, "name": "Bench"
+        , "profile_image_url": "https://example.com/1"
+    }
+
+    measure ("eager (all globalObjects)", lambda: parse_eager (sc, username, response))
+    measure ("parse_timeline", lambda: sc.parse_timeline (username, response))
+
+    sc.compact = True
+    measure ("parse_timeline (compact)", lambda: sc.parse_timeline (username, response))
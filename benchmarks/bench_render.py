@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compares the time needed to render the text of the tweets with the previous pipeline of
+cli.format_tweet (several re.sub calls and, to strip the formatting, markdown ->
+BeautifulSoup -> html2text) against render.render_text (a single pass with precompiled
+patterns) and render.TweetRenderer (the same, remembering the results).
+
+Usage:
+    python3 benchmarks/bench_render.py [number_of_tweets]
+
+The previous pipeline to strip the formatting needs 'markdown', 'html2text' and 'lxml';
+if they're not installed, only its first part (the mentions and hashtags) is measured.
+"""
+import os \
+    , re \
+    , sys \
+    , time
+
+sys.path.insert (0, os.path.join (os.path.dirname (os.path.abspath (__file__)), ".."))
+
+import render
+
+
+def synthetic_texts (n_tweets):
+    """
+    Generates the text of 'n_tweets' tweets, with mentions, hashtags, links, pictures
+    and HTML entities
+    """
+    return [ ("Tweet " + str (i) + " from [~~@~~**user" + str (i % 50) + "**](/user"
+                + str (i % 50) + ") about [~~#~~**topic**](/hashtag/topic) &amp; more: "
+                + "[example.com/page](https://t.co/x" + str (i) + ") "
+                + "![pic.twitter.com/abc" + str (i) + "](https://pbs.example.com/img) "
+                + "lorem ipsum " * 5 + "\n\n"
+            )
+            for i in range (n_tweets)
+    ]
+
+
+def legacy_format (text, add_tabs = False, strip = False):
+    """
+    The previous cli.format_tweet
+    """
+    text = re.sub (r"\[~~@~~\*\*([^*]+)\*\*\]\(([^)]+)\)"
+                    , r"[@\1](https://twitter.com\2)"
+                    , text
+        )
+    text = re.sub (r"\[~~#~~\*\*([^*]+)\*\*\]\(([^)]+)\)"
+                    , r"[#\1](https://twitter.com\2)"
+                    , text
+        )
+
+    if strip:
+        from markdown import markdown
+        from bs4 import BeautifulSoup
+        import html2text
+
+        parsed = BeautifulSoup (markdown (text), "lxml")
+
+        for t in parsed.select ("a"):
+            link = re.sub ("\n", "", t.text)
+            t.replace_with (parsed.new_string (
+                (" https://" if re.search ("pic.twitter.com/.+", link) else " ")
+                + link + " "
+            ))
+
+        for t in parsed.select ("img"):
+            alt = re.sub ("\n", "", t ["alt"])
+            t.replace_with (parsed.new_string (
+                (" https://" if re.search ("pic.twitter.com/.+", alt) else " ")
+                + alt + " "
+            ))
+
+        text = html2text.html2text (parsed.get_text (), bodywidth = 140)
+
+    text = re.sub ("\n+$", "", text)
+
+    if add_tabs:
+        text = re.sub (r"^", r"\t", text)
+        text = re.sub (r"\n", r"\n\t", text)
+
+    return text
+
+
+def measure (label, func, texts, repeat = 1):
+    """
+    Runs 'func' over every text 'repeat' times and prints the time per tweet
+    """
+    start = time.perf_counter ()
+
+    for _ in range (repeat):
+        for i, text in enumerate (texts):
+            func (i, text)
+
+    elapsed = time.perf_counter () - start
+    print ("{0:<45} {1:>10.2f} us/tweet".format (label
+                                                , elapsed * 1e6 / (len (texts) * repeat)
+            )
+    )
+
+
+if __name__ == "__main__":
+    n_tweets = int (sys.argv [1]) if len (sys.argv) > 1 else 10000
+    texts = synthetic_texts (n_tweets)
+
+    print ("Rendering " + str (n_tweets) + " tweets\n")
+
+    measure ("Previous pipeline (markdown, indented)"
+            , lambda i, t: legacy_format (t, add_tabs = True)
+            , texts
+    )
+    measure ("render_text (markdown_indented)"
+            , lambda i, t: render.render_text (t, "markdown_indented")
+            , texts
+    )
+
+    try:
+        legacy_format ("", strip = True)
+        measure ("Previous pipeline (plain, indented)"
+                , lambda i, t: legacy_format (t, add_tabs = True, strip = True)
+                , texts
+        )
+    except ImportError as e:
+        print ("Previous pipeline (plain, indented)".ljust (45)
+                + " skipped: " + str (e)
+        )
+
+    measure ("render_text (plain_indented)"
+            , lambda i, t: render.render_text (t, "plain_indented")
+            , texts
+    )
+
+    # Each tweet is usually rendered more than once (the terminal and a notification)
+    renderer = render.TweetRenderer (cache_size = n_tweets)
+    tweets = [ { "tweet_id": str (i), "text": t } for i, t in enumerate (texts) ]
+
+    measure ("TweetRenderer (plain_indented, 3 times each)"
+            , lambda i, t: renderer.render (tweets [i], "plain_indented")
+            , texts
+            , repeat = 3
+    )
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measures the time needed to search the tweets with search_index.TweetIndex, with and
+without filters by users and time range, and checks its results against a linear scan.
+
+Usage:
+    python3 benchmarks/bench_search.py [number_of_tweets] [number_of_users]
+"""
+import os \
+    , random \
+    , sys \
+    , time
+
+sys.path.insert (0, os.path.join (os.path.dirname (os.path.abspath (__file__)), ".."))
+
+import search_index
+
+
+"""
+Words of the synthetic tweets: a few very common ones, and many rare ones
+"""
+COMMON = ["the", "news", "of", "a", "and", "to", "in", "is"]
+RARE = [ "word" + str (i) for i in range (5000) ]
+
+
+def synthetic_timelines (n_tweets, n_users, start = 1500000000):
+    """
+    Generates 'n_tweets' tweets spread among 'n_users' users, one every 10 seconds
+
+    Returns:
+        -> A dictionary with the list of tweets of each user
+    """
+    rnd = random.Random (42)
+    timelines = { "user" + str (u): [] for u in range (n_users) }
+    users = list (timelines)
+
+    for i in range (n_tweets):
+        text = " ".join (rnd.choice (COMMON) for _ in range (6)) + " " \
+                + " ".join (rnd.choice (RARE) for _ in range (3))
+
+        timelines [rnd.choice (users)].append ({ "tweet_id": str (10 ** 15 + i)
+                                                , "tweet_age": start + i * 10
+                                                , "text": text
+        })
+
+    return timelines
+
+
+def linear_search (timelines, query, users = None, since = None, until = None
+                    , limit = None):
+    """
+    Same as TweetIndex.search(), looking at every tweet
+    """
+    words, phrases = search_index.TweetIndex.parse_query (query)
+    found = []
+
+    for user, tweets in timelines.items ():
+        if users is not None and user not in users:
+            continue
+
+        for t in tweets:
+            if (since is not None and t ["tweet_age"] < since) \
+                    or (until is not None and t ["tweet_age"] > until):
+                continue
+
+            tokens = search_index.tokenize (t ["text"])
+            if not words.issubset (tokens):
+                continue
+
+            if not all (search_index.TweetIndex.has_phrase (tokens, p) for p in phrases):
+                continue
+
+            found.append ((t ["tweet_age"], t ["tweet_id"]))
+
+    found.sort (reverse = True)
+    return [ tweet_id for _, tweet_id in found [:limit] ]
+
+
+if __name__ == "__main__":
+    n_tweets = int (sys.argv [1]) if len (sys.argv) > 1 else 1000000
+    n_users = int (sys.argv [2]) if len (sys.argv) > 2 else 1000
+
+    timelines = synthetic_timelines (n_tweets, n_users)
+    end = 1500000000 + n_tweets * 10
+
+    index = search_index.TweetIndex ()
+    start = time.perf_counter ()
+    for user, tweets in timelines.items ():
+        index.add (user, tweets)
+
+    print ("Indexed {0} tweets from {1} users in {2:.1f} s\n".format (
+                n_tweets
+                , n_users
+                , time.perf_counter () - start
+        )
+    )
+
+    some_users = [ "user" + str (u) for u in range (0, n_users, max (1, n_users // 5)) ]
+    day = 24 * 60 * 60
+
+    cases = [
+        ("Common words", { "query": "the news" })
+        , ("Common words, limit 20", { "query": "the news", "limit": 20 })
+        , ("Common words, 5 users", { "query": "the news", "users": some_users })
+        , ("Common words, 5 users, one day", { "query": "the news", "users": some_users
+                                                , "since": end - 2 * day
+                                                , "until": end - day
+        })
+        , ("Phrase, one day", { "query": '"the news"', "since": end - 2 * day
+                                , "until": end - day
+        })
+        , ("Rare word", { "query": "word123" })
+        , ("Rare word, one user", { "query": "word123", "users": some_users [:1] })
+    ]
+
+    for label, kwargs in cases:
+        best = None
+        for _ in range (3):
+            start = time.perf_counter ()
+            results = index.search (**kwargs)
+            elapsed = time.perf_counter () - start
+            best = elapsed if best is None else min (best, elapsed)
+
+        expected = linear_search (timelines, **kwargs)
+        print ("{0:<36} {1:>10.2f} ms {2:>8} found{3}".format (
+                    label
+                    , best * 1000
+                    , len (results)
+                    , "" if [ r ["tweet_id"] for r in results ] == expected
+                        else "  (DIFFERENT FROM THE LINEAR SCAN)"
+            )
+        )
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Location of the files kept between runs (the caches of tokens, profiles and responses),
+and the connection to the SQLite databases shared by the threads of the program.
+"""
+import os \
+    , sqlite3
+
+
+def default_path (name):
+    """
+    Gets the default path of a cache file
+
+    Args:
+        -> name: Name of the file
+
+    Returns:
+        -> The path of 'tweet-feed/<name>' inside $XDG_CACHE_HOME (or ~/.cache)
+    """
+    cache_dir = os.environ.get ("XDG_CACHE_HOME"
+                                , os.path.join (os.path.expanduser ("~"), ".cache")
+    )
+    return os.path.join (cache_dir, "tweet-feed", name)
+
+
+def connect (path, **kwargs):
+    """
+    Opens (and creates, if needed, along with its directory) a SQLite database. The same
+    connection is shared by every thread, so it must be used only while holding a lock
+
+    Args:
+        -> path: Path of the database, or ":memory:"
+
+        -> kwargs: Any other argument accepted by sqlite3.connect()
+
+    Returns:
+        -> The sqlite3.Connection
+    """
+    if path != ":memory:":
+        os.makedirs (os.path.dirname (path) or ".", exist_ok = True)
+
+    return sqlite3.connect (path, check_same_thread = False, **kwargs)
@@ -0,0 +1 @@
+../archive.py
\ No newline at end of file
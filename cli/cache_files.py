@@ -0,0 +1 @@
+../cache_files.py
\ No newline at end of file
@@ -5,28 +5,44 @@
 CLI tool to check for the newest tweets of the users on
 """
 
-import scraper \
-    , logging \
-    , re \
-    , time \
-    , notify2
+from startup_profile import StartupProfile
+
+# Created before the rest of the imports, to measure them (see --startup-profile)
+startup = StartupProfile ()
 
+import scraper
 
-from bs4 import BeautifulSoup
-#from markdown import markdown
+startup.mark ("import scraper")
+
+import logging \
+    , re \
+    , threading
+
+from tweet_store import TweetStore
+from archive import ArchiveWriter
+from search_index import TweetIndex
+from poll_scheduler import PollScheduler, posting_rate
+from notifier import NotificationDispatcher
+from render import TweetRenderer, render_text
+from feed import FeedWriter, FORMATS, merge_timelines, sort_key
 from datetime import datetime
 
 # For the argument parsing
 import argparse \
     , sys
 
+startup.mark ("import CLI modules")
+
 
 notif_name = "Tweet feeder"
 notif_icon = "notification-message-IM"
 notif_type = "im.received"
 # Set to 'critical so it shows on top of every other window (even on full-screen,
-# like while playing games)
-notif_urgency = notify2.URGENCY_CRITICAL
+# like while playing games). Name of the constant on notify2
+notif_urgency = "URGENCY_CRITICAL"
+
+# Shared by the output and the notifications, so each tweet is only rendered once
+renderer = TweetRenderer ()
 
 
 def positive_int (value):
@@ -77,43 +93,106 @@ def parse_args ():
                         , type = positive_int
     )
 
-    parser.add_argument ("-w", "--watch"
-                        , help = "Keep polling the endpoint for more tweets"
-                        , action = "store_true"
+    parser.add_argument ("-j", "--jobs"
+                        , help = "Maximum number of users whose tweets are fetched at "
+                            "the same time"
+                        , type = positive_int
     )
 
-    parser.add_argument ("-n", "--notify"
-                        , help = "Same as --watch; but also sends a notification on "
-                                " every new tweet"
+    parser.add_argument ("-s", "--store"
+                        , help = "SQLite database where all the retrieved tweets are "
+                            "saved"
+    )
+
+    parser.add_argument ("--from-store"
+                        , help = "Loads the tweets saved on the database set with "
+                            "--store, instead of retrieving them again (only the users "
+                            "not found there are retrieved)"
                         , action = "store_true"
     )
 
-    return parser.parse_args ()
+    parser.add_argument ("-a", "--archive"
+                        , help = "Directory where each new tweet is written, as a JSON"
+                            " line (the files are rotated once they're too big or old)"
+    )
 
+    parser.add_argument ("--archive-compression"
+                        , help = "Compression of the files written with --archive"
+                        , choices = ["gzip", "zstd"]
+    )
 
+    parser.add_argument ("-q", "--search"
+                        , help = "Only shows the tweets with all the words (and \"quoted"
+                            " phrases\") of this query, including those loaded with"
+                            " --from-store"
+    )
 
-def sort_tweets (tweet_map):
-    """
-    Sorts the given map and creates a list, using arbitrary criteria
+    parser.add_argument ("--search-user"
+                        , help = "Only shows the tweets of this user, with --search (it"
+                            " can be used more than once)"
+                        , action = "append"
+    )
 
-    Args:
-        -> tweet_map: A dictionary with all the exracted tweets by user
+    parser.add_argument ("--search-since"
+                        , help = "Only shows the tweets after this epoch (UNIX"
+                            " timestamp), with --search"
+                        , type = positive_int
+    )
 
-    Returns:
-        A list with the sorted tweets
-    """
-    # Sorts all the tweets by date (olders first, so the newest comes at the bottom)
-    all_tweets = []
+    parser.add_argument ("--search-until"
+                        , help = "Only shows the tweets before this epoch (UNIX"
+                            " timestamp), with --search"
+                        , type = positive_int
+    )
 
-    for x in tweet_map.values ():
-        all_tweets += x.values ()
+    parser.add_argument ("-f", "--feed"
+                        , help = "Shows the tweets of all the users as a single feed,"
+                            " from oldest to newest, in this format (the new tweets"
+                            " found with --watch or --notify are always shown like this;"
+                            " by default, as 'human')"
+                        , choices = sorted (FORMATS)
+    )
 
-    sorted_tweets = sorted ( all_tweets
-                            , lambda a, b: cmp (a ["tweet_age"], b ["tweet_age"])
+    parser.add_argument ("-w", "--watch"
+                        , help = "Keep polling the endpoint for more tweets"
+                        , action = "store_true"
     )
 
+    parser.add_argument ("--min-interval"
+                        , help = "Minimum seconds between two polls of the same user,"
+                            " with --watch or --notify (default: 60)"
+                        , type = positive_int
+    )
+
+    parser.add_argument ("--max-interval"
+                        , help = "Maximum seconds between two polls of the same user,"
+                            " with --watch or --notify (default: 3600). The users that"
+                            " post less often are polled less often"
+                        , type = positive_int
+    )
+
+    parser.add_argument ("-n", "--notify"
+                        , help = "Same as --watch; but also sends a notification on "
+                                " every new tweet"
+                        , action = "store_true"
+    )
+
+    parser.add_argument ("--notify-window"
+                        , help = "Seconds to wait for more tweets from the same user"
+                            " before notifying them all at once, with --notify"
+                            " (default: 5)"
+                        , type = int
+    )
+
+    parser.add_argument ("--startup-profile"
+                        , help = "Shows on STDERR the time spent on each phase (imports,"
+                            " initialization, retrieval of the tweets...) until they're"
+                            " shown"
+                        , action = "store_true"
+    )
+
+    return parser.parse_args ()
 
-    return sorted_tweets
 
 
 def format_tweet (text, add_tabs = False, strip = False):
@@ -132,162 +211,153 @@ def format_tweet (text, add_tabs = False, strip = False):
     Returns:
         A string with the processed markdown
     """
-    # Substitutes the mentions:
-    # [~~@~~**<username>**](/<username>)
-    text = re.sub (r"\[~~@~~\*\*([^*]+)\*\*\]\(([^)]+)\)"
-                    , r"[@\1](https://twitter.com\2)"
-                    , text
-        )
+    mode = ("plain" if strip else "markdown") + ("_indented" if add_tabs else "")
+    return render_text (text, mode)
 
-    # Hashtags:
-    # [~~#~~**<tag>**](/<tag_link>)
-    text = re.sub (r"\[~~#~~\*\*([^*]+)\*\*\]\(([^)]+)\)"
-                    , r"[#\1](https://twitter.com\2)"
-                    , text
-        )
 
-    if strip:
-        # Converts it to HTML to put it back to text, but without links
-        html = markdown (text)
+def new_feed_writer (fmt = None):
+    """
+    Creates the object that writes the tweets on STDOUT
 
-        parsed = BeautifulSoup (html, "lxml")
+    Args:
+        -> fmt (optional): One of feed.FORMATS. By default, "human"
 
-        # As twitter sometimes uses <a> tags to refer to pictures and links, some
-        # processing has to be done
-        # p -> parsed html
-        # t -> tag to be replaced
-        replace_anchor = lambda p, t: (
+    Returns:
+        -> A feed.FeedWriter
+    """
+    return FeedWriter (fmt = fmt if fmt else "human"
+                        , render = lambda t: renderer.render (t, "plain_indented")
+    )
 
-                t.replace_with (
-                    p.new_string (" https://" + re.sub ("\n", "", t.text) + " ")
-                )
-            if re.search ("pic.twitter.com/.+", re.sub ("\n", "", t.text))
-            else
-                t.replace_with (
-                    p.new_string (" " + re.sub ("\n", "", t.text) + " ")
-                )
-        )
-        # Similar as before, some images are just emojis
-        replace_img = lambda p, t: (
 
-                t.replace_with (
-                    p.new_string (" https://" + re.sub ("\n", "", t ["alt"]) + " ")
-                )
-            if re.search ("pic.twitter.com/.+", re.sub ("\n", "", t ["alt"]))
-            else
-                t.replace_with (
-                    p.new_string (" " + re.sub ("\n", "", t ["alt"]) + " ")
+def print_feed (timelines, fmt = None):
+    """
+    Dumps on STDOUT the tweets of all the users, from oldest to newest. They're merged
+    as they're written, instead of sorting all of them first (see feed.merge_timelines)
+
+    Args:
+        -> timelines: A dictionary with the tweets of each user, from newest to oldest
+
+        -> fmt (optional): One of feed.FORMATS. By default, "human"
+
+    Returns:
+        -> The number of tweets written
+    """
+    writer = new_feed_writer (fmt)
+    count = writer.write_all (merge_timelines (timelines))
+    writer.flush ()
+
+    return count
+
+
+def print_results (results):
+    """
+    Dumps on STDOUT the tweets found with TweetIndex.search()
+
+    Args:
+        -> results: List with the tweets found
+    """
+    for tweet in results:
+        print ("\n----> @{0} ({1}): {2}".format (
+                    tweet ["screen_name"]
+                    , str (datetime.fromtimestamp (tweet ["tweet_age"]))
+                    , tweet ["text"]
                 )
         )
 
-        # Replaces the 'a' tags with their text (without "\n")
-        [ replace_anchor (parsed, x)
-            for x in parsed.select ("a")
-        ]
-        # Replaces the 'img' tags with their alt-text (without "\n")
-        [ replace_img (parsed, x)
-            for x in parsed.select ("img")
-        ]
+    print ("\n{0} tweets found".format (len (results)))
 
-        text = html2text.html2text (parsed.get_text (), bodywidth = 140)
 
+class Notify2Backend:
+    """
+    Shows the notifications on the desktop, with notify2 (see
+    notifier.NotificationDispatcher)
+    """
 
-    # Removes final new lines
-    text = re.sub ("\n+$", "", text)
+    def __init__ (self):
+        """
+        Loads notify2, which is only needed with --notify
 
-    # Adds tabs before each line (if needed)
-    if add_tabs:
-        text = re.sub (r"^", r"\t", text)
-        text = re.sub (r"\n", r"\n\t", text)
+        Raises:
+            -> ImportError, if notify2 isn't installed
+        """
+        import notify2
 
+        self.notify2 = notify2
 
-    return text
 
+    def init (self):
+        """
+        Connects to the notification server
 
-def print_tweets (tweet_map):
-    """
-    Dumps on STDOUT all the contents of the tweets, after ordering them using
-    'order_tweets'
+        Returns:
+            -> False if it wasn't possible
+        """
+        return self.notify2.init (notif_name)
 
-    Args:
-        -> tweet_map: A dictionary with all the exracted tweets by user
-    """
-    base_url = "https://twitter.com"
-
-    for tweet in sort_tweets (tweet_map):
-        msg = u"{}\n".format ("=" * 100)
-        # Header -> Direct link to the tweet
-        msg += u"\n## [{0}]({1}{2}) \n".format (
-                            tweet ["tweet_id"]
-                            , base_url
-                            , tweet ["permalink"]
-                        )
-
-        if tweet ["pinned"]:
-            msg += u"Pinned tweet\n"
-
-        # Retweet info (if any)
-        if tweet ["retweet"]:
-            msg += u"Retweet from {}\n".format (
-                            tweet ["retweet_info"]["retweeter"]
-                        )
-
-        # Data of the user who tweeted
-        msg += u"User: {0} [@{2}]({1}/{2})\n".format (
-                            tweet ["user"]["displayname"]
-                            , base_url
-                           , tweet ["user"]["username"]
-                        )
-        # Date of the tweet
-        msg += u"Date: {0}\n".format (
-                            str (datetime.fromtimestamp (tweet ["tweet_age"]))
-                    )
-
-        msg += u"\n\t{0}\n{1}\n\t{0}\n".format (
-                            "-" * 100
-                            , format_tweet (tweet ["text"]
-                                            , add_tabs = True
-                                            , strip = True
-                            )
-                    )
-
-        # Stats
-        msg += u"\t{0} replies  - {1} retweets  - {2} likes\n".format (
-                        tweet ["stats"]["replies"]
-                        , tweet ["stats"]["retweets"]
-                        , tweet ["stats"]["likes"]
-                    )
-
-        print (msg)
-
-
-
-def poll (users, send_notif = False):
+
+    def uninit (self):
+        self.notify2.uninit ()
+
+
+    def show (self, title, message):
+        notif = self.notify2.Notification (title, message, notif_icon)
+        notif.set_category (notif_type)
+        notif.set_urgency (getattr (self.notify2, notif_urgency))
+
+        notif.show ()
+        # Deletes the notification to avoid conflicts with the next ones
+        del notif
+
+
+def poll (sc, users, send_notif = False, search = None, min_interval = None
+            , max_interval = None, workers = None, notif_window = None
+            , feed_format = None):
     """
-    Waits for updates of any of the users on the list
+    Waits for updates of any of the users on the list. Each user is polled more or less
+    often depending on how often it posts (see poll_scheduler.PollScheduler)
 
     Args:
+        -> sc: The scraper.Scraper used to get the tweets
+
         -> users: A list with all the usernames to get tweets from
 
         -> send_notif (optional): If True, also sends a notification on every new tweet
+
+        -> search (optional): Dictionary with the arguments for sc.index.search(). If
+                it's provided, only the new tweets that match are shown
+
+        -> min_interval (optional): Minimum seconds between two polls of each user
+
+        -> max_interval (optional): Maximum seconds between two polls of each user
+
+        -> workers (optional): Maximum number of users polled at the same time
+
+        -> notif_window (optional): Seconds to wait for more tweets from a user before
+                sending a single notification with all of them
+
+        -> feed_format (optional): Format of the new tweets (one of feed.FORMATS)
     """
-    # Waits 60 seconds between every update
-    sleep_time = 60
     logger = logging.getLogger ("Polling")
 
     info = {}
-    notif_err = False
+    backend = None
 
     if send_notif:
-        if not notify2.init (notif_name):
+        try:
+            backend = Notify2Backend ()
+        except ImportError as e:
+            logger.error ("Notifications not available => " + str (e))
+
+        if backend and not backend.init ():
             logger.error ("Error accessing DBus")
-            notif_err = True
+            backend = None
 
     del_items = []
-    # Stores the current html and max_position
+    # Stores the cursor of the newest tweet
     for u in users:
         logger.info ("Getting initial data from '" + u + "'")
-        info [u] = scraper.get_update_info (u)
+        info [u] = sc.get_update_info (u)
 
         # If there has been some error fetching content, no updates can be done
         if not info [u]:
@@ -298,52 +368,88 @@ def poll (users, send_notif = False):
     # Deletes all the marked items
     users = [ x for x in users if x not in del_items ]
 
-    if len (info) <= 0:
+    if len (users) <= 0:
         logger.error ("No available info to get updates")
         return
 
-    while True:
-        try:
-            time.sleep (sleep_time)
-            logger.info ("Polling, looking for updates at " + str (datetime.now ()))
+    # The users are polled from many threads, but their tweets are shown one by one
+    output_lock = threading.Lock ()
+    writer = new_feed_writer (feed_format)
 
-            for u in users:
-                update = scraper.get_new_tweets (u
-                                                , info [u]["max_pos"]
-                                                , info [u]["html"]
-                    )
+    # The notifications are sent from their own thread, so they don't delay the polls
+    dispatcher = None
+    if backend:
+        dispatcher = NotificationDispatcher (backend
+                                    , window = notif_window
+                                    , format_text = lambda t: renderer.render (t, "plain")
+        )
 
-                if update:
-                    # Prints the new tweet. The data is wrapped in a dictionary with the
-                    # username as the key, because that's how 'print_tweets' expects it
-                    print_tweets ( {u: update} )
-                    # Updates also the stored info
-                    info [u] = scraper.get_update_info (u)
+    def check (u):
+        """
+        Polls a user, showing its new tweets
 
-                    if send_notif and not notif_err:
-                        title = "New tweet from @" + u
-                        msg =  format_tweet (update.values ()[0] ["text"]
-                                            , add_tabs = False
-                                            , strip = True
-                                )
+        Returns:
+            -> The number of new tweets, or None if they couldn't be retrieved
+        """
+        update = sc.get_new_tweets (u)
+        if update is None:
+            return None
 
-                        notif = notify2.Notification (title, msg, notif_icon)
-                        notif.set_category (notif_type)
-                        notif.set_urgency (notif_urgency)
+        new_tweets = len (update)
 
-                        notif.show ()
-                        # Deletes the notification to avoid conflicts with the next ones
-                        del notif
+        # So other programs can read the new tweets right away
+        if update and sc.archive:
+            sc.archive.flush ()
 
-            logger.info ("Poll done\n")
+        if update and search:
+            found = { t ["tweet_id"] for t in sc.index.search (tweet_ids = update.keys ()
+                                                                , **search
+                                                )
+            }
+            update = { k: v for k, v in update.items () if k in found }
 
-        except KeyboardInterrupt:
-            logger.info ("Interrupt caught while polling. Cleaning data...")
-            # Cleans everything
-            notify2.uninit ()
+        if not update:
+            return new_tweets
 
-            logger.info ("All done")
-            break
+        with output_lock:
+            # The pinned tweet may come first on the page
+            writer.write_all ( (u, t) for t in sorted (update.values (), key = sort_key) )
+            writer.flush ()
+
+        if dispatcher:
+            dispatcher.submit (u, update.values ())
+
+        return new_tweets
+
+    scheduler = PollScheduler (check
+                                , min_interval = min_interval
+                                , max_interval = max_interval
+                                , workers = workers
+    )
+
+    for u in users:
+        # The first poll is sooner or later depending on the tweets already retrieved
+        rate = posting_rate ([ t ["tweet_age"] for t in info [u]["tweets"]
+                                if not t ["pinned"]
+        ])
+        scheduler.add (u, rate)
+
+    try:
+        logger.info ("Polling, looking for updates since " + str (datetime.now ()))
+        scheduler.run ()
+
+    except KeyboardInterrupt:
+        logger.info ("Interrupt caught while polling. Cleaning data...")
+        # Cleans everything
+        scheduler.stop ()
+
+        if dispatcher:
+            dispatcher.close ()
+
+        if backend:
+            backend.uninit ()
+
+        logger.info ("All done")
 
 
 if __name__ == "__main__":
@@ -357,6 +463,7 @@ if __name__ == "__main__":
         logging.basicConfig (level = logging.WARNING, format = FORMAT)
 
     logger = logging.getLogger (__name__)
+    startup.mark ("arguments")
 
     usernames = []
     with args.users_cfg as in_file:
@@ -374,27 +481,89 @@ if __name__ == "__main__":
                 )
     )
 
+    startup.mark ("users file")
+
     max_count = args.max_count if args.max_count else 10
     max_epoch = args.max_epoch
 
-    # Initializes the authZ before attempting to retrieve any tweet
-    sc = scraper.Scraper ()
-    try:
-        data = sc.get_tweets (usernames, max_count, max_epoch)
+    store = TweetStore (args.store) if args.store else None
+    archive = ArchiveWriter (args.archive, compression = args.archive_compression) \
+                if args.archive else None
+    index = TweetIndex () if args.search else None
+
+    startup.mark ("storage")
+
+    search = None
+    if args.search:
+        search = {
+            "query": args.search
+            , "users": args.search_user
+            , "since": args.search_since
+            , "until": args.search_until
+        }
+
+    sc = scraper.AsyncScraper (concurrency = args.jobs
+                                , store = store
+                                , archive = archive
+                                , index = index
+    )
+    # The authorization isn't obtained until the first request
+    startup.mark ("scraper")
 
-        # Prints them by usermame, not by chronological order
-        for k in data:
-            user_info = data [k]
-            print ("\n=============\nTweets from " +  user_info ["name"] + " - @" + k)
-            for tweet in user_info ["tweets"]:
-                print ("\n----> " + tweet ["text"])
+    try:
+        missing = usernames
+        if args.from_store:
+            missing = sc.load_history (usernames, max_count, max_epoch)
+
+        data = sc.get_tweets (missing, max_count, max_epoch) if missing \
+                else sc.scraped_info
+
+        startup.mark ("tweets")
+
+        if search:
+            print_results (index.search (**search))
+        elif args.feed:
+            print_feed ({ k: v ["tweets"] for k, v in data.items () }, args.feed)
+        else:
+            # Prints them by usermame, not by chronological order
+            for k in data:
+                user_info = data [k]
+                print ("\n=============\nTweets from " +  user_info ["name"] + " - @" + k)
+                for tweet in user_info ["tweets"]:
+                    print ("\n----> " + tweet ["text"])
+
+        startup.mark ("output")
+        if args.startup_profile:
+            startup.report ()
 
         if args.notify:
-            poll (usernames, send_notif = True)
+            poll (sc, usernames, send_notif = True, search = search
+                    , min_interval = args.min_interval
+                    , max_interval = args.max_interval
+                    , workers = args.jobs
+                    , notif_window = args.notify_window
+                    , feed_format = args.feed
+            )
         elif args.watch:
-            poll (usernames, send_notif = False)
+            poll (sc, usernames, send_notif = False, search = search
+                    , min_interval = args.min_interval
+                    , max_interval = args.max_interval
+                    , workers = args.jobs
+                    , feed_format = args.feed
+            )
 
     except KeyboardInterrupt:
         logger.info ("Interrupt caught while getting tweets. Cleaning data...")
         logger.info ("All done")
         exit ()
+
+    finally:
+        # Writes the tweets still on the buffer
+        if archive:
+            archive.close ()
+
+        if sc.response_cache:
+            logger.info ("Response cache usage: " + str (sc.response_cache.stats))
+
+        if sc.rate_limiter:
+            logger.info ("Rate limit budget: " + str (sc.rate_limiter.budget ()))
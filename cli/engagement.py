@@ -0,0 +1 @@
+../engagement.py
\ No newline at end of file
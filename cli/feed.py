@@ -0,0 +1 @@
+../feed.py
\ No newline at end of file
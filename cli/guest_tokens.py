@@ -0,0 +1 @@
+../guest_tokens.py
\ No newline at end of file
@@ -0,0 +1 @@
+../http_cache.py
\ No newline at end of file
@@ -0,0 +1 @@
+../json_decoder.py
\ No newline at end of file
@@ -0,0 +1 @@
+../notifier.py
\ No newline at end of file
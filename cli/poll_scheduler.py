@@ -0,0 +1 @@
+../poll_scheduler.py
\ No newline at end of file
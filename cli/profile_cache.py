@@ -0,0 +1 @@
+../profile_cache.py
\ No newline at end of file
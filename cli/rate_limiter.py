@@ -0,0 +1 @@
+../rate_limiter.py
\ No newline at end of file
@@ -0,0 +1 @@
+../render.py
\ No newline at end of file
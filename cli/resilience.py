@@ -0,0 +1 @@
+../resilience.py
\ No newline at end of file
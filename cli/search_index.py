@@ -0,0 +1 @@
+../search_index.py
\ No newline at end of file
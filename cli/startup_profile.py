@@ -0,0 +1 @@
+../startup_profile.py
\ No newline at end of file
@@ -0,0 +1 @@
+../token_cache.py
\ No newline at end of file
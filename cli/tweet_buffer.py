@@ -0,0 +1 @@
+../tweet_buffer.py
\ No newline at end of file
@@ -0,0 +1 @@
+../tweet_store.py
\ No newline at end of file
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+History of the stats (likes, retweets and replies) of the tweets, every time they're
+retrieved, to see how their engagement evolves.
+"""
+import bisect \
+    , heapq \
+    , json \
+    , os \
+    , sys \
+    , threading \
+    , time
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class EngagementTracker:
+    """
+    Stores a sample of the stats of a tweet every time it's recorded, on preallocated
+    arrays (one per column) instead of one object per sample:
+        - Samples: "tweet" (index of the tweet), "time" (UNIX epoch), "likes",
+            "retweets" and "replies"
+        - Tweets: "user" (index of the user) and "tweet_age"; their IDs are on
+            'tweet_ids' and the users on 'users'
+
+    The samples are stored in the same order they're recorded, which must be their
+    chronological order, so the samples since any moment are found with a binary search.
+    When the arrays are full, their size is doubled.
+
+    If numpy is installed, the queries work directly on the arrays (without copying
+    them); otherwise, they're answered with plain Python.
+    """
+
+    """
+    Type (as on the 'array' module) of each column of the samples and the tweets
+    """
+    SAMPLE_COLUMNS = { "tweet": "q", "time": "d", "likes": "q", "retweets": "q"
+                        , "replies": "q"
+    }
+    TWEET_COLUMNS = { "user": "q", "tweet_age": "d" }
+
+    """
+    Initial number of samples (and tweets) that fit on the arrays
+    """
+    capacity = 64 * 1024
+
+    def __init__ (self, capacity = None):
+        """
+        Args:
+            -> capacity (optional): Initial number of samples to make room for
+        """
+        if capacity:
+            self.capacity = capacity
+
+        self.lock = threading.Lock ()
+
+        self.samples = { k: self.new_array (t, self.capacity)
+                            for k, t in self.SAMPLE_COLUMNS.items ()
+        }
+        self.sample_count = 0
+
+        self.tweets = { k: self.new_array (t, self.capacity)
+                            for k, t in self.TWEET_COLUMNS.items ()
+        }
+        self.tweet_ids = []
+        self.tweet_index = {}
+
+        self.users = []
+        self.user_index = {}
+
+
+    @staticmethod
+    def new_array (typecode, size):
+        """
+        Creates an array filled with zeros
+
+        Args:
+            -> typecode: Type of the elements (as on the 'array' module)
+
+            -> size: Number of elements
+
+        Returns:
+            -> The new array
+        """
+        return array (typecode, bytes (size * array (typecode).itemsize))
+
+
+    @staticmethod
+    def grow (columns, needed):
+        """
+        Doubles the size of the arrays until 'needed' elements fit on them
+
+        Args:
+            -> columns: Dictionary with the arrays
+
+            -> needed: Number of elements that must fit
+        """
+        for column in columns.values ():
+            size = len (column)
+            if needed <= size:
+                continue
+
+            while size < needed:
+                size *= 2
+
+            column.frombytes (bytes ((size - len (column)) * column.itemsize))
+
+
+    def record (self, screen_name, tweets, now = None):
+        """
+        Adds a sample with the current stats of each tweet
+
+        Args:
+            -> screen_name: User from whose timeline the tweets were retrieved
+
+            -> tweets: List with the tweets (dictionaries or model.Tweet)
+
+            -> now (optional): Time of the samples, in UNIX epoch format. It can't be
+                    older than the one of the previous samples. By default, the current
+                    time
+        """
+        if not tweets:
+            return
+
+        with self.lock:
+            if now is None:
+                now = time.time ()
+
+            user = self.user_index.get (screen_name)
+            if user is None:
+                user = self.user_index [screen_name] = len (self.users)
+                self.users.append (screen_name)
+
+            self.grow (self.samples, self.sample_count + len (tweets))
+            self.grow (self.tweets, len (self.tweet_ids) + len (tweets))
+
+            s = self.samples
+            for tweet in tweets:
+                tweet_id = tweet ["tweet_id"]
+
+                index = self.tweet_index.get (tweet_id)
+                if index is None:
+                    index = self.tweet_index [tweet_id] = len (self.tweet_ids)
+                    self.tweet_ids.append (tweet_id)
+                    self.tweets ["user"][index] = user
+                    self.tweets ["tweet_age"][index] = tweet ["tweet_age"]
+
+                stats = tweet ["stats"]
+                i = self.sample_count
+
+                s ["tweet"][i] = index
+                s ["time"][i] = now
+                s ["likes"][i] = stats ["likes"]
+                s ["retweets"][i] = stats ["retweets"]
+                s ["replies"][i] = stats ["replies"]
+
+                self.sample_count += 1
+
+
+    def history (self, tweet_id):
+        """
+        Gets all the samples of a tweet
+
+        Args:
+            -> tweet_id: ID of the tweet
+
+        Returns:
+            -> A list of tuples (time, likes, retweets, replies), from oldest to newest
+        """
+        with self.lock:
+            index = self.tweet_index.get (tweet_id)
+            if index is None:
+                return []
+
+            s = self.samples
+            return [ (s ["time"][i], s ["likes"][i], s ["retweets"][i], s ["replies"][i])
+                        for i in range (self.sample_count) if s ["tweet"][i] == index
+            ]
+
+
+    def top_velocity (self, count = 10, window = 60 * 60, stat = "likes", now = None
+                        , users = None):
+        """
+        Gets the tweets whose 'stat' grew faster on the last 'window' seconds: the
+        difference between their first and last samples on that time, divided by the
+        seconds between them. For the tweets published during that time, the first sample
+        is their publication (with 0 of everything).
+
+        Args:
+            -> count (optional): Number of tweets to get
+
+            -> window (optional): Seconds before 'now' to look at
+
+            -> stat (optional): "likes", "retweets" or "replies"
+
+            -> now (optional): End of the window, in UNIX epoch format. By default, the
+                    current time
+
+            -> users (optional): List with the users whose tweets are considered. By
+                    default, all of them
+
+        Returns:
+            -> A list of tuples (tweet_id, velocity), with the velocity per hour, from
+                fastest to slowest
+        """
+        if now is None:
+            now = time.time ()
+
+        since = now - window
+
+        with self.lock:
+            times = self.samples ["time"]
+            start = bisect.bisect_left (times, since, 0, self.sample_count)
+            end = bisect.bisect_right (times, now, start, self.sample_count)
+
+            allowed = None
+            if users is not None:
+                allowed = { self.user_index [u] for u in users if u in self.user_index }
+
+            if numpy:
+                top = self._top_velocity_numpy (start, end, count, since, stat, allowed)
+            else:
+                top = self._top_velocity_python (start, end, count, since, stat, allowed)
+
+            return [ (self.tweet_ids [i], v * 3600) for i, v in top ]
+
+
+    def _top_velocity_python (self, start, end, count, since, stat, allowed):
+        s = self.samples
+        tweet_age = self.tweets ["tweet_age"]
+        user = self.tweets ["user"]
+
+        first = {}
+        last = {}
+        for i, t, v in zip (s ["tweet"][start:end], s ["time"][start:end]
+                            , s [stat][start:end]):
+            if i not in first:
+                first [i] = (t, v)
+            last [i] = (t, v)
+
+        velocities = []
+        for i, (t1, v1) in last.items ():
+            if allowed is not None and user [i] not in allowed:
+                continue
+
+            t0, v0 = first [i]
+            if tweet_age [i] >= since:
+                t0, v0 = tweet_age [i], 0
+
+            if t1 > t0:
+                velocities.append ((i, (v1 - v0) / (t1 - t0)))
+
+        return heapq.nlargest (count, velocities, key = lambda x: x [1])
+
+
+    def _top_velocity_numpy (self, start, end, count, since, stat, allowed):
+        s = self.samples
+        tweet = numpy.frombuffer (s ["tweet"], dtype = numpy.int64, count = end) [start:]
+        times = numpy.frombuffer (s ["time"], dtype = numpy.float64, count = end) [start:]
+        values = numpy.frombuffer (s [stat], dtype = numpy.int64, count = end) [start:]
+
+        if not len (tweet):
+            return []
+
+        # First and last sample of each tweet on the window
+        ids, first = numpy.unique (tweet, return_index = True)
+        _, last = numpy.unique (tweet [::-1], return_index = True)
+        last = len (tweet) - 1 - last
+
+        t0 = times [first]
+        v0 = values [first].astype (numpy.float64)
+        t1 = times [last]
+        v1 = values [last].astype (numpy.float64)
+
+        tweet_age = numpy.frombuffer (self.tweets ["tweet_age"], dtype = numpy.float64)
+        tweet_age = tweet_age [ids]
+        published = tweet_age >= since
+        t0 = numpy.where (published, tweet_age, t0)
+        v0 = numpy.where (published, 0, v0)
+
+        valid = t1 > t0
+        if allowed is not None:
+            user = numpy.frombuffer (self.tweets ["user"], dtype = numpy.int64) [ids]
+            valid &= numpy.isin (user, list (allowed))
+
+        ids = ids [valid]
+        velocity = (v1 [valid] - v0 [valid]) / (t1 [valid] - t0 [valid])
+
+        if len (ids) > count:
+            chosen = numpy.argpartition (-velocity, count) [:count]
+            ids, velocity = ids [chosen], velocity [chosen]
+
+        order = numpy.argsort (-velocity, kind = "stable")
+        return list (zip (ids [order].tolist (), velocity [order].tolist ()))
+
+
+    def export (self, directory):
+        """
+        Writes each column on its own file, to analyze them with other programs
+        (for example, numpy.fromfile ("likes.bin", dtype = "int64")):
+            - <column>.bin: The raw values of each column of the samples and tweets, with
+                the byte order of this machine
+            - columns.json: The types of the columns, the number of samples and tweets,
+                the byte order, the ID of each tweet and the users
+
+        Args:
+            -> directory: Directory to create the files on
+        """
+        os.makedirs (directory, exist_ok = True)
+
+        with self.lock:
+            n_samples = self.sample_count
+            n_tweets = len (self.tweet_ids)
+
+            for columns, n in ((self.samples, n_samples), (self.tweets, n_tweets)):
+                for name, column in columns.items ():
+                    with open (os.path.join (directory, name + ".bin"), "wb") as f:
+                        f.write (memoryview (column)[:n])
+
+            manifest = {
+                "byteorder": sys.byteorder
+                , "samples": n_samples
+                , "sample_columns": self.SAMPLE_COLUMNS
+                , "tweets": n_tweets
+                , "tweet_columns": self.TWEET_COLUMNS
+                , "tweet_ids": self.tweet_ids
+                , "users": self.users
+            }
+
+        with open (os.path.join (directory, "columns.json"), "w") as f:
+            json.dump (manifest, f)
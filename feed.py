@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Single chronological feed with the tweets of many users, written as they're merged
+instead of after sorting all of them.
+"""
+import heapq \
+    , json \
+    , sys
+
+from datetime import datetime
+
+
+def sort_key (tweet):
+    """
+    Gets the key that orders the tweets chronologically. The ID breaks the ties between
+    tweets of the same second (it grows with time too)
+
+    Args:
+        -> tweet: The tweet (a dictionary or a model.Tweet)
+
+    Returns:
+        -> A tuple (tweet_age, tweet_id as int)
+    """
+    return (tweet ["tweet_age"], int (tweet ["tweet_id"]))
+
+
+def merge_timelines (timelines, newest_first = False):
+    """
+    Merges the timelines of many users, keeping only one tweet of each of them at a time
+    on a heap, so the first tweets are available right away and no list with all of
+    them is ever built
+
+    Args:
+        -> timelines: Dictionary with the tweets of each user, ordered from newest to
+                oldest (like the "tweets" of Scraper.scraped_info). Each value must be a
+                sequence (or a dictionary by the ID of the tweets, like the ones returned
+                by Scraper.get_new_tweets)
+
+        -> newest_first (optional): If True, the newest tweet is given first
+
+    Yields:
+        -> Tuples (username, tweet), from oldest to newest (or the other way around,
+            with 'newest_first')
+    """
+    def timeline (username, tweets):
+        if isinstance (tweets, dict):
+            tweets = tweets.values ()
+
+        if not newest_first:
+            tweets = reversed (tweets)
+
+        for tweet in tweets:
+            yield (username, tweet)
+
+    return heapq.merge (* [ timeline (u, t) for u, t in timelines.items () ]
+                        , key = lambda item: sort_key (item [1])
+                        , reverse = newest_first
+    )
+
+
+"""
+Text of each tweet on the "human" format. Its fields are: tweet_id, permalink, header
+(pinned and retweet info), displayname, username, date, text, replies, retweets, likes
+"""
+HUMAN_TEMPLATE = ("=" * 100 + "\n"
+                "\n## [{0}]({1}) \n"
+                "{2}"
+                "User: {3} [@{4}](https://twitter.com/{4})\n"
+                "Date: {5}\n"
+                "\n\t" + "-" * 100 + "\n{6}\n\t" + "-" * 100 + "\n"
+                "\t{7} replies  - {8} retweets  - {9} likes\n"
+                "\n"
+)
+
+
+def format_human (username, tweet, render):
+    """
+    Converts a tweet to the text shown on the terminal
+
+    Args:
+        -> username: User from whose timeline the tweet was retrieved
+
+        -> tweet: The tweet (a dictionary or a model.Tweet)
+
+        -> render: Function that receives a tweet and returns its text, indented
+
+    Returns:
+        -> The text, ending with a blank line
+    """
+    user = tweet ["user"]
+
+    header = ""
+    if tweet ["pinned"]:
+        header += "Pinned tweet\n"
+
+    if tweet ["retweet"]:
+        header += "Retweet from " + tweet ["retweet_info"]["retweeter"] + "\n"
+
+    return HUMAN_TEMPLATE.format (tweet ["tweet_id"]
+                                , tweet ["permalink"]
+                                , header
+                                , user ["displayname"]
+                                , user ["username"]
+                                , str (datetime.fromtimestamp (tweet ["tweet_age"]))
+                                , render (tweet)
+                                , tweet ["stats"]["replies"]
+                                , tweet ["stats"]["retweets"]
+                                , tweet ["stats"]["likes"]
+    )
+
+
+def format_jsonl (username, tweet, render):
+    """
+    Converts a tweet to a JSON line, with the same format as the lines of
+    archive.ArchiveWriter: { "screen_name": <username>, "tweet": <tweet> }
+
+    Args:
+        -> username: User from whose timeline the tweet was retrieved
+
+        -> tweet: The tweet (a dictionary or a model.Tweet)
+
+        -> render: Ignored; the original text is kept
+
+    Returns:
+        -> The JSON document, ending with a new line
+    """
+    data = tweet if isinstance (tweet, dict) else tweet.to_dict ()
+
+    return json.dumps ({ "screen_name": username, "tweet": data }
+                        , ensure_ascii = False
+            ) + "\n"
+
+
+"""
+Available output formats
+"""
+FORMATS = {
+    "human": format_human
+    , "jsonl": format_jsonl
+}
+
+
+class FeedWriter:
+    """
+    Writes the tweets of a feed on a text stream in one of the FORMATS, joining them on
+    chunks of about 'buffer_size' characters instead of writing each one separately.
+    """
+
+    """
+    Characters to collect before writing them
+    """
+    buffer_size = 64 * 1024
+
+    def __init__ (self, stream = None, fmt = "human", render = None, buffer_size = None):
+        """
+        Args:
+            -> stream (optional): Text stream where the tweets are written. By default,
+                    sys.stdout
+
+            -> fmt (optional): One of FORMATS
+
+            -> render (optional): Function that receives a tweet and returns its text,
+                    indented (for example, render.TweetRenderer().render with the
+                    "plain_indented" mode). By default, its "text"
+
+            -> buffer_size (optional): Characters to collect before writing them
+        """
+        if fmt not in FORMATS:
+            raise ValueError ("Unknown feed format: " + str (fmt))
+
+        self.stream = stream
+        self.format = FORMATS [fmt]
+        self.render = render if render else (lambda t: t ["text"])
+
+        if buffer_size is not None:
+            self.buffer_size = buffer_size
+
+        self.chunks = []
+        self.buffered = 0
+
+
+    def write (self, username, tweet):
+        """
+        Adds a tweet to the output
+
+        Args:
+            -> username: User from whose timeline the tweet was retrieved
+
+            -> tweet: The tweet (a dictionary or a model.Tweet)
+        """
+        text = self.format (username, tweet, self.render)
+
+        self.chunks.append (text)
+        self.buffered += len (text)
+
+        if self.buffered >= self.buffer_size:
+            self.flush ()
+
+
+    def write_all (self, items):
+        """
+        Adds many tweets to the output, like the ones given by merge_timelines()
+
+        Args:
+            -> items: Iterable with tuples (username, tweet)
+
+        Returns:
+            -> The number of tweets written
+        """
+        count = 0
+
+        for username, tweet in items:
+            self.write (username, tweet)
+            count += 1
+
+        return count
+
+
+    def flush (self):
+        """
+        Writes the collected tweets on the stream
+        """
+        stream = self.stream if self.stream else sys.stdout
+
+        if self.chunks:
+            stream.write ("".join (self.chunks))
+            self.chunks = []
+            self.buffered = 0
+
+        stream.flush ()
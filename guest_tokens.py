@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pool of guest tokens, to keep making requests when one of them expires or reaches its
+rate limit.
+"""
+import logging \
+    , time \
+    , threading
+
+from concurrent.futures import Future
+
+
+class GuestToken:
+    """
+    State of one of the guest tokens of the pool
+    """
+    __slots__ = ("value", "created", "remaining", "reset")
+
+    def __init__ (self, value, created = None):
+        """
+        Args:
+            -> value: The token itself
+
+            -> created (optional): UNIX epoch when the token was obtained (now, by default)
+        """
+        self.value = value
+        self.created = created if created is not None else time.time ()
+
+        # Unknown until the first response with the 'x-rate-limit-*' headers arrives
+        self.remaining = None
+        self.reset = None
+
+
+    def budget (self, now):
+        """
+        Number of requests that can still be made with this token
+
+        Args:
+            -> now: Current UNIX epoch
+
+        Returns:
+            -> The number of requests left, or float ("inf") if it's unknown
+        """
+        if self.remaining is None or (self.reset and now >= self.reset):
+            return float ("inf")
+
+        return self.remaining
+
+
+class GuestTokenPool:
+    """
+    Holds several guest tokens and, on each request, hands out the one with the most
+    requests left on its rate limit window.
+
+    The pool learns the budget of each token from the 'x-rate-limit-remaining' and
+    'x-rate-limit-reset' headers of the responses (passed to update()). Expired tokens are
+    replaced on a background thread, and only one refresh is running at any time: every
+    caller that needs a new token waits for that same refresh.
+    """
+
+    """
+    Number of usable tokens to keep on the pool
+    """
+    size = 3
+
+    """
+    Seconds after which a guest token is considered expired
+    """
+    ttl = 2 * 60 * 60
+
+    def __init__ (self, request_token, size = None, ttl = None, tokens = None):
+        """
+        Args:
+            -> request_token: Function without arguments that requests a new guest token
+                    to the server, returning None if it couldn't be obtained
+
+            -> size (optional): Number of usable tokens to keep on the pool
+
+            -> ttl (optional): Seconds after which a guest token is considered expired
+
+            -> tokens (optional): List with tokens already obtained (for example, from a
+                    cache) to start with. Each one can be a tuple (token, UNIX epoch when
+                    it was obtained), so it expires at the right time
+        """
+        self.request_token = request_token
+
+        if size:
+            self.size = size
+
+        if ttl:
+            self.ttl = ttl
+
+        self.tokens = [ GuestToken (*t) if isinstance (t, tuple) else GuestToken (t)
+                        for t in (tokens or []) if t
+        ]
+
+        self.lock = threading.Lock ()
+        # Future resolved with the next new token (or when the refresh ends), and whether
+        # the thread of the refresh is running
+        self.refreshing = None
+        self.running = False
+
+
+    def usable (self, now):
+        """
+        Gets the tokens that haven't expired nor exhausted their rate limit. The expired
+        tokens are removed from the pool.
+
+        Args:
+            -> now: Current UNIX epoch
+
+        Returns:
+            -> A list with the usable tokens
+        """
+        self.tokens = [ t for t in self.tokens if (now - t.created) < self.ttl ]
+        return [ t for t in self.tokens if t.budget (now) > 0 ]
+
+
+    def refresh (self):
+        """
+        Starts a refresh on a background thread, unless there's one already running
+
+        Returns:
+            -> A concurrent.futures.Future that ends when the next new token is available
+                (or when the refresh has ended)
+        """
+        with self.lock:
+            # The tokens added before may have already been used up
+            if not self.refreshing or self.refreshing.done ():
+                self.refreshing = Future ()
+
+            future = self.refreshing
+
+            if self.running:
+                return future
+
+            self.running = True
+
+        threading.Thread (target = self._refresh, daemon = True).start ()
+        return future
+
+
+    def _refresh (self):
+        """
+        Requests new tokens until the pool has 'size' usable tokens, or the server doesn't
+        give any more of them. The callers waiting on 'refreshing' are released as soon
+        as a new token is available, instead of waiting for the whole refresh
+        """
+        logger = logging.getLogger (__name__ + ".refresh")
+        added = 0
+
+        try:
+            while True:
+                with self.lock:
+                    missing = self.size - len (self.usable (time.time ()))
+
+                if missing <= 0:
+                    break
+
+                token = self.request_token ()
+                if not token:
+                    logger.error ("Couldn't get a new guest token")
+                    break
+
+                added += 1
+
+                with self.lock:
+                    self.tokens.append (GuestToken (token))
+
+                    if not self.refreshing.done ():
+                        self.refreshing.set_result (added)
+
+            logger.info ("Added " + str (added) + " guest tokens to the pool")
+
+        finally:
+            with self.lock:
+                self.running = False
+
+                if not self.refreshing.done ():
+                    self.refreshing.set_result (added)
+
+
+    def acquire (self):
+        """
+        Gets the token with the most requests left. If there are none, waits for a refresh
+        (or for the end of the rate limit window, if no new tokens can be obtained).
+
+        Returns:
+            -> The token, or None if there are no tokens at all
+        """
+        logger = logging.getLogger (__name__ + ".acquire")
+
+        with self.lock:
+            now = time.time ()
+            usable = self.usable (now)
+            incomplete = len (usable) < self.size
+
+        if not usable:
+            self.refresh ().result ()
+
+            with self.lock:
+                now = time.time ()
+                usable = self.usable (now)
+
+                if not usable:
+                    # Every token has exhausted its rate limit: waits for the first one
+                    # to get its budget back
+                    pending = [ t for t in self.tokens if t.reset ]
+                    if not pending:
+                        return None
+
+                    token = min (pending, key = lambda t: t.reset)
+                    wait = max (0, token.reset - now)
+
+            if not usable:
+                logger.warning ("Rate limit reached on every guest token. Waiting "
+                                + str (int (wait)) + " seconds"
+                )
+                time.sleep (wait)
+                return token.value
+
+        elif incomplete:
+            self.refresh ()
+
+        return max (usable, key = lambda t: t.budget (now)).value
+
+
+    def update (self, value, status, headers, rejected = False):
+        """
+        Updates the budget of a token with the info of the response to a request made
+        with it
+
+        Args:
+            -> value: The token used on the request
+
+            -> status: HTTP status code of the response
+
+            -> headers: Headers of the response
+
+            -> rejected (optional): If True, the response said that the token itself is
+                    invalid or expired, so it's removed. Other 401 and 403 responses
+                    (like the ones for a protected account) don't affect the token
+        """
+        logger = logging.getLogger (__name__ + ".update")
+
+        with self.lock:
+            token = next ((t for t in self.tokens if t.value == value), None)
+            if not token:
+                return
+
+            # The server doesn't accept the token anymore
+            if rejected:
+                logger.info ("Guest token " + value + " rejected. Removing it")
+                self.tokens.remove (token)
+                return
+
+            try:
+                if "x-rate-limit-remaining" in headers:
+                    token.remaining = int (headers ["x-rate-limit-remaining"])
+
+                if "x-rate-limit-reset" in headers:
+                    token.reset = int (headers ["x-rate-limit-reset"])
+
+            except ValueError as e:
+                logger.warning ("Invalid rate limit headers => " + str (e))
+
+            if status == 429:
+                token.remaining = 0
+                # Without the headers, tries again after a short while
+                if not token.reset or token.reset <= time.time ():
+                    token.reset = time.time () + 60
+
+
+    def invalidate (self, value):
+        """
+        Removes a token from the pool
+
+        Args:
+            -> value: The token to remove
+        """
+        with self.lock:
+            self.tokens = [ t for t in self.tokens if t.value != value ]
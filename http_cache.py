@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache for the responses of the endpoints that rarely change, so they don't
+have to be downloaded again on every run.
+"""
+import logging \
+    , json \
+    , time \
+    , re \
+    , sqlite3 \
+    , threading
+
+from cache_files import default_path, connect
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+class ResponseCache:
+    """
+    Stores the responses (only those with status 200) on a SQLite database, indexed by
+    their URL, for as long as the policy of their endpoint says. Once the total size of
+    the stored bodies reaches 'max_bytes', the least recently used ones are removed.
+
+    When a stored response has expired, it's requested again with its ETag and/or
+    Last-Modified (if the server sent them), so the server can answer with a
+    "304 Not Modified" instead of sending it again.
+
+    The number of hits, misses and revalidations of each endpoint are on 'stats', to
+    tune the policies.
+    """
+
+    """
+    Policy for each endpoint: (name, regex of the URL, seconds to keep its responses).
+    The first one that matches is used; the URLs that match none (or whose policy has no
+    TTL) are never cached
+    """
+    POLICIES = [
+        # The JavaScript file with the bearer token changes its name with its contents
+        ("bearer", re.compile (r"\.js(\?|$)"), 7 * 24 * 60 * 60)
+        , ("user_info", re.compile (r"/graphql/[^/]+/UserByScreenName\?"), 24 * 60 * 60)
+        , ("users_lookup", re.compile (r"/1\.1/users/lookup\.json\?"), 24 * 60 * 60)
+        , ("timeline", re.compile (r"/2/timeline/profile/"), None)
+    ]
+
+    """
+    Maximum size (in bytes) of all the stored bodies
+    """
+    max_bytes = 64 * 1024 * 1024
+
+    """
+    Seconds since the last use of a response before its use is written again, so most
+    hits don't need a write on the database
+    """
+    touch_interval = 10 * 60
+
+    def __init__ (self, path = None, max_bytes = None, ttls = None):
+        """
+        Opens (and creates, if needed) the database.
+
+        Args:
+            -> path (optional): Path of the SQLite database. By default,
+                    'tweet-feed/responses.sqlite3' inside $XDG_CACHE_HOME (or ~/.cache)
+
+            -> max_bytes (optional): Maximum size of all the stored bodies
+
+            -> ttls (optional): Dictionary with the seconds to keep the responses of
+                    each endpoint, by the name of their policy, replacing the default
+                    ones (for example, { "timeline": 30 } to cache the timelines, or
+                    { "user_info": None } to never cache the profiles)
+        """
+        if not path:
+            path = default_path ("responses.sqlite3")
+
+        self.path = path
+
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+
+        if ttls:
+            self.policies = [ (name, regex, ttls.get (name, ttl))
+                                for name, regex, ttl in self.POLICIES
+            ]
+        else:
+            self.policies = self.POLICIES
+
+        self.stats = { name: { "hits": 0, "misses": 0, "revalidated": 0 }
+                        for name, _, _ in self.policies
+        }
+
+        # Held while using the connection
+        self.lock = threading.Lock ()
+        self.db = connect (path)
+
+        with self.lock, self.db:
+            self.db.execute ("CREATE TABLE IF NOT EXISTS responses ("
+                            " url TEXT PRIMARY KEY"
+                            " , headers TEXT NOT NULL"
+                            " , body BLOB NOT NULL"
+                            " , size INTEGER NOT NULL"
+                            " , expires REAL NOT NULL"
+                            " , last_used REAL NOT NULL"
+                            ")"
+            )
+            self.db.execute ("CREATE INDEX IF NOT EXISTS responses_last_used"
+                            " ON responses (last_used)"
+            )
+
+
+    def policy (self, url):
+        """
+        Finds the policy of the endpoint of a URL
+
+        Args:
+            -> url: The URL
+
+        Returns:
+            -> A tuple (name, ttl), or (None, None) if no policy matches
+        """
+        for name, regex, ttl in self.policies:
+            if regex.search (url):
+                return (name, ttl)
+
+        return (None, None)
+
+
+    def fetch (self, url, send):
+        """
+        Gets the response for a URL, from the cache if it's there and hasn't expired or,
+        otherwise, requesting it
+
+        Args:
+            -> url: The URL
+
+            -> send: Function that performs the request, receiving a dictionary with the
+                    headers to add (to revalidate the stored response) and returning the
+                    requests.Response
+
+        Returns:
+            -> The requests.Response (the stored one, or the new one)
+        """
+        logger = logging.getLogger (__name__ + ".fetch")
+
+        name, ttl = self.policy (url)
+        if not ttl:
+            return send ({})
+
+        entry = self.get (url)
+        if entry and entry ["expires"] > time.time ():
+            self.count (name, "hits")
+            return self.build_response (url, entry)
+
+        headers = {}
+        if entry:
+            if "ETag" in entry ["headers"]:
+                headers ["If-None-Match"] = entry ["headers"]["ETag"]
+
+            if "Last-Modified" in entry ["headers"]:
+                headers ["If-Modified-Since"] = entry ["headers"]["Last-Modified"]
+
+        response = send (headers)
+
+        if entry and headers and response.status_code == 304:
+            logger.info ("Cached response still valid for " + url)
+            self.count (name, "revalidated")
+            self.touch (url, ttl)
+            return self.build_response (url, entry)
+
+        self.count (name, "misses")
+
+        if response.status_code == 200:
+            self.set (url, response, ttl)
+
+        return response
+
+
+    def count (self, name, event):
+        """
+        Adds one to the counter of an event on 'stats'
+
+        Args:
+            -> name: Name of the policy
+
+            -> event: "hits", "misses" or "revalidated"
+        """
+        with self.lock:
+            self.stats [name][event] += 1
+
+
+    def get (self, url):
+        """
+        Gets a stored response, even if it has expired
+
+        Args:
+            -> url: The URL
+
+        Returns:
+            -> A dictionary with the keys "headers", "body" and "expires", or None if
+                it's not stored
+        """
+        with self.lock:
+            row = self.db.execute ("SELECT headers, body, expires, last_used"
+                                    " FROM responses WHERE url = ?"
+                                    , (url,)
+                ).fetchone ()
+
+        if not row:
+            return None
+
+        # The order of the evictions doesn't need more precision
+        if time.time () - row [3] >= self.touch_interval:
+            self.touch (url)
+
+        return {
+            "headers": CaseInsensitiveDict (json.loads (row [0]))
+            , "body": row [1]
+            , "expires": row [2]
+        }
+
+
+    def set (self, url, response, ttl):
+        """
+        Stores a response, removing the least recently used ones if there's no room
+
+        Args:
+            -> url: The URL
+
+            -> response: The requests.Response
+
+            -> ttl: Seconds to keep it
+        """
+        logger = logging.getLogger (__name__ + ".set")
+
+        body = response.content
+        if len (body) > self.max_bytes:
+            return
+
+        # The body is stored already decoded
+        headers = { k: v for k, v in response.headers.items ()
+                        if k.lower () not in ("content-encoding", "content-length")
+        }
+        now = time.time ()
+
+        try:
+            with self.lock, self.db:
+                self.db.execute ("INSERT OR REPLACE INTO responses VALUES"
+                                " (?, ?, ?, ?, ?, ?)"
+                                , (url
+                                    , json.dumps (headers)
+                                    , body
+                                    , len (body)
+                                    , now + ttl
+                                    , now
+                                )
+                )
+                self.evict ()
+
+        except sqlite3.Error as e:
+            logger.warning ("Couldn't cache the response of " + url + " => " + str (e))
+
+
+    def touch (self, url, ttl = None):
+        """
+        Marks a stored response as just used, so it's the last one to be removed
+
+        Args:
+            -> url: The URL
+
+            -> ttl (optional): If it's provided, the response is also kept for this
+                    many seconds more (after it has been revalidated)
+        """
+        now = time.time ()
+
+        with self.lock, self.db:
+            if ttl:
+                self.db.execute ("UPDATE responses SET last_used = ?, expires = ?"
+                                " WHERE url = ?"
+                                , (now, now + ttl, url)
+                )
+            else:
+                self.db.execute ("UPDATE responses SET last_used = ? WHERE url = ?"
+                                , (now, url)
+                )
+
+
+    def evict (self):
+        """
+        Removes the least recently used responses until all of them fit on 'max_bytes'.
+        Must be called with 'lock' held
+        """
+        total = self.db.execute ("SELECT TOTAL (size) FROM responses").fetchone () [0]
+        if total <= self.max_bytes:
+            return
+
+        removed = []
+        for url, size in self.db.execute ("SELECT url, size FROM responses"
+                                            " ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+
+            removed.append ((url,))
+            total -= size
+
+        self.db.executemany ("DELETE FROM responses WHERE url = ?", removed)
+
+
+    @staticmethod
+    def build_response (url, entry):
+        """
+        Creates a requests.Response with a stored response
+
+        Args:
+            -> url: The URL
+
+            -> entry: The stored response, as returned by get()
+
+        Returns:
+            -> The requests.Response
+        """
+        response = Response ()
+        response.url = url
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = entry ["headers"]
+        response._content = entry ["body"]
+        response.encoding = get_encoding_from_headers (entry ["headers"]) or "utf-8"
+
+        return response
+
+
+    def close (self):
+        """
+        Closes the database
+        """
+        with self.lock:
+            self.db.close ()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Decoding of the JSON responses, with the fastest library available.
+"""
+import json \
+    , logging
+
+
+"""
+Functions to decode a JSON document (str or bytes), by the name of their library.
+The optional libraries are only added if they're installed.
+"""
+BACKENDS = { "json": json.loads }
+
+try:
+    import orjson
+    BACKENDS ["orjson"] = orjson.loads
+except ImportError:
+    pass
+
+try:
+    import ujson
+    BACKENDS ["ujson"] = ujson.loads
+except ImportError:
+    pass
+
+
+"""
+Order of preference of the libraries, when none is explicitly chosen
+"""
+PREFERENCE = ["orjson", "ujson", "json"]
+
+
+def get_decoder (name = None):
+    """
+    Gets the function to decode JSON documents
+
+    Args:
+        -> name (optional): Name of the library to use (one of BACKENDS). By default, the
+                fastest one installed
+
+    Returns:
+        -> A tuple (name, function)
+    """
+    logger = logging.getLogger (__name__ + ".get_decoder")
+
+    if name:
+        if name in BACKENDS:
+            return (name, BACKENDS [name])
+
+        logger.warning ("JSON library '" + name + "' not available. Using the default")
+
+    for name in PREFERENCE:
+        if name in BACKENDS:
+            return (name, BACKENDS [name])
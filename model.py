@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compact representation of the tweets and users, to keep lots of them in memory.
+
+The objects can still be read like the dictionaries described on the README.md (for
+example, tweet ["stats"]["likes"] or tweet ["user"]["username"]), and to_dict() converts
+them to those same dictionaries.
+"""
+
+
+class Compact:
+    """
+    Base class for objects that can be read as dictionaries.
+    Every subclass must define '__slots__' with the keys of the dictionary.
+    """
+    __slots__ = ()
+
+    def __getitem__ (self, key):
+        try:
+            return getattr (self, key)
+        except (AttributeError, TypeError):
+            raise KeyError (key)
+
+
+    def __contains__ (self, key):
+        return key in self.__slots__ and hasattr (self, key)
+
+
+    def get (self, key, default = None):
+        try:
+            return self [key]
+        except KeyError:
+            return default
+
+
+    def keys (self):
+        return [ k for k in self.__slots__ if hasattr (self, k) ]
+
+
+    def to_dict (self):
+        """
+        Converts the object to a dictionary
+
+        Returns:
+            -> A dictionary with the same keys and values (also converted, if needed)
+        """
+        data = {}
+
+        for k in self.__slots__:
+            if hasattr (self, k):
+                v = getattr (self, k)
+                data [k] = v.to_dict () if isinstance (v, Compact) else v
+
+        return data
+
+
+class TweetStats (Compact):
+    """
+    Number of interactions with a tweet
+    """
+    __slots__ = ("likes", "retweets", "replies")
+
+    def __init__ (self, likes, retweets, replies):
+        self.likes = likes
+        self.retweets = retweets
+        self.replies = replies
+
+
+class UserProfile (Compact):
+    """
+    Profile of a user, with the same fields as each user on Scraper.scraped_info (without
+    the tweets nor the cursors).
+    The tweets of the same user share the same object.
+    """
+    __slots__ = ("id", "rest_id", "created_at", "description", "fast_followers_count"
+                , "favourites_count", "followers_count", "friends_count"
+                , "has_custom_timelines", "is_translator", "listed_count", "location"
+                , "media_count", "name", "normal_followers_count", "pinned_tweet_ids_str"
+                , "profile_image_url", "protected", "screen_name", "statuses_count"
+                , "translator_type", "url", "verified"
+    )
+
+    def __init__ (self, **fields):
+        for k in self.__slots__:
+            setattr (self, k, fields.get (k))
+
+
+    @classmethod
+    def from_dict (cls, profile):
+        """
+        Creates the object from one of the users on Scraper.scraped_info
+
+        Args:
+            -> profile: Dictionary with the profile (any other key is ignored)
+
+        Returns:
+            -> A new UserProfile
+        """
+        return cls (** { k: profile.get (k) for k in cls.__slots__ })
+
+
+    def tweet_user (self):
+        """
+        Gets the info of the user as it's shown on the "user" key of a tweet
+
+        Returns:
+            -> A dictionary with the keys "username", "displayname", "uid" and "avatar"
+        """
+        return {
+            "username": self.screen_name
+            , "displayname": self.name
+            , "uid": self.id
+            , "avatar": self.profile_image_url
+        }
+
+
+class Tweet (Compact):
+    """
+    A tweet. Instead of a copy of its owner's info, it has a reference to its
+    UserProfile ('author'), which is shown as the "user" key.
+    """
+    __slots__ = ("tweet_id", "profile_pic", "permalink", "stats", "text", "tweet_age"
+                , "pinned", "conversation", "author", "retweet", "retweet_info"
+                , "quoted_id"
+    )
+
+    def __init__ (self, tweet_id, permalink, stats, text, tweet_age, pinned
+                    , conversation, author, retweet = False, retweet_info = None
+                    , quoted_id = None, profile_pic = None):
+        self.tweet_id = tweet_id
+        self.profile_pic = profile_pic
+        self.permalink = permalink
+        self.stats = stats
+        self.text = text
+        self.tweet_age = tweet_age
+        self.pinned = pinned
+        self.conversation = conversation
+        self.author = author
+        self.retweet = retweet
+
+        # Only if it's a retweet, as on the dictionaries
+        if retweet_info is not None:
+            self.retweet_info = retweet_info
+
+        # Only if it quotes another tweet
+        if quoted_id is not None:
+            self.quoted_id = quoted_id
+
+
+    def __getitem__ (self, key):
+        if key == "user":
+            return self.author.tweet_user ()
+
+        if key == "author":
+            raise KeyError (key)
+
+        return super ().__getitem__ (key)
+
+
+    def __contains__ (self, key):
+        return key == "user" or (key != "author" and super ().__contains__ (key))
+
+
+    def keys (self):
+        return [ ("user" if k == "author" else k) for k in super ().keys () ]
+
+
+    def to_dict (self):
+        """
+        Converts the tweet to a dictionary, with the format described on the README.md
+
+        Returns:
+            -> A dictionary with the tweet
+        """
+        data = {}
+
+        for k in self.__slots__:
+            if k == "author":
+                data ["user"] = self.author.tweet_user ()
+            elif hasattr (self, k):
+                v = getattr (self, k)
+                data [k] = v.to_dict () if isinstance (v, Compact) else v
+
+        return data
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Desktop notifications of the new tweets, sent from their own thread so a slow
+notification server never delays the polls.
+"""
+import logging \
+    , queue \
+    , threading \
+    , time
+
+from collections import OrderedDict
+
+
+class FakeBackend:
+    """
+    Backend that only keeps the notifications on 'shown', as tuples (title, message),
+    instead of showing them. Useful to test the dispatcher
+    """
+
+    def __init__ (self, delay = 0):
+        """
+        Args:
+            -> delay (optional): Seconds to wait on each notification, to simulate a
+                    slow notification server
+        """
+        self.delay = delay
+        self.shown = []
+
+
+    def show (self, title, message):
+        if self.delay:
+            time.sleep (self.delay)
+
+        self.shown.append ((title, message))
+
+
+class NotificationDispatcher:
+    """
+    Receives the new tweets of each user (with submit(), which never blocks) and shows
+    them on a background thread, through a backend with a method show (title, message).
+
+    The tweets received during 'window' seconds are shown on a single notification per
+    user (or per group of users, see 'group'), instead of one per tweet. A tweet already
+    notified (for example, the same retweet from two users of a group) is dropped.
+    """
+
+    """
+    Seconds to wait for more tweets before showing the notification
+    """
+    window = 5
+
+    """
+    Maximum number of tweets whose text is shown on a notification
+    """
+    max_tweets = 3
+
+    """
+    Number of notified tweets to remember, to drop them if they come again
+    """
+    history_size = 10000
+
+    def __init__ (self, backend, window = None, max_tweets = None, group = None
+                    , format_text = None):
+        """
+        Starts the thread that shows the notifications.
+
+        Args:
+            -> backend: Object that shows the notifications, with a method
+                    show (title, message)
+
+            -> window (optional): Seconds to wait for more tweets before showing them
+
+            -> max_tweets (optional): Maximum number of tweets whose text is shown on a
+                    notification
+
+            -> group (optional): Function that receives the name of a user and returns
+                    the name of its group, to show the tweets of all the users of a group
+                    on the same notification. By default, each user has its own
+
+            -> format_text (optional): Function that receives a tweet and returns the
+                    text to show. By default, its "text"
+        """
+        self.backend = backend
+
+        if window is not None:
+            self.window = window
+
+        if max_tweets:
+            self.max_tweets = max_tweets
+
+        self.group = group
+        self.format_text = format_text if format_text else (lambda t: t ["text"])
+
+        self.queue = queue.Queue ()
+
+        # Group -> (time of its first tweet, {tweet_id: (user, tweet)})
+        self.pending = {}
+
+        # IDs of the tweets already notified, from oldest to newest
+        self.notified = OrderedDict ()
+
+        self.thread = threading.Thread (target = self.run
+                                        , name = "notifications"
+                                        , daemon = True
+        )
+        self.thread.start ()
+
+
+    def submit (self, user, tweets):
+        """
+        Queues the new tweets of a user to be notified
+
+        Args:
+            -> user: Name of the user
+
+            -> tweets: List with the new tweets (dictionaries or model.Tweet)
+        """
+        if tweets:
+            self.queue.put ((user, list (tweets)))
+
+
+    def close (self):
+        """
+        Shows the notifications still pending and stops the thread
+        """
+        self.queue.put (None)
+        self.thread.join ()
+
+
+    def run (self):
+        """
+        Main loop of the thread: collects the tweets and shows the notifications once
+        their window has passed
+        """
+        while True:
+            timeout = None
+            if self.pending:
+                first = min (started for started, _ in self.pending.values ())
+                timeout = max (0, first + self.window - time.monotonic ())
+
+            try:
+                item = self.queue.get (timeout = timeout)
+            except queue.Empty:
+                item = False
+
+            if item is None:
+                self.flush (everything = True)
+                return
+
+            if item:
+                self.collect (*item)
+
+            self.flush ()
+
+
+    def collect (self, user, tweets):
+        """
+        Adds the tweets of a user to the pending notification of its group, dropping
+        those already notified or pending
+        """
+        key = self.group (user) if self.group else user
+
+        if key not in self.pending:
+            self.pending [key] = (time.monotonic (), OrderedDict ())
+
+        pending = self.pending [key][1]
+
+        for tweet in tweets:
+            # Each retweet has its own ID, but they all show the same original tweet
+            tweet_id = tweet ["tweet_id"]
+            if tweet ["retweet"]:
+                tweet_id = tweet ["retweet_info"].get ("original_id", tweet_id)
+
+            if tweet_id not in self.notified and tweet_id not in pending:
+                pending [tweet_id] = (user, tweet)
+
+        if not pending:
+            del self.pending [key]
+
+
+    def flush (self, everything = False):
+        """
+        Shows the pending notifications whose window has passed
+
+        Args:
+            -> everything (optional): If True, shows all the pending notifications
+        """
+        now = time.monotonic ()
+
+        for key in list (self.pending):
+            started, tweets = self.pending [key]
+
+            if everything or now >= started + self.window:
+                del self.pending [key]
+                self.notify (key, tweets)
+
+
+    def notify (self, key, tweets):
+        """
+        Shows the notification with the tweets of a user (or group)
+
+        Args:
+            -> key: Name of the user or group
+
+            -> tweets: Dictionary with the tuples (user, tweet) by the ID of the tweet
+        """
+        logger = logging.getLogger (__name__ + ".notify")
+
+        for tweet_id in tweets:
+            self.notified [tweet_id] = True
+
+        while len (self.notified) > self.history_size:
+            self.notified.popitem (last = False)
+
+        users = list (OrderedDict.fromkeys (u for u, _ in tweets.values ()))
+        count = len (tweets)
+
+        if self.group:
+            title = str (count) + " new tweets on " + key
+        else:
+            title = str (count) + " new tweets from @" + key
+
+        if count == 1:
+            title = "New tweet from @" + users [0]
+
+        lines = []
+        for user, tweet in list (tweets.values ()) [:self.max_tweets]:
+            text = self.format_text (tweet)
+            lines.append (("@" + user + ": " + text) if len (users) > 1 else text)
+
+        if count > self.max_tweets:
+            lines.append ("(and " + str (count - self.max_tweets) + " more)")
+
+        try:
+            self.backend.show (title, "\n\n".join (lines))
+        except Exception as e:
+            logger.error ("Couldn't show the notification => " + str (e))
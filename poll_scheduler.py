@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Scheduling of the polls for new tweets, more often for the users that post more often.
+"""
+import logging \
+    , heapq \
+    , random \
+    , threading \
+    , time
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def posting_rate (ages):
+    """
+    Estimates how often a user posts, from the dates of some of its tweets
+
+    Args:
+        -> ages: List with the age of the tweets, in UNIX epoch format
+
+    Returns:
+        -> The number of tweets per second, or None if there aren't enough tweets
+    """
+    if len (ages) < 2:
+        return None
+
+    span = max (ages) - min (ages)
+    if span <= 0:
+        return None
+
+    return (len (ages) - 1) / span
+
+
+class PollScheduler:
+    """
+    Polls each user when it's more likely to have new tweets: the time until its next poll
+    is the time it takes, at its posting rate, to post one tweet (between 'min_interval'
+    and 'max_interval', and randomly moved up to 'jitter' of it, so the polls don't pile
+    up at the same time).
+
+    The posting rate of each user is a moving average of the new tweets found on each poll
+    per second since the previous one, so the interval adapts when the user posts more
+    (or less) often.
+
+    The users are kept on a heap, by the time of their next poll. The polls that are due
+    are performed by a pool of 'workers' threads, so a slow user doesn't delay the rest;
+    and a user is never polled again until its previous poll has finished.
+    """
+
+    """
+    Minimum and maximum seconds between two polls of the same user
+    """
+    min_interval = 60
+    max_interval = 60 * 60
+
+    """
+    Maximum fraction of the interval to move each poll, randomly
+    """
+    jitter = 0.1
+
+    """
+    Weight of the last poll on the moving average of the posting rate
+    """
+    smoothing = 0.3
+
+    """
+    Number of polls to perform at the same time
+    """
+    workers = 4
+
+    def __init__ (self, poll, min_interval = None, max_interval = None, jitter = None
+                    , workers = None):
+        """
+        Args:
+            -> poll: Function that polls a user, receiving its name and returning the
+                    number of new tweets found (or None, if there was an error)
+
+            -> min_interval (optional): Minimum seconds between two polls of a user
+
+            -> max_interval (optional): Maximum seconds between two polls of a user
+
+            -> jitter (optional): Maximum fraction of the interval to move each poll
+
+            -> workers (optional): Number of polls to perform at the same time
+        """
+        self.poll = poll
+
+        if min_interval is not None:
+            self.min_interval = min_interval
+
+        if max_interval is not None:
+            self.max_interval = max (max_interval, self.min_interval)
+
+        if jitter is not None:
+            self.jitter = jitter
+
+        if workers:
+            self.workers = workers
+
+        # (time of the next poll, sequence number, user). The sequence number keeps the
+        # order of the users with the same time
+        self.heap = []
+        self.sequence = 0
+
+        # Tweets per second, and time of the last poll, of each user
+        self.rates = {}
+        self.last_poll = {}
+
+        self.condition = threading.Condition ()
+        self.running = False
+
+
+    def add (self, user, rate = None):
+        """
+        Adds a user to poll. Its first poll is after the interval given by 'rate'
+
+        Args:
+            -> user: Name of the user
+
+            -> rate (optional): Estimated tweets per second of the user (see
+                    posting_rate()). By default, its first poll is after 'min_interval'
+        """
+        now = time.time ()
+
+        with self.condition:
+            self.rates [user] = rate
+            self.last_poll [user] = now
+            self.push (user, now + self.interval (user))
+
+
+    def interval (self, user):
+        """
+        Computes the seconds until the next poll of a user
+
+        Args:
+            -> user: Name of the user
+
+        Returns:
+            -> The seconds, with the jitter already applied
+        """
+        rate = self.rates.get (user)
+
+        if rate is None:
+            interval = self.min_interval
+        elif rate <= 0:
+            interval = self.max_interval
+        else:
+            interval = 1 / rate
+
+        interval = min (max (interval, self.min_interval), self.max_interval)
+
+        return interval * (1 + random.uniform (-self.jitter, self.jitter))
+
+
+    def push (self, user, due):
+        """
+        Schedules the next poll of a user. Must be called with 'condition' held
+        """
+        heapq.heappush (self.heap, (due, self.sequence, user))
+        self.sequence += 1
+        self.condition.notify ()
+
+
+    def done (self, user, started, new_tweets):
+        """
+        Updates the posting rate of a user after a poll, and schedules the next one
+
+        Args:
+            -> user: Name of the user
+
+            -> started: Time when the poll started, in UNIX epoch format
+
+            -> new_tweets: Number of new tweets found (None, if there was an error)
+        """
+        with self.condition:
+            elapsed = started - self.last_poll [user]
+            self.last_poll [user] = started
+
+            if elapsed > 0:
+                observed = (new_tweets or 0) / elapsed
+                previous = self.rates.get (user)
+
+                if previous is None:
+                    self.rates [user] = observed
+                else:
+                    self.rates [user] = self.smoothing * observed \
+                                        + (1 - self.smoothing) * previous
+
+            if self.running:
+                self.push (user, time.time () + self.interval (user))
+
+
+    def run (self):
+        """
+        Polls the users until stop() is called (from another thread, or a signal
+        handler) or the thread is interrupted
+        """
+        logger = logging.getLogger (__name__ + ".run")
+
+        def work (user):
+            started = time.time ()
+            new_tweets = None
+
+            try:
+                new_tweets = self.poll (user)
+            except Exception as e:
+                logger.error ("Error polling '" + user + "' => " + str (e))
+
+            self.done (user, started, new_tweets)
+
+        self.running = True
+        executor = ThreadPoolExecutor (max_workers = self.workers)
+
+        try:
+            with self.condition:
+                while self.running:
+                    if not self.heap:
+                        self.condition.wait ()
+                        continue
+
+                    due, _, user = self.heap [0]
+                    wait = due - time.time ()
+
+                    if wait > 0:
+                        self.condition.wait (wait)
+                        continue
+
+                    heapq.heappop (self.heap)
+                    logger.info ("Polling '" + user + "' (" + str (len (self.heap))
+                                + " users waiting)"
+                    )
+                    executor.submit (work, user)
+
+        finally:
+            self.running = False
+            executor.shutdown (wait = False, cancel_futures = True)
+
+
+    def stop (self):
+        """
+        Stops run(). The polls in progress are not interrupted
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify ()
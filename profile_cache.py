@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache for the users' profiles, so their REST ids don't have to be requested
+again on every run.
+"""
+import logging \
+    , json \
+    , time \
+    , sqlite3 \
+    , threading
+
+from cache_files import default_path, connect
+
+
+class ProfileCache:
+    """
+    Stores the profile of each user (the same fields as on Scraper.scraped_info, without
+    the tweets) on a SQLite database, indexed by their handle.
+
+    The REST id of a user never changes, so it's kept for a long time; but the rest of the
+    profile (like 'followers_count') becomes outdated way before, so it has its own TTL.
+    """
+
+    """
+    Seconds before a cached REST id has to be requested again
+    """
+    id_ttl = 30 * 24 * 60 * 60
+
+    """
+    Seconds before the rest of a cached profile has to be requested again
+    """
+    profile_ttl = 24 * 60 * 60
+
+    def __init__ (self, path = None, id_ttl = None, profile_ttl = None):
+        """
+        Opens (and creates, if needed) the database.
+
+        Args:
+            -> path (optional): Path of the SQLite database. By default,
+                    'tweet-feed/profiles.sqlite3' inside $XDG_CACHE_HOME (or ~/.cache)
+
+            -> id_ttl (optional): Seconds to keep the REST ids
+
+            -> profile_ttl (optional): Seconds to keep the rest of the profile
+        """
+        if not path:
+            path = default_path ("profiles.sqlite3")
+
+        self.path = path
+
+        if id_ttl is not None:
+            self.id_ttl = id_ttl
+
+        if profile_ttl is not None:
+            self.profile_ttl = profile_ttl
+
+        # Held while using the connection
+        self.lock = threading.Lock ()
+        self.db = connect (path)
+
+        with self.lock, self.db:
+            self.db.execute ("CREATE TABLE IF NOT EXISTS profiles ("
+                            " screen_name TEXT PRIMARY KEY COLLATE NOCASE"
+                            " , rest_id TEXT NOT NULL"
+                            " , id_time REAL NOT NULL"
+                            " , profile TEXT NOT NULL"
+                            " , profile_time REAL NOT NULL"
+                            ")"
+            )
+
+
+    def get (self, screen_name, allow_stale = False):
+        """
+        Gets the cached profile of a user
+
+        Args:
+            -> screen_name: The handler of the user
+
+            -> allow_stale (optional): If True, the profile is returned even if it has
+                    expired, as long as its REST id hasn't
+
+        Returns:
+            -> A dictionary with the profile, or None if it's not cached (or it has
+                expired)
+        """
+        with self.lock:
+            row = self.db.execute ("SELECT rest_id, id_time, profile, profile_time"
+                                    " FROM profiles WHERE screen_name = ?"
+                                    , (screen_name,)
+                ).fetchone ()
+
+        if not row:
+            return None
+
+        rest_id, id_time, profile, profile_time = row
+        now = time.time ()
+
+        if (now - id_time) > self.id_ttl:
+            return None
+
+        if (now - profile_time) > self.profile_ttl and not allow_stale:
+            return None
+
+        profile = json.loads (profile)
+        profile ["rest_id"] = rest_id
+
+        return profile
+
+
+    def get_rest_id (self, screen_name):
+        """
+        Gets the cached REST id of a user, even if the rest of its profile has expired
+
+        Args:
+            -> screen_name: The handler of the user
+
+        Returns:
+            -> The REST id, or None if it's not cached (or it has expired)
+        """
+        profile = self.get (screen_name, allow_stale = True)
+        return profile ["rest_id"] if profile else None
+
+
+    def set (self, screen_name, profile):
+        """
+        Stores the profile of a user
+
+        Args:
+            -> screen_name: The handler of the user
+
+            -> profile: Dictionary with the profile (with, at least, the key "rest_id").
+                    The keys "tweets" and "cursor" are not stored
+        """
+        logger = logging.getLogger (__name__ + ".set")
+
+        data = { k: v for k, v in profile.items ()
+                    if k not in ("rest_id", "tweets", "cursor")
+        }
+        now = time.time ()
+
+        try:
+            with self.lock, self.db:
+                self.db.execute ("INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?)"
+                                , (screen_name
+                                    , profile ["rest_id"]
+                                    , now
+                                    , json.dumps (data)
+                                    , now
+                                )
+                )
+        except sqlite3.Error as e:
+            logger.warning ("Couldn't cache the profile of " + screen_name + " => "
+                            + str (e)
+            )
+
+
+    def close (self):
+        """
+        Closes the database
+        """
+        with self.lock:
+            self.db.close ()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pacing of the requests to each endpoint of the API, to keep them under its rate limit
+instead of sending them until the server rejects them.
+"""
+import logging \
+    , re \
+    , time \
+    , threading
+
+
+class TokenBucket:
+    """
+    Bucket with up to 'capacity' requests, refilled at 'rate' requests per second.
+    Each request takes one of them.
+    """
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__ (self, capacity, rate, now):
+        """
+        Args:
+            -> capacity: Maximum number of requests on the bucket (it starts full)
+
+            -> rate: Requests added to the bucket per second
+
+            -> now: Current UNIX epoch
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+
+    def refill (self, now):
+        """
+        Adds the requests earned since the last refill
+
+        Args:
+            -> now: Current UNIX epoch
+        """
+        if now > self.updated:
+            self.tokens = min (self.capacity
+                                , self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+
+    def take (self, now):
+        """
+        Takes a request from the bucket, if there's any
+
+        Args:
+            -> now: Current UNIX epoch
+
+        Returns:
+            -> 0 if the request was taken, or the seconds to wait until there's one
+        """
+        self.refill (now)
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Keeps a TokenBucket for each endpoint of the API, sized from the 'x-rate-limit-limit'
+    header of its responses: it holds the requests allowed on a rate limit 'window' (with
+    all the 'scale' guest tokens, as each one has its own limit) and is refilled at the
+    pace that spends them on that time. The 'x-rate-limit-remaining' header (also scaled)
+    empties it when the server counts less requests left.
+
+    Before sending a request, acquire() waits until its endpoint has room for it, so a
+    long run keeps going at the highest pace the limits allow, instead of failing once
+    they're reached. The endpoints whose limits are still unknown are never delayed.
+    """
+
+    """
+    Seconds of the rate limit windows of the API
+    """
+    window = 15 * 60
+
+    def __init__ (self, scale = 1, window = None):
+        """
+        Args:
+            -> scale (optional): Number of guest tokens whose limits are added up
+
+            -> window (optional): Seconds of the rate limit windows
+        """
+        self.scale = scale
+
+        if window:
+            self.window = window
+
+        self.lock = threading.Lock ()
+        self.buckets = {}
+
+
+    @staticmethod
+    def endpoint (url):
+        """
+        Gets the endpoint of a URL, to share the same bucket with all the URLs that only
+        differ on their parameters (the query string and the IDs on the path)
+
+        Args:
+            -> url: The URL
+
+        Returns:
+            -> The endpoint
+        """
+        path = url.split ("?", 1) [0]
+        return re.sub (r"/\d+(\.json)?$", r"/:id\1", path)
+
+
+    def acquire (self, url):
+        """
+        Waits until a request to the endpoint of 'url' can be sent, and takes it from
+        the bucket
+
+        Args:
+            -> url: The URL that will be requested
+
+        Returns:
+            -> The seconds waited
+        """
+        logger = logging.getLogger (__name__ + ".acquire")
+
+        endpoint = self.endpoint (url)
+        waited = 0
+
+        while True:
+            with self.lock:
+                bucket = self.buckets.get (endpoint)
+                if not bucket:
+                    return waited
+
+                wait = bucket.take (time.time ())
+
+            if not wait:
+                return waited
+
+            logger.info ("Rate limit of " + endpoint + " reached. Waiting "
+                        + "{0:.1f}".format (wait) + " seconds"
+            )
+            time.sleep (wait)
+            waited += wait
+
+
+    def update (self, url, status, headers):
+        """
+        Updates the bucket of an endpoint with the rate limit headers of a response
+
+        Args:
+            -> url: The URL that was requested
+
+            -> status: HTTP status code of the response
+
+            -> headers: Headers of the response
+        """
+        logger = logging.getLogger (__name__ + ".update")
+
+        try:
+            limit = int (headers ["x-rate-limit-limit"])
+            remaining = int (headers.get ("x-rate-limit-remaining", limit))
+        except KeyError:
+            return
+        except ValueError as e:
+            logger.warning ("Invalid rate limit headers => " + str (e))
+            return
+
+        if limit <= 0:
+            return
+
+        endpoint = self.endpoint (url)
+        now = time.time ()
+        capacity = limit * self.scale
+
+        with self.lock:
+            bucket = self.buckets.get (endpoint)
+
+            if not bucket:
+                bucket = self.buckets [endpoint] = TokenBucket (capacity
+                                                                , capacity / self.window
+                                                                , now
+                )
+            elif bucket.capacity != capacity:
+                bucket.refill (now)
+                bucket.capacity = capacity
+                bucket.rate = capacity / self.window
+
+            bucket.refill (now)
+            bucket.tokens = min (bucket.tokens, remaining * self.scale)
+
+            if status == 429:
+                bucket.tokens = min (bucket.tokens, 0)
+
+
+    def budget (self):
+        """
+        Gets the requests that can be sent right now to each endpoint
+
+        Returns:
+            -> A dictionary with a dictionary for each endpoint with the keys "available"
+                (requests that can be sent now), "capacity" and "rate" (requests
+                recovered per second)
+        """
+        now = time.time ()
+
+        with self.lock:
+            for bucket in self.buckets.values ():
+                bucket.refill (now)
+
+            return { endpoint: {
+                        "available": int (bucket.tokens)
+                        , "capacity": bucket.capacity
+                        , "rate": bucket.rate
+                    }
+                    for endpoint, bucket in self.buckets.items ()
+            }
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Conversion of the text of the tweets to the formats shown by the CLI.
+"""
+import html \
+    , re \
+    , threading
+
+from collections import OrderedDict
+
+
+"""
+Mentions and hashtags, as [~~@~~**<username>**](/<username>)
+"""
+MENTION = r"\[~~(?P<prefix>[@#])~~\*\*(?P<name>[^*]+)\*\*\]\((?P<path>[^)]+)\)"
+
+"""
+Every construction that has to be rewritten on each mode, on a single pattern so the
+text is processed in one pass. Only the named group of the matched alternative is set
+"""
+MARKDOWN_RE = re.compile (MENTION)
+PLAIN_RE = re.compile (
+    MENTION
+    # Images, as ![<alt text>](<url>)
+    + r"|!\[(?P<alt>[^\]]*)\]\([^)]*\)"
+    # Links, as [<text>](<url>)
+    + r"|\[(?P<link>[^\]]*)\]\([^)]*\)"
+    # Bold and strike-through text
+    + r"|\*\*(?P<bold>[^*]+)\*\*|~~(?P<strike>[^~]+)~~"
+    # HTML entities, like &amp;
+    + r"|(?P<entity>&(?:#\d+|#[xX][0-9a-fA-F]+|[A-Za-z]+);)"
+)
+
+"""
+Links to pictures, which are shown as full URLs
+"""
+PICTURE_RE = re.compile (r"pic\.twitter\.com/.+")
+
+"""
+Final new lines
+"""
+TRAILING_RE = re.compile (r"\n+$")
+
+
+"""
+Available modes: (strip, indent)
+    - strip: If True, removes all formatting (links, images...), leaving only the text
+    - indent: If True, adds a tab before each line
+"""
+MODES = {
+    "markdown": (False, False)
+    , "markdown_indented": (False, True)
+    , "plain": (True, False)
+    , "plain_indented": (True, True)
+}
+
+
+def render_text (text, mode = "plain"):
+    """
+    Converts the text of a tweet, fixing the links to mentions and hashtags (Twitter
+    uses paths relative to its root) and, if the mode says so, removing the formatting
+    and indenting it
+
+    Args:
+        -> text: The text of the tweet
+
+        -> mode (optional): One of MODES
+
+    Returns:
+        -> The converted text
+    """
+    strip, indent = MODES [mode]
+
+    def replace (match):
+        kind = match.lastgroup
+
+        if kind == "path":
+            if strip:
+                return match.group ("prefix") + match.group ("name")
+
+            return "[{0}{1}](https://twitter.com{2})".format (match.group ("prefix")
+                                                            , match.group ("name")
+                                                            , match.group ("path")
+            )
+
+        value = match.group (kind).replace ("\n", "")
+
+        if kind == "entity":
+            return html.unescape (value)
+
+        if kind in ("alt", "link") and PICTURE_RE.search (value):
+            return "https://" + value
+
+        return value
+
+    text = (PLAIN_RE if strip else MARKDOWN_RE).sub (replace, text)
+    text = TRAILING_RE.sub ("", text)
+
+    if indent:
+        text = "\t" + text.replace ("\n", "\n\t")
+
+    return text
+
+
+class TweetRenderer:
+    """
+    Renders the text of the tweets (see render_text()), keeping the last 'cache_size'
+    results by the ID of the tweet and the mode, so each tweet is only converted once
+    even if it's shown many times (for example, on the terminal and on a notification)
+    """
+
+    """
+    Number of rendered texts to keep
+    """
+    cache_size = 10000
+
+    def __init__ (self, cache_size = None):
+        """
+        Args:
+            -> cache_size (optional): Number of rendered texts to keep
+        """
+        if cache_size is not None:
+            self.cache_size = cache_size
+
+        self.lock = threading.Lock ()
+        self.cache = OrderedDict ()
+
+
+    def render (self, tweet, mode = "plain"):
+        """
+        Renders the text of a tweet
+
+        Args:
+            -> tweet: The tweet (a dictionary or a model.Tweet)
+
+            -> mode (optional): One of MODES
+
+        Returns:
+            -> The rendered text
+        """
+        key = (tweet ["tweet_id"], mode)
+
+        with self.lock:
+            text = self.cache.get (key)
+            if text is not None:
+                self.cache.move_to_end (key)
+                return text
+
+        text = render_text (tweet ["text"], mode)
+
+        with self.lock:
+            self.cache [key] = text
+            while len (self.cache) > self.cache_size:
+                self.cache.popitem (last = False)
+
+        return text
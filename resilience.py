@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Handling of the failed requests: which errors are worth retrying, how to retry them and
+when to stop trying with a user that keeps failing.
+"""
+import logging \
+    , random \
+    , time \
+    , threading
+
+import requests
+
+
+class FetchError (Exception):
+    """
+    A request that couldn't be completed. The original exception is on '__cause__'
+    """
+
+    """
+    If True, the same request may work if it's sent again later
+    """
+    transient = False
+
+    """
+    If True, the error comes from something shared by every user (like the guest
+    tokens), so it doesn't count against the user whose data was requested
+    """
+    shared = False
+
+
+class TransientError (FetchError):
+    """
+    Timeouts, connection errors, overloaded servers (5xx), rate limits (429) and
+    truncated or invalid responses
+    """
+    transient = True
+
+
+class TokenPoolError (TransientError):
+    """
+    Every guest token of the pool was rejected (with the error codes of an invalid or
+    expired token) or rate limited (429), or no token could be obtained. It affects
+    every user, until new tokens are available. Any other 401 or 403 is a PermanentError
+    of the requested user (like a protected or suspended account)
+    """
+    shared = True
+
+
+class PermanentError (FetchError):
+    """
+    Requests that the server rejects (4xx), and any other unexpected error
+    """
+    transient = False
+
+
+def classify (error):
+    """
+    Decides if an error is worth retrying
+
+    Args:
+        -> error: The exception raised while performing a request
+
+    Returns:
+        -> TransientError or PermanentError
+    """
+    if isinstance (error, FetchError):
+        return type (error)
+
+    if isinstance (error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        if status is None or status == 429 or status >= 500:
+            return TransientError
+
+        return PermanentError
+
+    if isinstance (error, (requests.Timeout, requests.ConnectionError
+                            , requests.exceptions.ChunkedEncodingError
+                            , requests.exceptions.ContentDecodingError
+                            # Truncated JSON, or an HTML error page
+                            , ValueError
+                    )):
+        return TransientError
+
+    return PermanentError
+
+
+class RetryPolicy:
+    """
+    Sends a request up to 'attempts' times while it fails with a TransientError, waiting
+    longer after each failure (exponentially, from 'base_delay' up to 'max_delay' seconds,
+    with some random jitter so the retries of many users aren't sent at the same time).
+    The timeout also grows on each attempt, up to 'max_timeout' seconds.
+    """
+
+    """
+    Maximum number of times to send the request
+    """
+    attempts = 3
+
+    """
+    Seconds to wait after the first failure (doubled after each one), and maximum
+    """
+    base_delay = 1
+    max_delay = 30
+
+    """
+    Maximum timeout of the request, in seconds
+    """
+    max_timeout = 120
+
+    def __init__ (self, attempts = None, base_delay = None, max_delay = None
+                    , max_timeout = None):
+        """
+        Args:
+            -> attempts (optional): Maximum number of times to send the request
+
+            -> base_delay (optional): Seconds to wait after the first failure
+
+            -> max_delay (optional): Maximum seconds to wait between two attempts
+
+            -> max_timeout (optional): Maximum timeout of the request
+        """
+        if attempts:
+            self.attempts = attempts
+
+        if base_delay is not None:
+            self.base_delay = base_delay
+
+        if max_delay is not None:
+            self.max_delay = max_delay
+
+        if max_timeout:
+            self.max_timeout = max_timeout
+
+
+    def call (self, request, timeout):
+        """
+        Performs a request, retrying it if needed
+
+        Args:
+            -> request: Function that performs the request, receiving its timeout
+
+            -> timeout: Timeout of the first attempt, in seconds
+
+        Returns:
+            -> The value returned by 'request'
+
+        Raises:
+            -> TransientError, if every attempt failed; or PermanentError, as soon as
+                an attempt fails with an error that isn't worth retrying
+        """
+        logger = logging.getLogger (__name__ + ".call")
+
+        for attempt in range (self.attempts):
+            try:
+                return request (min (timeout * (2 ** attempt), self.max_timeout))
+
+            except Exception as e:
+                error = classify (e)
+
+                if error is PermanentError or attempt == self.attempts - 1:
+                    raise error (str (e)) from e
+
+                delay = min (self.base_delay * (2 ** attempt), self.max_delay)
+                delay *= random.uniform (0.5, 1)
+
+                logger.info ("Attempt " + str (attempt + 1) + " failed => " + str (e)
+                            + ". Trying again in " + "{0:.1f}".format (delay) + " seconds"
+                )
+                time.sleep (delay)
+
+
+class CircuitBreaker:
+    """
+    Counts the consecutive failures of each user (but not the 'shared' ones, like a
+    TokenPoolError). After 'threshold' of them (or a PermanentError), the circuit of the
+    user is "open": its requests are skipped for 'cooldown' seconds. After that, one
+    request is allowed: if it works, the circuit is closed again; if it fails, it's
+    opened for twice the time (up to 'max_cooldown').
+    """
+
+    """
+    Consecutive failures to open the circuit
+    """
+    threshold = 3
+
+    """
+    Seconds to skip the user after opening its circuit, and maximum
+    """
+    cooldown = 5 * 60
+    max_cooldown = 6 * 60 * 60
+
+    def __init__ (self, threshold = None, cooldown = None, max_cooldown = None):
+        """
+        Args:
+            -> threshold (optional): Consecutive failures to open the circuit
+
+            -> cooldown (optional): Seconds to skip the user the first time
+
+            -> max_cooldown (optional): Maximum seconds to skip the user
+        """
+        if threshold:
+            self.threshold = threshold
+
+        if cooldown is not None:
+            self.cooldown = cooldown
+
+        if max_cooldown is not None:
+            self.max_cooldown = max_cooldown
+
+        self.lock = threading.Lock ()
+
+        # Key -> [consecutive failures, time until the circuit is open, last cooldown]
+        self.state = {}
+
+
+    def allow (self, key):
+        """
+        Checks if the requests for a user can be sent
+
+        Args:
+            -> key: The user
+
+        Returns:
+            -> False if its circuit is open
+        """
+        with self.lock:
+            state = self.state.get (key)
+            return not state or state [1] <= time.time ()
+
+
+    def success (self, key):
+        """
+        Closes the circuit of a user after a successful request
+
+        Args:
+            -> key: The user
+        """
+        with self.lock:
+            self.state.pop (key, None)
+
+
+    def failure (self, key, error = None):
+        """
+        Counts a failed request of a user, opening its circuit if needed
+
+        Args:
+            -> key: The user
+
+            -> error (optional): The FetchError. A PermanentError opens the circuit
+                    right away, and a 'shared' one isn't counted
+        """
+        logger = logging.getLogger (__name__ + ".failure")
+
+        if error is not None and error.shared:
+            return
+
+        with self.lock:
+            state = self.state.setdefault (key, [0, 0, 0])
+            state [0] += 1
+
+            permanent = error is not None and not error.transient
+            if state [0] < self.threshold and not permanent:
+                return
+
+            # Retried after the cooldown and failed again
+            cooldown = min (state [2] * 2, self.max_cooldown) if state [2] \
+                        else self.cooldown
+
+            state [1] = time.time () + cooldown
+            state [2] = cooldown
+
+        logger.warning ("Too many errors with '" + str (key) + "'. Skipping it for "
+                        + str (int (cooldown)) + " seconds"
+        )
+
+
+    def open_circuits (self):
+        """
+        Gets the users being skipped
+
+        Returns:
+            -> A dictionary with the seconds left to skip each user
+        """
+        now = time.time ()
+
+        with self.lock:
+            return { k: s [1] - now for k, s in self.state.items () if s [1] > now }
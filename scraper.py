@@ -8,11 +8,29 @@ import requests \
     , re \
     , logging \
     , json \
-    , ssl
-
-from tqdm import tqdm
+    , ssl \
+    , asyncio \
+    , threading \
+    , base64 \
+    , queue \
+    , calendar \
+    , sqlite3
+
+from token_cache import TokenCache
+from guest_tokens import GuestTokenPool
+from profile_cache import ProfileCache
+from http_cache import ResponseCache
+from rate_limiter import RateLimiter
+from resilience import RetryPolicy, CircuitBreaker, FetchError, PermanentError \
+    , TokenPoolError, classify
+from tweet_buffer import TweetBuffer
+from model import Tweet, TweetStats, UserProfile
+from json_decoder import get_decoder
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote
 from datetime import datetime
-from bs4 import BeautifulSoup
 
 
 class Scraper:
@@ -31,7 +49,19 @@ class Scraper:
     This endpoints responds to a POST with the BEARER_TOKEN header.
     """
     GUEST_TOKEN_URL = "https://api.twitter.com/1.1/guest/activate.json"
-    GUEST_TOKEN = None
+
+    """
+    Number of guest tokens to keep at the same time, to use another one when a token
+    reaches its rate limit
+    """
+    guest_pool_size = 3
+
+    """
+    Error codes on the body of a 401 or 403 response which mean that the guest token
+    (and not the requested resource) was rejected: invalid or expired token, forbidden
+    and bad guest token
+    """
+    GUEST_TOKEN_ERRORS = (89, 200, 239)
 
     #
     #######################
@@ -43,11 +73,24 @@ class Scraper:
         + "4S2ihIKfF3xhp-ENxvUAfQ/UserByScreenName?variables=%7B%22screen_name%22%3A%22"\
         + handle + "%22%2C%22withHighlightedLabel%22%3Atrue%7D"
 
+    """
+    URL to get the info of many users (up to 'lookup_size') at once
+    """
+    build_users_lookup_url = lambda s, handles: "https://api.twitter.com/1.1/users/"\
+        + "lookup.json?include_entities=false&screen_name=" + ",".join (handles)
+
+    """
+    Maximum number of users to request on each call to the lookup URL
+    """
+    lookup_size = 100
+
     """
     Main URL to get the first page of tweets, knowing the user's rest_id, which can be
-    obtained with get_user_rest_id()
+    obtained with get_user_rest_id().
+    With a cursor (the ones stored on scraped_info), it gets the tweets before or after
+    those already retrieved
     """
-    build_twitter_url = lambda s, rest_id, count: "https://api.twitter.com/2/timeline/profile/"\
+    build_twitter_url = lambda s, rest_id, count, cursor = None: "https://api.twitter.com/2/timeline/profile/"\
             + rest_id + ".json"\
             + "?include_profile_interstitial_type=1"\
             + "&include_blocking=1"\
@@ -58,50 +101,59 @@ class Scraper:
             + "&include_can_dm=1"\
             + "&include_can_media_tag=1"\
             + "&skip_status=1"\
-            + "&cards_platform=Web-12"\
-            + "&include_cards=1"\
-            + "&include_ext_alt_text=true"\
             + "&include_quote_count=true"\
             + "&include_reply_count=1"\
             + "&tweet_mode=extended"\
-            + "&include_entities=true"\
-            + "&include_user_entities=true"\
-            + "&include_ext_media_color=true"\
-            + "&include_ext_media_availability=true"\
             + "&send_error_codes=true"\
             + "&simple_quoted_tweet=true"\
             + "&include_tweet_replies=false"\
             + "&userId=" + rest_id\
             + "&count=" + str (count)\
-            + "&ext=mediaStats%2ChighlightedLabel"
+            + (s.projected_timeline_params if s.projection else s.full_timeline_params)\
+            + ("&cursor=" + quote (cursor) if cursor else "")
 
     """
-    Builds the URL to get the rest of the tweets, knowing the max_position
+    Parameters of the timeline URL to get the info that the scraper doesn't use (cards,
+    media, entities...). When 'projection' is set, they're replaced by
+    'projected_timeline_params', so the server doesn't even send that info
     """
-    build_newpage_url = lambda _, user, max_pos: "https://twitter.com/i/profiles/show/" \
-        + user + "/timeline/tweets?"\
-        + "include_available_features=1&include_entities=1"\
-        + "&max_position=" + str (max_pos) + "&reset_error_state=false"
+    full_timeline_params = "&cards_platform=Web-12"\
+            + "&include_cards=1"\
+            + "&include_ext_alt_text=true"\
+            + "&include_entities=true"\
+            + "&include_user_entities=true"\
+            + "&include_ext_media_color=true"\
+            + "&include_ext_media_availability=true"\
+            + "&ext=mediaStats%2ChighlightedLabel"
 
+    projected_timeline_params = "&include_cards=0"\
+            + "&include_entities=false"\
+            + "&include_user_entities=false"
 
+    """
+    Seconds before giving up on the URL request
+    """
+    timeout = 20
 
     """
-    Builds the URL to get the new tweets, knowing the min_position
+    Number of tweets to request on each page of the timeline
     """
-    build_update_url = (
-        lambda user
-                , min_pos:
-                    "https://twitter.com/i/profiles/show/" + user + "/timeline/tweets?"
-                    + "composed_count=0&include_available_features=1&"
-                    + "include_entities=1&include_new_items_bar=true&"
-                    + "interval=30000&latent_count=0&min_position=" + str (min_pos)
-    )
+    page_size = 20
 
+    """
+    Format of the dates on the API responses
+    """
+    date_format = "%a %b %d %H:%M:%S %z %Y"
+    months = { m: i + 1 for i, m in enumerate (["Jan", "Feb", "Mar", "Apr", "May", "Jun"
+                                                , "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"
+                                            ])
+    }
 
     """
-    Seconds before giving up on the URL request
+    Number of connections kept alive on the session's pool for each host (most of the
+    requests go to api.twitter.com, so there's no need for more pools than hosts)
     """
-    timeout = 20
+    pool_size = 10
 
     """
     Main object with all the information from the users
@@ -160,9 +212,12 @@ class Scraper:
                     , "retweet": <indication to know if it's a retweet>
                     # Only if "retweet" is True
                     , "retweet_info" {
-                          "retweet_id": <id of the retweet>
+                          "retweet_id": <id of the retweet (the same as "tweet_id")>
+                        , "original_id": <id of the retweeted tweet, whose text, stats and user are shown>
                         , "retweeter": <username who retweeted (the one whose data is being extracted)>
                     }
+                    # Only if it quotes another tweet
+                    , "quoted_id": "<id of the quoted tweet>"
                 }
             # ... (more tweeets from the user)
             ]
@@ -173,405 +228,1476 @@ class Scraper:
         }
         # ... (more users and their tweets)
     }
+
+    Each Scraper has its own object. If 'keep_tweets' is False, the "tweets" lists are
+    left empty.
     """
     scraped_info = {}
 
-    def __init__(self):
+    def __init__ (self, session = None, pool_size = None, token_cache = None
+                    , guest_pool_size = None, profile_cache = None, ids_from_cache = False
+                    , keep_tweets = True, max_tweets = None, max_tweet_age = None
+                    , compact = False, json_backend = None, projection = False
+                    , store = None, archive = None, engagement = None, index = None
+                    , response_cache = None, rate_limiter = None, retry = None
+                    , breaker = None):
+        """
+        Initializes the HTTP session. The authorization tokens are obtained later, right
+        before the first request that needs them.
+
+        Args:
+            -> session (optional): A requests.Session to perform all the requests with
+                    (for example, to point it to a local server while testing). If it's
+                    not provided, a new one is created with a pool of 'pool_size'
+                    keep-alive connections per host
+
+            -> pool_size (optional): Number of connections to keep alive for each host.
+                    Ignored if 'session' is provided
+
+            -> token_cache (optional): A token_cache.TokenCache to store the
+                    authorization tokens between runs. By default, the one on the user's
+                    cache directory is used. If it's False, the tokens are never cached
+
+            -> guest_pool_size (optional): Number of guest tokens to rotate between
+
+            -> profile_cache (optional): A profile_cache.ProfileCache to store the
+                    profiles of the users between runs. By default, the one on the
+                    user's cache directory is used (if it can be opened). If it's False,
+                    the profiles are never cached
+
+            -> ids_from_cache (optional): If True, the tweets of a user are requested with
+                    its cached REST id, even if the rest of its cached profile is outdated
+
+            -> keep_tweets (optional): If False, the retrieved tweets are not stored on
+                    self.scraped_info (only the users' profiles and cursors are). Useful
+                    with stream_tweets(), to keep the memory usage constant
+
+            -> max_tweets (optional): Maximum number of tweets to keep for each user on
+                    self.scraped_info (the oldest ones are discarded)
+
+            -> max_tweet_age (optional): Seconds to keep each tweet on self.scraped_info
+
+            -> compact (optional): If True, the tweets are model.Tweet objects instead of
+                    dictionaries (they can be read the same way, but take less memory)
+
+            -> json_backend (optional): Name of the library to decode the responses (see
+                    json_decoder.BACKENDS). By default, the fastest one installed
+
+            -> projection (optional): If True, the timeline is requested without the
+                    info that the scraper doesn't use (entities, media, cards...), so
+                    there's less data to transfer and decode
+
+            -> store (optional): A tweet_store.TweetStore where all the retrieved tweets
+                    and profiles are saved (even if 'keep_tweets' is False)
+
+            -> archive (optional): An archive.ArchiveWriter where each new tweet is
+                    written (even if 'keep_tweets' is False)
+
+            -> engagement (optional): An engagement.EngagementTracker where the stats of
+                    every retrieved tweet are recorded, each time it's retrieved
+
+            -> index (optional): A search_index.TweetIndex where every retrieved tweet
+                    is indexed, to search them by their text
+
+            -> response_cache (optional): A http_cache.ResponseCache to store the
+                    responses of the endpoints that rarely change (like the file with
+                    the bearer token, or the profiles) between runs. By default, the one
+                    on the user's cache directory is used (if it can be opened). If it's
+                    False, the responses are never cached
+
+            -> rate_limiter (optional): A rate_limiter.RateLimiter that paces the
+                    requests to the API to stay under its rate limits. By default, a new
+                    one for all the guest tokens of the pool. If it's False, the requests
+                    are sent right away (until the server rejects them)
+
+            -> retry (optional): A resilience.RetryPolicy to send again the requests
+                    that fail with transient errors (like timeouts). By default, a new one.
+                    If it's False, the requests are never retried
+
+            -> breaker (optional): A resilience.CircuitBreaker to skip for a while the
+                    users that keep failing. By default, a new one. If it's False, the
+                    users are never skipped
+        """
+        logger = logging.getLogger (__name__ + ".__init__")
+
+        if pool_size:
+            self.pool_size = pool_size
+
+        if guest_pool_size:
+            self.guest_pool_size = guest_pool_size
+
+        # Only the sessions created here are closed on close()
+        self._owns_session = (session is None)
+        self.session = session if session else self.build_session ()
+
+        if token_cache is None:
+            token_cache = TokenCache ()
+
+        self.token_cache = token_cache
+
+        if profile_cache is None:
+            # Like the tokens, the profiles are just requested again if there's no cache
+            try:
+                profile_cache = ProfileCache ()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning ("Profiles won't be cached => " + str (e))
+                profile_cache = False
+
+        self.profile_cache = profile_cache
+        self.ids_from_cache = ids_from_cache
+
+        if response_cache is None:
+            try:
+                response_cache = ResponseCache ()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning ("Responses won't be cached => " + str (e))
+                response_cache = False
+
+        self.response_cache = response_cache
+
+        if rate_limiter is None:
+            rate_limiter = RateLimiter (scale = self.guest_pool_size)
+
+        self.rate_limiter = rate_limiter
+
+        self.retry = RetryPolicy () if retry is None else retry
+        self.breaker = CircuitBreaker () if breaker is None else breaker
+
+        self.scraped_info = {}
+        self.keep_tweets = keep_tweets
+        self.max_tweets = max_tweets
+        self.max_tweet_age = max_tweet_age
+
+        self.compact = compact
+        self.projection = projection
+        self.json_backend, self.json_loads = get_decoder (json_backend)
+        self.store = store
+        self.archive = archive
+        self.engagement = engagement
+        self.index = index
+        # Shared model.UserProfile of each user, along with the dictionary on
+        # scraped_info it was created from
+        self.authors = {}
+
+        self._auth_lock = threading.Lock ()
+        # Held while the tweets and cursors of scraped_info are being updated
+        self._update_lock = threading.Lock ()
+
+        # Created once the bearer token is available (see authorize())
+        self.guest_tokens = None
+
+
+    def authorize (self):
+        """
+        Obtains the bearer token (from the cache, if possible), sets it as a default
+        header of the session and creates the pool of guest tokens. Does nothing if they
+        were already obtained.
+
+        Returns:
+            -> True if the authorization data is available, or False otherwise
+        """
+        # Several threads may try to authorize at the same time, but only one of them
+        # has to perform the requests
+        with self._auth_lock:
+            if not self.BEARER_TOKEN:
+                self.BEARER_TOKEN = self.get_bearer_token ()
+
+                if not self.BEARER_TOKEN:
+                    return False
+
+                # From now on, every request carries the bearer token
+                self.session.headers.update (
+                    {"Authorization": "Bearer " + self.BEARER_TOKEN}
+                )
+
+            if not self.guest_tokens:
+                cached = []
+                if self.token_cache:
+                    # The whole pool, with their ages, so each one is replaced when it
+                    # really expires
+                    cached = self.token_cache.get_all (self.BEARER_TOKEN_URL, "guest")
+
+                self.guest_tokens = GuestTokenPool (self.get_guest_token
+                                                    , size = self.guest_pool_size
+                                                    , tokens = cached
+                )
+
+        return True
+
+
+    def get_bearer_token (self):
         """
-        Initializes the authorization tokens.
+        Gets the bearer token from the cache or, if it's not there, from the JavaScript
+        file on BEARER_TOKEN_URL
+
+        Returns:
+            -> The token, or None if it couldn't be obtained
         """
-        logger = logging.getLogger (__name__ + ".init")
+        logger = logging.getLogger (__name__ + ".get_bearer_token")
+
+        if self.token_cache:
+            token = self.token_cache.get (self.BEARER_TOKEN_URL, "bearer")
+            if token:
+                logger.info ("Got cached bearer token: " + token)
+                return token
 
-        logger.info ("Initializing authorization data")
         logger.info ("Obtaining bearer token via GET " + self.BEARER_TOKEN_URL)
 
+        send = lambda headers: self.session.get (self.BEARER_TOKEN_URL
+                                                , timeout = self.timeout
+                                                , headers = headers
+        )
+
         try:
-            response = requests.get (self.BEARER_TOKEN_URL, timeout = self.timeout).text
+            if self.response_cache:
+                response = self.response_cache.fetch (self.BEARER_TOKEN_URL, send).text
+            else:
+                response = send ({}).text
         except Exception as e:
             logger.error ("Failed to get bearer token => " + str (e))
-            return
+            return None
 
         # The token is initialized (hard-coded?) as variable 'a', and is 104 characters
         # long. This should be enough to obtain the right token, I guess...
         token = re.findall (r'a="[A-Za-z0-9%]{104}"', response)
 
         if len (token) != 1:
-            logger.info ("Expected only one match, but got: " + token)
-            return
+            logger.info ("Expected only one match, but got: " + str (token))
+            return None
 
         # Removes a=" (3 chars) at the beginning and " (One char) at the end
-        self.BEARER_TOKEN = token [0][3:-1]
-        logger.info ("Got bearer token: " + self.BEARER_TOKEN)
-
-        ####
-        # Now, gets the x-guest-token
-        ####
-        logger.info ("Obtaining x-guest-token via POST " + self.GUEST_TOKEN_URL)
+        token = token [0][3:-1]
+        logger.info ("Got bearer token: " + token)
 
-        try:
-            headers = {"Authorization": "Bearer " + self.BEARER_TOKEN}
-            response = requests.post (self.GUEST_TOKEN_URL
-                    , timeout = self.timeout
-                    , headers = headers
-                ).json ()
-        except Exception as e:
-            logger.error ("Failed to get x-guest-token => " + str (e))
-            return
+        if self.token_cache:
+            self.token_cache.set (self.BEARER_TOKEN_URL, "bearer", token)
 
-        self.GUEST_TOKEN = response ["guest_token"]
-        logger.info ("Got x-guest-token: " + self.GUEST_TOKEN)
+        return token
 
 
-    def get_user_rest_id (self, screen_name):
+    def get_guest_token (self):
         """
-        Obtains the selected user's rest_id, needed to obtain its tweets
-
-        Args:
-            -> screen_name: The handler of the user (the one used to @mention the user)
+        Requests a new x-guest-token to GUEST_TOKEN_URL, and stores it on the cache.
+        The bearer token must have been obtained before.
 
         Returns:
-            -> The numerical id, or None if the user didn't exist
+            -> The token, or None if it couldn't be obtained
         """
-        logger = logging.getLogger (__name__ + ".get_user_rest_id")
+        logger = logging.getLogger (__name__ + ".get_guest_token")
 
-        # If their info is already available in self.scraped_info, skips this step
-        if screen_name in self.scraped_info:
-            return self.scraped_info [screen_name]["rest_id"]
+        logger.info ("Obtaining x-guest-token via POST " + self.GUEST_TOKEN_URL)
 
         try:
-            response = requests.get (
-                            self.build_user_info_url (screen_name)
-                            , timeout = self.timeout
-                            , headers = {
-                                "Authorization": "Bearer " + self.BEARER_TOKEN,
-                                "x-guest-token": self.GUEST_TOKEN
-                            }
-                        ).json ()["data"]["user"]
+            token = self.json_loads (self.session.post (self.GUEST_TOKEN_URL
+                    , timeout = self.timeout
+                    , headers = {"Authorization": "Bearer " + self.BEARER_TOKEN}
+                ).content) ["guest_token"]
         except Exception as e:
-            logger.error ("Failed to get user's REST id => " + str (e))
+            logger.error ("Failed to get x-guest-token => " + str (e))
             return None
 
+        logger.info ("Got x-guest-token: " + token)
 
-        rest_id = response ["rest_id"]
-        # Adds all the relevant information to the scraped_info object. Its structure can
-        # be consulte
-        self.scraped_info [screen_name] = {
-            "id": response ["id"]
-            , "rest_id": rest_id
-            , "created_at": response ["legacy"]["created_at"]
-            , "description": response ["legacy"]["description"]
-            , "fast_followers_count": response ["legacy"]["fast_followers_count"]
-            , "favourites_count": response ["legacy"]["favourites_count"]
-            , "followers_count": response ["legacy"]["followers_count"]
-            , "friends_count": response ["legacy"]["friends_count"]
-            , "has_custom_timelines": response ["legacy"]["has_custom_timelines"]
-            , "is_translator": response ["legacy"]["is_translator"]
-            , "listed_count": response ["legacy"]["listed_count"]
-            , "location": response ["legacy"]["location"]
-            , "media_count": response ["legacy"]["media_count"]
-            , "name": response ["legacy"]["name"]
-            , "normal_followers_count": response ["legacy"]["normal_followers_count"]
-            , "pinned_tweet_ids_str": response ["legacy"]["pinned_tweet_ids_str"]
-            , "profile_image_url": response ["legacy"]["profile_image_url_https"]
-            , "protected": response ["legacy"]["protected"]
-            , "screen_name": response ["legacy"]["screen_name"]
-            , "statuses_count": response ["legacy"]["statuses_count"]
-            , "translator_type": response ["legacy"]["translator_type"]
-            , "url": response ["legacy"]["url"] if "url" in response ["legacy"] else ""
-            , "verified": response ["legacy"]["verified"]
-            , "tweets": []
-            , "cursor": { "top": None, "bottom": None }
-        }
+        if self.token_cache:
+            # Along with the rest of the pool
+            self.token_cache.add (self.BEARER_TOKEN_URL, "guest", token
+                                , keep = self.guest_pool_size
+            )
 
-        logger.info ("Got ID of user " + screen_name + ": " + rest_id)
-        return rest_id
+        return token
 
 
-    def process_tweet (tag, older_age = None):
-        """Gets the data from the given tag, containing the tweet
+    def api_get (self, url, timeout = None, decode = False):
+        """
+        Performs a GET request to the API, with the guest token that has the most requests
+        left. If the token is rejected or has reached its rate limit, tries again with
+        another one. The responses of the endpoints that rarely change may come from
+        'response_cache' instead.
 
         Args:
-            -> tag: The BeautifulSoup element with the div containing the tweet
+            -> url: The URL to request
 
-            -> older_age (optional): Age of the oldest tweets to extract; in
-                    UNIX epoch format
+            -> timeout (optional): Seconds before giving up on the request (by default,
+                    self.timeout)
+
+            -> decode (optional): If True, the JSON of the response is decoded with
+                    'json_backend'
 
         Returns:
-            -> A dictionary with all the attributes,
-            or
-            -> None, if the tweet is older than 'older_age' (but not pinned)
-        """
-        data = {}
-        return None # TODO: NOT IMPLEMENTED
+            -> The requests.Response, or the decoded JSON if 'decode' is set
 
-        # Checks if this tweet is pinned
-        if len (tag.select (".context .pinned")) == 1:
-            data ["pinned"] = True
-        else:
-            data ["pinned"] = False
+        Raises:
+            -> Any exception raised by requests (also requests.HTTPError, if 'decode' is
+                set and the status isn't successful, like a 403 for a protected account),
+                or resilience.TokenPoolError if no guest token was accepted
+        """
+        timeout = timeout if timeout else self.timeout
+        send = lambda headers: self.send_api_request (url, timeout, headers)
 
-        # Checks if this tweet is retweeted. If it is, stores also the account from which it
-        # has been retweeted
-        if len (tag.select (".context .js-retweet-text")) == 1:
-            data ["retweet"] = True
-            data ["retweet_info"] = {
-                "retweeter": tag ["data-retweeter"]
-                , "retweet_id": tag ["data-retweet-id"]
-            }
+        if self.response_cache:
+            response = self.response_cache.fetch (url, send)
         else:
-            data ["retweet"] = False
-
-        tag_epoch = int (tag.select (".tweet-timestamp span")[0]["data-time"])
+            response = send ({})
 
-        data ["tweet_age"] = tag_epoch
-        # Filters by date, if necessary
-        if older_age:
-            threshold = datetime.fromtimestamp (older_age)
-            age = datetime.fromtimestamp (tag_epoch)
+        if decode:
+            response.raise_for_status ()
+            return self.json_loads (response.content)
 
-            if age < threshold:
-                # The pinned tweet may be older, but it's shown the first one
-                if not data ["pinned"]:
-                    return None
+        return response
 
-        content = tag.select (".content")[0]
 
-        # User data
-        user = {
-            "username": tag ["data-screen-name"]
-            , "displayname": tag ["data-name"]
-            , "uid": int (tag ["data-user-id"])
-            , "avatar": content.find ("img", attrs = {"class": "avatar"})["src"]
-        }
-        data ["user"] = user
+    def call_api (self, url, timeout = None):
+        """
+        Performs a GET request to the API and decodes its response, like api_get(); but
+        retrying it with 'retry' if it fails with a transient error
 
-        # The text of the tweet
-        text = unicode (content.select (".js-tweet-text-container")[0])
-        data ["text"] = html2text.html2text (text)
+        Args:
+            -> url: The URL to request
 
-        # Extra data (likes, retweets, permalink...)
-        data ["permalink"] = tag ["data-permalink-path"]
-        data ["conversation"] = int (tag ["data-conversation-id"])
+            -> timeout (optional): Seconds before giving up on the first attempt (by
+                    default, self.timeout)
 
-        stat_str = "data-tweet-stat-count"
-        # Stats in the following order: replies, retweets and favourites (likes)
-        stat_list = [
-                int (x.strip (stat_str + "=\""))
-                for x in re.findall (stat_str + "=\"\d+\"", unicode (content))
-        ]
+        Returns:
+            -> The decoded JSON
 
-        stats = {
-            "replies":      stat_list [0]
-            , "retweets":   stat_list [1]
-            , "likes":      stat_list [2]
-        }
+        Raises:
+            -> resilience.TransientError or resilience.PermanentError (for example, if
+                the requested user is protected or suspended)
+        """
+        timeout = timeout if timeout else self.timeout
+        request = lambda t: self.api_get (url, timeout = t, decode = True)
 
-        data ["stats"] = stats
+        if self.retry:
+            return self.retry.call (request, timeout)
 
-        return data
+        try:
+            return request (timeout)
+        except Exception as e:
+            raise classify (e) (str (e)) from e
 
 
-    def process_html (html, max_count = 10, older_age = None):
+    def send_api_request (self, url, timeout, headers):
         """
-        Process the HTML to get the tweets.
+        Performs the request of api_get(), rotating the guest tokens and waiting for
+        'rate_limiter' to allow it
 
         Args:
-            -> html: Text with the HTML to be processed
+            -> url: The URL to request
 
-            -> max_count (optional): Maximum number of tweets to extract
+            -> timeout: Seconds before giving up on the request
 
-            -> older_age (optional): Age of the oldest tweets to extract; in
-                    UNIX epoch format
+            -> headers: Dictionary with the headers to add to the request
 
         Returns:
-            -> A dictionary with the follwing keys and values:
-                    - tweet_map: extracted tweets
-                    - n_items: Number of extracted tweets
-                    - min_position: ID of the older tweet
-                    - older_age_reached: Boolean to indicate if the 'older_age' threshold
-                            has been reached
-            or
-            -> None, if the user hasn't been found
+            -> The requests.Response
+
+        Raises:
+            -> Any exception raised by requests, or resilience.TokenPoolError if there
+                are no guest tokens available, or all of them were rejected
         """
-        logger = logging.getLogger (__name__ + ".process_html")
-        tweet_map = {}
-        older_age_reached = False
+        if not self.authorize ():
+            raise TokenPoolError ("No authorization tokens available")
 
-        parsed = BeautifulSoup (html, "html.parser")
+        # Each token of the pool (plus a new one) gets a chance
+        for _ in range (self.guest_tokens.size + 1):
+            token = self.guest_tokens.acquire ()
+            if not token:
+                raise TokenPoolError ("No guest tokens available")
 
-        tweet_class = "data-tweet-id"
-        tweet_ids = [ x.strip (tweet_class + "=\"")
-                        for x in re.findall (tweet_class + "=\"\d+\"", html)
-        ]
+            if self.rate_limiter:
+                self.rate_limiter.acquire (url)
 
-        # Gets the 'max_count' first items (including the pinned tweet, if any)
-        tweet_ids = tweet_ids [:max_count]
+            response = self.session.get (url
+                                        , timeout = timeout
+                                        , headers = dict (headers, **{"x-guest-token": token})
+            )
+            status = response.status_code
+            # Any other 401 or 403 (like a protected or suspended account) is given to
+            # the caller, without touching the pool
+            rejected = self.token_rejected (response)
 
-        for i in tweet_ids:
+            self.guest_tokens.update (token, status, response.headers, rejected)
 
-            tweet = parsed.find ("div", attrs = {"data-tweet-id": i})
-            data = process_tweet (tweet, older_age)
+            if self.rate_limiter:
+                self.rate_limiter.update (url, status, response.headers)
 
-            if not data:
-                older_age_reached = True
+            if status != 429 and not rejected:
                 break
 
-            data ["tweet_id"] = i
+            if self.token_cache and rejected:
+                self.token_cache.invalidate (self.BEARER_TOKEN_URL, "guest", token)
 
-            # If it's not a retweet, adds the full size avatar
-            if not data ["retweet"]:
-                data ["profile_pic"] = parsed.select (".ProfileAvatar-image")[0]["src"]
+        else:
+            # The problem is on the tokens, not on the requested user
+            raise TokenPoolError ("Every guest token was rejected (last status: "
+                                + str (response.status_code) + ")"
+            )
 
-            tweet_map [i] = data
+        return response
+
+
+    def token_rejected (self, response):
+        """
+        Checks if a response says that the guest token used on the request is the
+        problem (one of GUEST_TOKEN_ERRORS)
+
+        Args:
+            -> response: The requests.Response
+
+        Returns:
+            -> True if the guest token was rejected
+        """
+        if response.status_code not in (401, 403):
+            return False
+
+        try:
+            errors = self.json_loads (response.content).get ("errors") or []
+            return any (e.get ("code") in self.GUEST_TOKEN_ERRORS for e in errors)
+
+        except (ValueError, TypeError, AttributeError):
+            # Not the JSON of the API (for example, an HTML error page)
+            return False
+
+
+    def build_session (self):
+        """
+        Creates the session used to perform all the requests, reusing the connections
+        (and their TLS handshakes) between requests to the same host
+
+        Returns:
+            -> A requests.Session with a pool of 'self.pool_size' connections per host
+        """
+        session = requests.Session ()
+
+        adapter = HTTPAdapter (pool_connections = self.pool_size
+                                , pool_maxsize = self.pool_size
+        )
+        session.mount ("https://", adapter)
+        session.mount ("http://", adapter)
+
+        session.headers.update ({"Connection": "keep-alive"})
+
+        return session
+
+
+    def close (self):
+        """
+        Releases the connections of the session, if it was created by this object
+        """
+        if self._owns_session:
+            self.session.close ()
+
+
+    def __enter__ (self):
+        return self
+
+
+    def __exit__ (self, *exc_info):
+        self.close ()
+
+
+    def get_user_rest_id (self, screen_name):
+        """
+        Obtains the selected user's rest_id, needed to obtain its tweets
+
+        Args:
+            -> screen_name: The handler of the user (the one used to @mention the user)
+
+        Returns:
+            -> The numerical id, or None if the user didn't exist
+        """
+        logger = logging.getLogger (__name__ + ".get_user_rest_id")
+
+        # If their info is already available in self.scraped_info, skips this step
+        if screen_name in self.scraped_info:
+            return self.scraped_info [screen_name]["rest_id"]
+
+        # Same if it's on the cache
+        rest_id = self.get_cached_rest_id (screen_name)
+        if rest_id:
+            return rest_id
+
+        if self.breaker and not self.breaker.allow (screen_name):
+            logger.warning ("Skipping '" + screen_name + "' after too many errors")
+            return None
+
+        try:
+            response = self.call_api (self.build_user_info_url (screen_name))
+
+            if "user" not in response.get ("data", {}):
+                raise PermanentError ("User not found: " + str (response.get ("errors")))
+
+            response = response ["data"]["user"]
+
+        except FetchError as e:
+            logger.error ("Failed to get user's REST id => " + str (e))
+
+            if self.breaker:
+                self.breaker.failure (screen_name, e)
+            return None
+
+        if self.breaker:
+            self.breaker.success (screen_name)
+
+        # Adds all the relevant information to the scraped_info object
+        profile = self.parse_user_info (response)
+        self.scraped_info [screen_name] = profile
+
+        if self.profile_cache:
+            self.profile_cache.set (screen_name, profile)
+
+        rest_id = profile ["rest_id"]
+        logger.info ("Got ID of user " + screen_name + ": " + rest_id)
+        return rest_id
+
+
+    def get_cached_rest_id (self, screen_name):
+        """
+        Gets the profile of a user from self.profile_cache and adds it to
+        self.scraped_info. The profile may be outdated if 'ids_from_cache' is set, but
+        the REST id is enough to get the tweets.
+
+        Args:
+            -> screen_name: The handler of the user
+
+        Returns:
+            -> The REST id, or None if the user wasn't cached
+        """
+        logger = logging.getLogger (__name__ + ".get_cached_rest_id")
+
+        if not self.profile_cache:
+            return None
+
+        profile = self.profile_cache.get (screen_name, allow_stale = self.ids_from_cache)
+        if not profile:
+            return None
+
+        profile ["tweets"] = self.new_tweet_buffer ()
+        profile ["cursor"] = { "top": None, "bottom": None }
+        self.scraped_info [screen_name] = profile
+
+        logger.info ("Got cached ID of user " + screen_name + ": " + profile ["rest_id"])
+        return profile ["rest_id"]
+
+
+    def get_users_rest_ids (self, handles):
+        """
+        Obtains the rest_id of many users, requesting them in groups of 'lookup_size'
+        users. The users that couldn't be obtained this way are then requested one by one
+        with get_user_rest_id().
+
+        Args:
+            -> handles: List with the handlers of the users
+
+        Returns:
+            -> A dictionary with the rest_id of each handle (None, if the user didn't
+                exist)
+        """
+        logger = logging.getLogger (__name__ + ".get_users_rest_ids")
+
+        rest_ids = {}
+        pending = []
+
+        for h in handles:
+            if h in self.scraped_info:
+                rest_ids [h] = self.scraped_info [h]["rest_id"]
+                continue
+
+            rest_id = self.get_cached_rest_id (h)
+            if rest_id:
+                rest_ids [h] = rest_id
+            elif h not in pending:
+                pending.append (h)
+
+        for i in range (0, len (pending), self.lookup_size):
+            chunk = pending [i : i + self.lookup_size]
+
+            try:
+                response = self.call_api (self.build_users_lookup_url (chunk))
+            except FetchError as e:
+                logger.error ("Failed to look up " + str (len (chunk)) + " users => "
+                                + str (e)
+                )
+                continue
+
+            if not isinstance (response, list):
+                logger.error ("Unexpected response looking up users: " + str (response))
+                continue
+
+            # The handles are case insensitive
+            requested = { h.lower (): h for h in chunk }
+
+            for user in response:
+                screen_name = requested.get (str (user.get ("screen_name", "")).lower ())
+                if not screen_name:
+                    continue
+
+                try:
+                    profile = self.parse_user_info (self.lookup_to_user_info (user))
+                except KeyError as e:
+                    logger.error ("Missing key on the profile of " + screen_name + " => "
+                                    + str (e)
+                    )
+                    continue
+
+                self.scraped_info [screen_name] = profile
+                rest_ids [screen_name] = profile ["rest_id"]
+
+                if self.profile_cache:
+                    self.profile_cache.set (screen_name, profile)
+
+            logger.info ("Got ID of " + str (len (response)) + " users out of "
+                            + str (len (chunk))
+            )
+
+        # Those that couldn't be looked up are requested one by one
+        for h in pending:
+            if h not in rest_ids:
+                rest_ids [h] = self.get_user_rest_id (h)
+
+        return rest_ids
+
+
+    def lookup_to_user_info (self, user):
+        """
+        Converts a user from the lookup URL into the format of the UserByScreenName
+        endpoint, to be used with parse_user_info()
+
+        Args:
+            -> user: One of the users returned by the lookup URL
+
+        Returns:
+            -> A dictionary like the "user" object returned by UserByScreenName
+        """
+        # Fields that the lookup URL may not return
+        legacy = {
+            "fast_followers_count": 0
+            , "has_custom_timelines": False
+            , "is_translator": False
+            , "media_count": 0
+            , "normal_followers_count": user.get ("followers_count", 0)
+            , "pinned_tweet_ids_str": []
+            , "translator_type": "none"
+        }
+        legacy.update (user)
+
+        rest_id = user ["id_str"]
+
+        return {
+            # GraphQL ids are just the base64 of "User:<rest_id>"
+            "id": base64.b64encode (("User:" + rest_id).encode ()).decode ()
+            , "rest_id": rest_id
+            , "legacy": legacy
+        }
+
+
+    def parse_user_info (self, response):
+        """
+        Extracts the profile of a user from the response of the UserByScreenName endpoint
+
+        Args:
+            -> response: The "user" object of the response
+
+        Returns:
+            -> A dictionary with the profile, with the structure of each user on
+                self.scraped_info (and no tweets yet)
+        """
+        return {
+            "id": response ["id"]
+            , "rest_id": response ["rest_id"]
+            , "created_at": response ["legacy"]["created_at"]
+            , "description": response ["legacy"]["description"]
+            , "fast_followers_count": response ["legacy"]["fast_followers_count"]
+            , "favourites_count": response ["legacy"]["favourites_count"]
+            , "followers_count": response ["legacy"]["followers_count"]
+            , "friends_count": response ["legacy"]["friends_count"]
+            , "has_custom_timelines": response ["legacy"]["has_custom_timelines"]
+            , "is_translator": response ["legacy"]["is_translator"]
+            , "listed_count": response ["legacy"]["listed_count"]
+            , "location": response ["legacy"]["location"]
+            , "media_count": response ["legacy"]["media_count"]
+            , "name": response ["legacy"]["name"]
+            , "normal_followers_count": response ["legacy"]["normal_followers_count"]
+            , "pinned_tweet_ids_str": response ["legacy"]["pinned_tweet_ids_str"]
+            , "profile_image_url": response ["legacy"]["profile_image_url_https"]
+            , "protected": response ["legacy"]["protected"]
+            , "screen_name": response ["legacy"]["screen_name"]
+            , "statuses_count": response ["legacy"]["statuses_count"]
+            , "translator_type": response ["legacy"]["translator_type"]
+            , "url": response ["legacy"]["url"] if "url" in response ["legacy"] else ""
+            , "verified": response ["legacy"]["verified"]
+            , "tweets": self.new_tweet_buffer ()
+            , "cursor": { "top": None, "bottom": None }
+        }
+
+
+    def to_dict (self):
+        """
+        Gets the contents of self.scraped_info with plain dictionaries and lists, even if
+        'compact' is set (to serialize it with json.dumps, for example)
+
+        Returns:
+            -> A dictionary with the structure described on self.scraped_info
+        """
+        return {
+            username: dict (info
+                            , tweets = [ t.to_dict () if isinstance (t, Tweet) else t
+                                            for t in info ["tweets"]
+                            ]
+                    )
+            for username, info in self.scraped_info.items ()
+        }
+
+
+    def new_tweet_buffer (self):
+        """
+        Creates the list to hold the tweets of a user on self.scraped_info
+
+        Returns:
+            -> A tweet_buffer.TweetBuffer, with the limits set on this object
+        """
+        return TweetBuffer (max_count = self.max_tweets, max_age = self.max_tweet_age)
+
+
+    def process_tweet (tag, older_age = None):
+        """Gets the data from the given tag, containing the tweet
+
+        Args:
+            -> tag: The BeautifulSoup element with the div containing the tweet
+
+            -> older_age (optional): Age of the oldest tweets to extract; in
+                    UNIX epoch format
+
+        Returns:
+            -> A dictionary with all the attributes,
+            or
+            -> None, if the tweet is older than 'older_age' (but not pinned)
+        """
+        data = {}
+        return None # TODO: NOT IMPLEMENTED
+
+        # Checks if this tweet is pinned
+        if len (tag.select (".context .pinned")) == 1:
+            data ["pinned"] = True
+        else:
+            data ["pinned"] = False
+
+        # Checks if this tweet is retweeted. If it is, stores also the account from which it
+        # has been retweeted
+        if len (tag.select (".context .js-retweet-text")) == 1:
+            data ["retweet"] = True
+            data ["retweet_info"] = {
+                "retweeter": tag ["data-retweeter"]
+                , "retweet_id": tag ["data-retweet-id"]
+            }
+        else:
+            data ["retweet"] = False
+
+        tag_epoch = int (tag.select (".tweet-timestamp span")[0]["data-time"])
+
+        data ["tweet_age"] = tag_epoch
+        # Filters by date, if necessary
+        if older_age:
+            threshold = datetime.fromtimestamp (older_age)
+            age = datetime.fromtimestamp (tag_epoch)
+
+            if age < threshold:
+                # The pinned tweet may be older, but it's shown the first one
+                if not data ["pinned"]:
+                    return None
+
+        content = tag.select (".content")[0]
+
+        # User data
+        user = {
+            "username": tag ["data-screen-name"]
+            , "displayname": tag ["data-name"]
+            , "uid": int (tag ["data-user-id"])
+            , "avatar": content.find ("img", attrs = {"class": "avatar"})["src"]
+        }
+        data ["user"] = user
+
+        # The text of the tweet
+        text = unicode (content.select (".js-tweet-text-container")[0])
+        data ["text"] = html2text.html2text (text)
+
+        # Extra data (likes, retweets, permalink...)
+        data ["permalink"] = tag ["data-permalink-path"]
+        data ["conversation"] = int (tag ["data-conversation-id"])
+
+        stat_str = "data-tweet-stat-count"
+        # Stats in the following order: replies, retweets and favourites (likes)
+        stat_list = [
+                int (x.strip (stat_str + "=\""))
+                for x in re.findall (stat_str + "=\"\d+\"", unicode (content))
+        ]
+
+        stats = {
+            "replies":      stat_list [0]
+            , "retweets":   stat_list [1]
+            , "likes":      stat_list [2]
+        }
+
+        data ["stats"] = stats
+
+        return data
+
+
+    def process_html (html, max_count = 10, older_age = None):
+        """
+        Process the HTML to get the tweets.
+
+        Args:
+            -> html: Text with the HTML to be processed
+
+            -> max_count (optional): Maximum number of tweets to extract
+
+            -> older_age (optional): Age of the oldest tweets to extract; in
+                    UNIX epoch format
+
+        Returns:
+            -> A dictionary with the follwing keys and values:
+                    - tweet_map: extracted tweets
+                    - n_items: Number of extracted tweets
+                    - min_position: ID of the older tweet
+                    - older_age_reached: Boolean to indicate if the 'older_age' threshold
+                            has been reached
+            or
+            -> None, if the user hasn't been found
+        """
+        # Only needed by the old HTML timeline, so it isn't loaded with the module
+        from bs4 import BeautifulSoup
+
+        logger = logging.getLogger (__name__ + ".process_html")
+        tweet_map = {}
+        older_age_reached = False
+
+        parsed = BeautifulSoup (html, "html.parser")
+
+        tweet_class = "data-tweet-id"
+        tweet_ids = [ x.strip (tweet_class + "=\"")
+                        for x in re.findall (tweet_class + "=\"\d+\"", html)
+        ]
+
+        # Gets the 'max_count' first items (including the pinned tweet, if any)
+        tweet_ids = tweet_ids [:max_count]
+
+        for i in tweet_ids:
+
+            tweet = parsed.find ("div", attrs = {"data-tweet-id": i})
+            data = process_tweet (tweet, older_age)
+
+            if not data:
+                older_age_reached = True
+                break
+
+            data ["tweet_id"] = i
+
+            # If it's not a retweet, adds the full size avatar
+            if not data ["retweet"]:
+                data ["profile_pic"] = parsed.select (".ProfileAvatar-image")[0]["src"]
+
+            tweet_map [i] = data
             logger.info ("Retrieved tweet with id " + i)
 
 
-        # Gets the min position (the older tweet)
-        older_tweet = int (parsed.select (".stream-container") [0]["data-min-position"])
+        # Gets the min position (the older tweet)
+        older_tweet = int (parsed.select (".stream-container") [0]["data-min-position"])
+
+        return {
+            "tweet_map": tweet_map
+            , "n_items": len (tweet_map)
+            , "min_position": older_tweet
+            , "older_age_reached": older_age_reached
+        }
+
+
+
+    def get_next_page (self, username, rest_id, cursor = None, count = None):
+        """
+        Gets a page of tweets of the specified user, older than the ones already
+        retrieved with the given cursor
+
+        Args:
+            -> username: Name of the user whose tweets will be extracted
+
+            -> rest_id: The REST id of the user
+
+            -> cursor (optional): The "bottom" cursor of the previous page. If it's not
+                    given, the first page is retrieved
+
+            -> count (optional): Number of tweets to request (by default,
+                    self.page_size)
+
+        Returns:
+            -> A dictionary with the tweets and cursors of the page (see
+            'parse_timeline'),
+            or
+            -> None, if the page couldn't be retrieved
+        """
+        logger = logging.getLogger (__name__ + ".get_next_page")
+
+        logger.info ("Getting more tweets from " + username + ", starting from "
+                    + str (cursor)
+        )
+
+        response = self.request_timeline (username
+                                        , rest_id
+                                        , count if count else self.page_size
+                                        , cursor
+        )
+        if response is None:
+            return None
+
+        try:
+            return self.parse_timeline (username, response)
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            logger.error ("Unexpected response with the tweets of '" + username + "' => "
+                        + repr (e)
+            )
+
+            if self.breaker:
+                self.breaker.failure (username)
+            return None
+
+
+    def iter_user_tweets (self, username, max_count = None, older_age = None
+                            , page_size = None):
+        """
+        Iterates over the tweets of the specified user, requesting the older pages only
+        when the previous ones have been consumed, up to 'max_count' elements; or until
+        the max old date is reached (whatever comes first).
+        The tweets are not added to self.scraped_info, but its cursors are updated.
+
+        Args:
+            -> username: Name of the user whose tweets will be extracted
+
+            -> max_count (optional): Maximum number of tweets to extract (all of them, by
+                    default)
+
+            -> older_age (optional): Age of the oldest tweets to extract; in
+                    UNIX epoch format
+
+            -> page_size (optional): Number of tweets to request on each page
+
+        Yields:
+            -> The tweets, from newest to oldest
+        """
+        logger = logging.getLogger (__name__ + ".iter_user_tweets")
+
+        rest_id = self.get_user_rest_id (username)
+        if not rest_id:
+            logger.error ("No user with name '" + username + "' has been found")
+            return
+
+        page_size = page_size if page_size else self.page_size
+        cursor = None
+        n_items = 0
+        # IDs of the tweets already given, as the pages may overlap
+        seen = set ()
+
+        while True:
+            count = page_size
+            if max_count:
+                count = min (count, max_count - n_items)
+
+            page = self.get_next_page (username, rest_id, cursor, count)
+            if page is None:
+                return
+
+            with self._update_lock:
+                user_cursor = self.scraped_info [username]["cursor"]
+                # The first page has the newest tweets
+                if not cursor:
+                    user_cursor ["top"] = page ["cursor"]["top"]
+                user_cursor ["bottom"] = page ["cursor"]["bottom"]
+
+            older_tweets = False
+            for tweet in page ["tweets"]:
+                # The pinned tweet is only relevant at the top of the timeline
+                if tweet ["pinned"]:
+                    if cursor:
+                        continue
+                else:
+                    older_tweets = True
+
+                    if older_age and tweet ["tweet_age"] < older_age:
+                        logger.info ("Reached tweets older than " + str (older_age))
+                        return
+
+                if tweet ["tweet_id"] in seen:
+                    continue
+
+                seen.add (tweet ["tweet_id"])
+                yield tweet
+                n_items += 1
+
+                if max_count and n_items >= max_count:
+                    return
+
+            # No more pages
+            next_cursor = page ["cursor"]["bottom"]
+            if not older_tweets or not next_cursor or next_cursor == cursor:
+                return
+
+            cursor = next_cursor
+
+
+    def get_user_tweets (self, username, max_count = 10, older_age = None):
+        """
+        Gets the tweets of the specified user, up to 'max' elements; or until the max old
+        date is reached (whatever comes first)
+
+        Args:
+            -> username: Name of the user whose tweets will be extracted, performing a
+                request to https://twitter.com/<username>
+
+            -> max_count (optional): Maximum number of tweets to extract
+
+            -> older_age (optional): Age of the oldest tweets to extract; in
+                    UNIX epoch format
+
+        Returns:
+            -> A list with the extracted tweets, ordered from newest (index 0) to oldest
+            or
+            -> None, if the user hasn't been found
+        """
+        logger = logging.getLogger (__name__ + ".get_user_tweets")
+
+        if not self.get_user_rest_id (username):
+            logger.error ("No user with name '" + username + "' has been found")
+            return None
+
+        timeline = list (self.iter_user_tweets (username
+                                                , max_count
+                                                , older_age
+                                                , page_size = max_count
+                        )
+        )
 
-        return {
-            "tweet_map": tweet_map
-            , "n_items": len (tweet_map)
-            , "min_position": older_tweet
-            , "older_age_reached": older_age_reached
-        }
+        self.add_tweets (username, timeline)
+        return timeline
+
+
+    def add_tweets (self, username, tweets):
+        """
+        Adds the given tweets to the user's list on self.scraped_info, replacing those
+        already stored (unless 'keep_tweets' is False)
 
+        Args:
+            -> username: Name of the user whose tweets were retrieved
+
+            -> tweets: List with the new tweets, ordered from newest to oldest
+        """
+        if self.store:
+            with self.store.batch ():
+                self.store.add_tweets (username, tweets)
+                self.store.add_profile (username, self.scraped_info [username])
+
+        if self.engagement:
+            self.engagement.record (username, tweets)
+
+        if self.index:
+            self.index.add (username, tweets)
+
+        if not self.keep_tweets:
+            # There's no way to know which ones were already archived
+            if self.archive:
+                self.archive.write (username, tweets)
+            return
+
+        with self._update_lock:
+            stored = self.scraped_info [username]["tweets"]
+            new_tweets = [ t for t in tweets if t ["tweet_id"] not in stored ]
+            stored.merge (tweets)
 
+        if self.archive:
+            self.archive.write (username, new_tweets)
 
-    def get_next_page (username, max_position, full_html
-                        , max_count = 10, older_age = None):
+
+    def batch (self):
+        """
+        Groups all the writes to 'store' made inside the 'with' block on a single
+        transaction (see TweetStore.batch()). Does nothing if there's no store.
+        The transaction holds the database until the block ends, so it shouldn't wrap
+        the requests to the server.
+
+        Returns:
+            -> A context manager
         """
-        Gets the tweets of the specified user from the update URL (to get new tweets from
-        the infinite scrolling), up to 'max' elements; or until the max old date is reached
-        (whatever comes first)
+        return self.store.batch () if self.store else nullcontext ()
+
+
+    def load_history (self, users, max_count = 10, older_age = None):
+        """
+        Loads the tweets and profiles of the given users from 'store' into
+        self.scraped_info, instead of requesting them again. The cursors are also
+        loaded, so get_new_tweets() goes on from the newest stored tweet.
 
         Args:
-            -> username: Name of the user whose tweets will be extracted, performing a
-                request to https://twitter.com/<username>
+            -> users: A list with the name of the users
 
-            -> max_position: Parameter to perform the request
+            -> max_count (optional): Maximum number of tweets to load for each user
 
-            -> full_html: BeautifulSoup object with the main HTML, to extract some global
-                    data of the user, like the user's avatar
+            -> older_age (optional): Age of the oldest tweets to load; in
+                    UNIX epoch format
 
-            -> max_count (optional): Maximum number of tweets to extract
+        Returns:
+            -> A list with the users that weren't on the store
+        """
+        logger = logging.getLogger (__name__ + ".load_history")
+
+        if not self.store:
+            return list (users)
+
+        missing = []
+        for username in users:
+            profile = self.store.get_profile (username)
+
+            if not profile or not profile.get ("rest_id"):
+                missing.append (username)
+                continue
+
+            profile ["tweets"] = self.new_tweet_buffer ()
+            profile.setdefault ("cursor", { "top": None, "bottom": None })
+            self.scraped_info [username] = profile
+
+            tweets = self.store.get_tweets (username, max_count, older_age)
+            if self.keep_tweets:
+                profile ["tweets"].merge (tweets)
+
+            if self.index:
+                self.index.add (username, tweets)
+
+            logger.info ("Loaded " + str (len (tweets)) + " stored tweets of '"
+                        + username + "'"
+            )
+
+        return missing
+
+
+    def stream_tweets (self, users, max_count = 10, older_age = None, workers = 1):
+        """
+        Gets the tweets of all the specified users, like get_tweets(), but giving each
+        tweet as soon as it's available, instead of waiting for all the users.
+
+        Args:
+            -> users: A list with the name of the users whose tweets will be extracted
+
+            -> max_count (optional): Maximum number of tweets to extract for each user
 
             -> older_age (optional): Age of the oldest tweets to extract; in
                     UNIX epoch format
 
+            -> workers (optional): Number of users to fetch at the same time
+
+        Yields:
+            -> Tuples (username, tweet). The tweets of each user come from newest to
+                oldest, but the users may be interleaved
+        """
+        logger = logging.getLogger (__name__ + ".stream_tweets")
+
+        # Small buffer, so the workers don't get too far ahead of the consumer
+        events = queue.Queue (maxsize = 100)
+        stop = threading.Event ()
+        finished = object ()
+
+        def put (item):
+            while not stop.is_set ():
+                try:
+                    events.put (item, timeout = 0.1)
+                    return True
+                except queue.Full:
+                    pass
+
+            return False
+
+        def fetch (username):
+            timeline = []
+            try:
+                for tweet in self.iter_user_tweets (username, max_count, older_age):
+                    if not put ((username, tweet)):
+                        return
+
+                    # Saved (and stored, archived...) a page at a time, so they aren't
+                    # all kept in memory if 'keep_tweets' is False
+                    timeline.append (tweet)
+                    if len (timeline) >= self.page_size:
+                        self.add_tweets (username, timeline)
+                        timeline = []
+
+                self.add_tweets (username, timeline)
+
+            except Exception as e:
+                logger.error ("Failed to get tweets of '" + username + "' => " + str (e))
+
+            finally:
+                put (finished)
+
+        # Resolves all the users at once, instead of one request per user
+        self.get_users_rest_ids (users)
+
+        executor = ThreadPoolExecutor (max_workers = workers)
+        try:
+            for username in users:
+                executor.submit (fetch, username)
+
+            pending = len (users)
+            while pending > 0:
+                item = events.get ()
+
+                if item is finished:
+                    pending -= 1
+                else:
+                    yield item
+
+        finally:
+            # The consumer may stop before getting everything
+            stop.set ()
+            executor.shutdown (wait = False, cancel_futures = True)
+
+
+    def get_page_author (self, rest_id, raw_users, authors):
+        """
+        Gets the info about the owner of a tweet, to be shared by all the tweets on the
+        same page
+
+        Args:
+            -> rest_id: The REST id of the user
+
+            -> raw_users: The "globalObjects.users" object of the timeline response
+
+            -> authors: Dictionary with the authors already found on the page, by their
+                    REST id (it's updated with the new one)
+
         Returns:
-            -> A dictionary with the extracted tweets,
-            or
-            -> None, if the user hasn't been found
+            -> A model.UserProfile, if 'compact' is set; or a tuple (username,
+            displayname, uid, avatar), otherwise
         """
-        tweet_map = {}
+        if rest_id in authors:
+            return authors [rest_id]
+
+        user = raw_users.get (rest_id, {})
+        # GraphQL ids are just the base64 of "User:<rest_id>"
+        uid = base64.b64encode (("User:" + rest_id).encode ()).decode ()
+
+        if self.compact:
+            author = UserProfile (id = uid
+                                , rest_id = rest_id
+                                , name = user.get ("name")
+                                , screen_name = user.get ("screen_name")
+                                , profile_image_url = user.get ("profile_image_url_https")
+            )
+        else:
+            author = ( user.get ("screen_name")
+                    , user.get ("name")
+                    , uid
+                    , user.get ("profile_image_url_https")
+            )
 
-        logger = logging.getLogger (__name__ + ".get_next_page")
-        tweet_map = {}
+        authors [rest_id] = author
+        return author
 
 
-        logger.info ("Getting more tweets, starting from " + str (max_position))
-    #    try:
-    #        response = urllib2.urlopen (
-    #                        build_newpage_url (username, max_position)
-    #                        , timeout = timeout
-    #                    ).read ()
-    #
-    #    except urllib2.HTTPError as e:
-    #        logger.error ("No user found: '" + username + "' => " + str (e))
-    #        return None
-    #
-    #    except urllib2.URLError as e:
-    #        logger.error ("Timeout expired getting tweets of '" + username + "' => "
-    #                        + str (e)
-    #        )
-    #        return None
-    #
-    #    except ssl.SSLError as e:
-    #        logger.error ("Connection getting tweets of '" + username + "' => "
-    #                        + str (e)
-    #        )
-    #        return None
-        return None # TODO: NOT IMPLEMENTED
+    def build_tweet (self, tweet_id, raw, author, pinned = False, retweet_info = None
+                    , tweet_age = None):
+        """
+        Converts a tweet from the "globalObjects.tweets" object of the timeline response
+        to the format described on self.scraped_info (or to a model.Tweet)
+
+        Args:
+            -> tweet_id: ID of the tweet
 
-        resp_map = json.JSONDecoder ().decode (response)
+            -> raw: The tweet, as it's on the response
 
-        html = BeautifulSoup (resp_map ["items_html"], "html.parser")
+            -> author: The owner of the tweet, as returned by get_page_author()
 
-        # Deletes the old tweets on the page and adds the new ones
-        container = full_html.select ("#stream-items-id")[0]
-        container.clear ()
-        container.append (html)
+            -> pinned (optional): Whether the tweet is pinned on the timeline
 
-        html = str (full_html)
+            -> retweet_info (optional): Dictionary with the "retweet_id", "original_id"
+                    and "retweeter", if it's a retweet (then, 'raw' is the original tweet)
 
-        # Gets the map with the tweets
-        data = process_html (html, max_count, older_age)
+            -> tweet_age (optional): Date of the tweet, in UNIX epoch format. By default,
+                    the one on 'raw' (a retweet must have its own date, not the original's)
 
-        tweet_map = data ["tweet_map"]
-        n_items = len (data ["tweet_map"])
+        Returns:
+            -> The tweet
+        """
+        screen_name = author ["screen_name"] if self.compact else author [0]
 
-        # Checks if the maximum amount of requested data has been extracted
-        if n_items < max_count \
-            and resp_map ["has_more_items"] \
-            and not data ["older_age_reached"]:
-                tweet_map.update (
-                    get_next_page (username
-                                    , resp_map ["min_position"]
-                                    , full_html
-                                    , max_count - n_items
-                                    , older_age
-                    )
+        if tweet_age is None:
+            tweet_age = self.parse_date (raw ["created_at"])
+
+        # The link of a retweet leads to the original tweet
+        status_id = retweet_info ["original_id"] if retweet_info else tweet_id
+
+        if self.compact:
+            return Tweet (tweet_id = tweet_id
+                , permalink = "https://twitter.com/" + str (screen_name) + "/status/"
+                                + status_id
+                , stats = TweetStats (likes = raw ["favorite_count"]
+                                    , retweets = raw ["retweet_count"]
+                                    , replies = raw ["reply_count"]
                 )
+                , text = raw ["full_text"]
+                , tweet_age = tweet_age
+                , pinned = pinned
+                , conversation = raw ["conversation_id_str"]
+                , author = author
+                , retweet = (retweet_info is not None)
+                , retweet_info = retweet_info
+                , quoted_id = raw.get ("quoted_status_id_str")
+            )
+
+        # TODO: There has to be another endpoint to get more info about each tweet
+        tweet = {
+            "tweet_id": tweet_id
+            , "profile_pic": None
+            , "permalink": "https://twitter.com/" + str (screen_name) + "/status/"
+                            + status_id
+            , "stats": {
+                  "likes": raw ["favorite_count"]
+                , "retweets": raw ["retweet_count"]
+                , "replies": raw ["reply_count"]
+            }
+            , "text": raw ["full_text"]
+            , "tweet_age": tweet_age
+            , "pinned": pinned
+            , "conversation": raw ["conversation_id_str"]
+            , "user": {
+                # Information of the owner of the tweet (important if it's a retweet)
+                  "username": author [0]
+                , "displayname": author [1]
+                , "uid": author [2]
+                , "avatar": author [3]
+            }
+            , "retweet": (retweet_info is not None)
+        }
 
-        return tweet_map
+        if retweet_info is not None:
+            tweet ["retweet_info"] = retweet_info
 
+        # Only the ID of the quoted tweet is kept
+        if "quoted_status_id_str" in raw:
+            tweet ["quoted_id"] = raw ["quoted_status_id_str"]
 
-    def get_user_tweets (self, username, max_count = 10, older_age = None):
+        return tweet
+
+
+    def parse_date (self, date):
         """
-        Gets the tweets of the specified user, up to 'max' elements; or until the max old
-        date is reached (whatever comes first)
+        Converts a date from the API responses (like "Wed Oct 10 20:19:24 +0000 2018") to
+        a UNIX epoch. Splitting the string is way faster than datetime.strptime(), which is
+        used only if the date doesn't have the expected format.
 
         Args:
-            -> username: Name of the user whose tweets will be extracted, performing a
-                request to https://twitter.com/<username>
+            -> date: String with the date
 
-            -> max_count (optional): Maximum number of tweets to extract
+        Returns:
+            -> The UNIX epoch, as an integer
+        """
+        try:
+            _, month, day, hms, offset, year = date.split (" ")
+            hours, minutes, seconds = hms.split (":")
 
-            -> older_age (optional): Age of the oldest tweets to extract; in
-                    UNIX epoch format
+            epoch = calendar.timegm ((int (year), self.months [month], int (day)
+                                    , int (hours), int (minutes), int (seconds)
+            ))
+            # The offset is "+HHMM" or "-HHMM"
+            sign = -1 if offset [0] == "-" else 1
+            epoch -= sign * (int (offset [1:3]) * 3600 + int (offset [3:5]) * 60)
+
+            return epoch
+
+        except (ValueError, KeyError):
+            return int (datetime.strptime (date, self.date_format).timestamp ())
+
+
+    def get_author (self, username):
+        """
+        Gets the model.UserProfile shared by all the tweets of a user, creating it again
+        if the user's info on self.scraped_info has been replaced
+
+        Args:
+            -> username: Name of the user
 
         Returns:
-            -> A list with the extracted tweets, ordered from newest (index 0) to oldest
-            or
-            -> None, if the user hasn't been found
+            -> The UserProfile
         """
-        logger = logging.getLogger (__name__ + ".get_user_tweets")
+        profile = self.scraped_info [username]
+        source, author = self.authors.get (username, (None, None))
 
-        rest_id = self.get_user_rest_id (username)
-        if not rest_id:
-            logger.error ("No user with name '" + username + "' has been found")
+        if source is not profile:
+            author = UserProfile.from_dict (profile)
+            self.authors [username] = (profile, author)
+
+        return author
+
+
+    def request_timeline (self, username, rest_id, count, cursor = None):
+        """
+        Requests a page of the timeline of a user
+
+        Args:
+            -> username: Name of the user whose tweets will be extracted
+
+            -> rest_id: The REST id of the user
+
+            -> count: Number of tweets to request
+
+            -> cursor (optional): Value of a cursor to request the tweets before ("bottom")
+                    or after ("top") those already retrieved
+
+        Returns:
+            -> The decoded JSON response, or None if the request failed
+        """
+        logger = logging.getLogger (__name__ + ".request_timeline")
+
+        if self.breaker and not self.breaker.allow (username):
+            logger.warning ("Skipping '" + username + "' after too many errors")
             return None
 
         try:
             # Doubles the timeout, as this information is crucial to get updates
-            response = requests.get (
-                            self.build_twitter_url (rest_id, max_count)
-                            , timeout = (self.timeout * 2)
-                            , headers = {
-                                "Authorization": "Bearer " + self.BEARER_TOKEN,
-                                "x-guest-token": self.GUEST_TOKEN
-                            }
-                        ).json ()
-        except KeyboardInterrupt as e:
+            response = self.call_api (self.build_twitter_url (rest_id, count, cursor)
+                                    , timeout = (self.timeout * 2)
+            )
+        except FetchError as e:
             logger.error ("Failed to get user's tweets => " + str (e))
+
+            if self.breaker:
+                self.breaker.failure (username, e)
             return None
 
+        if self.breaker:
+            self.breaker.success (username)
+
+        return response
+
+
+    def parse_timeline (self, username, response):
+        """
+        Extracts the tweets and the cursors from a page of the timeline of a user
+
+        Args:
+            -> username: Name of the user whose tweets were requested
+
+            -> response: The decoded JSON response of the timeline endpoint
+
+        Returns:
+            -> A dictionary with the following keys:
+                    - tweets: List with the tweets, ordered from newest (index 0) to oldest
+                    - cursor: Dictionary with the "top" and "bottom" cursors of the page
+        """
+        logger = logging.getLogger (__name__ + ".parse_timeline")
+
         # There are two main objects:
-        #    - $.globalObjects.tweets => Holds the tweets' info, without order
+        #    - $.globalObjects => Holds the tweets' (and their users') info, without order.
+        #           It also has the retweeted and quoted tweets, which aren't on the
+        #           timeline, so only the tweets referenced by the timeline are extracted
         #    - $.timeline.instructions[0].addEntries.entries => List to order the tweets
-        elems = response ["globalObjects"]["tweets"]
-        tweets = {}
+        raw_tweets = response ["globalObjects"]["tweets"]
+        raw_users = response ["globalObjects"].get ("users", {})
 
         try:
             pinned_entry = response ["timeline"]["instructions"][1]["pinEntry"]["entry"]\
@@ -580,67 +1706,74 @@ class Scraper:
             logger.info ("No pinned entry for user " + username)
             pinned_entry = None
 
-        # Once again, the format for this JSON is available in the README.md
-        for k in elems:
-
-            user = self.scraped_info [username]
-
-            # TODO: There has to be another endpoint to get more info about each tweet
-            tweets [k] = {
-                "tweet_id": k
-                , "profile_pic": None
-                , "permalink": "https://twitter.com/" + username + "/status/" + k
-                , "stats": {
-                      "likes": elems [k]["favorite_count"]
-                    , "retweets": elems [k]["retweet_count"]
-                    , "replies": elems [k]["reply_count"]
-                }
-                , "text": elems [k]["full_text"]
-                , "tweet_age": elems [k]["created_at"]
-                , "pinned": (k == pinned_entry)
-                , "conversation": elems [k]["conversation_id_str"]
-                , "user": {
-                    # Information of the owner of the tweet (important if it's a retweet)
-                      "username": user ["screen_name"]
-                    , "displayname": user ["name"]
-                    , "uid": user ["id"]
-                    , "avatar": user ["profile_image_url"]
-                }
-                , "retweet": False
-            }
+        # Authors of the tweets of this page, by their REST id (see get_page_author())
+        owner = self.scraped_info [username]
+        authors = {
+            owner ["rest_id"]: (self.get_author (username) if self.compact
+                                else ( owner ["screen_name"]
+                                    , owner ["name"]
+                                    , owner ["id"]
+                                    , owner ["profile_image_url"]
+                                )
+                            )
+        }
 
-        # Orders the tweets according to the timeline
-        #    - $.timeline.instructions[0].addEntries.entries => List to order the tweets
         elems = response ["timeline"]["instructions"][0]["addEntries"]["entries"]
 
         timeline = []
+        cursors = { "top": None, "bottom": None }
         for x in elems:
             content = x ["content"]
             # Cursor
             if "operation" in content:
                 cursor = content ["operation"]["cursor"]
-                # Updates the info in self.scraped_info
                 if cursor ["cursorType"] == "Top":
-                    self.scraped_info [username]["cursor"]["top"] = cursor ["value"]
+                    cursors ["top"] = cursor ["value"]
                 else:
-                    self.scraped_info [username]["cursor"]["bottom"] = cursor ["value"]
+                    cursors ["bottom"] = cursor ["value"]
+
+                continue
 
             # Tweet-id
-            else:
-                searched_id = content ["item"]["content"]["tweet"]["id"]
+            entry_id = content ["item"]["content"]["tweet"]["id"]
+            raw = raw_tweets.get (entry_id)
 
-                # Searches that tweet and appends it to the definitive list
-                if searched_id in tweets:
-                    timeline.append (tweets [searched_id])
-                else:
-                    # WTF?
-                    logger.error ("Tweet " + str (searched_id)
-                        + " expected in the timeline, but not found in the tweets list"
-                    )
+            if raw is None:
+                # WTF?
+                logger.error ("Tweet " + str (entry_id)
+                    + " expected in the timeline, but not found in the tweets list"
+                )
+                continue
+
+            # On a retweet, the text, stats and author are taken from the original tweet;
+            # but the ID and the date are the retweet's, so the timeline stays ordered
+            retweet_info = None
+            tweet_age = None
+            original_id = raw.get ("retweeted_status_id_str")
+
+            if original_id and original_id in raw_tweets:
+                retweet_info = { "retweet_id": entry_id
+                                , "original_id": original_id
+                                , "retweeter": username
+                }
+                tweet_age = self.parse_date (raw ["created_at"])
+                raw = raw_tweets [original_id]
 
-        tmp = timeline + self.scraped_info [username]["tweets"]
-        self.scraped_info [username]["tweets"] = tmp
-        return timeline
+            author = self.get_page_author (raw.get ("user_id_str", owner ["rest_id"])
+                                            , raw_users
+                                            , authors
+            )
+
+            timeline.append (self.build_tweet (entry_id
+                                                , raw
+                                                , author
+                                                , pinned = (entry_id == pinned_entry)
+                                                , retweet_info = retweet_info
+                                                , tweet_age = tweet_age
+                            )
+            )
+
+        return { "tweets": timeline, "cursor": cursors }
 
 
     def get_tweets (self, users, max_count = 10, older_age = None):
@@ -661,13 +1794,27 @@ class Scraper:
             A dictionary with the extracted tweets.
         """
 #        tweets = {}
+        from tqdm import tqdm
+
         logger = logging.getLogger (__name__ + ".get_tweets")
 
+        # Resolves all the users at once, instead of one request per user
+        self.get_users_rest_ids (users)
+
+        # Each user's tweets are committed to 'store' on their own transaction (see
+        # add_tweets()), so an error (or Ctrl-C) doesn't lose those already retrieved
         for username in tqdm (users):
 
             logger.info ("Getting tweets of '" + username + "'")
 
-            data = self.get_user_tweets (username, max_count, older_age)
+            # An error with one user doesn't stop the rest
+            try:
+                data = self.get_user_tweets (username, max_count, older_age)
+            except Exception as e:
+                logger.error ("Failed to get the tweets of '" + username + "' => "
+                            + str (e)
+                )
+                data = None
 
             if not data:
 #                tweets [username] = data
@@ -677,122 +1824,245 @@ class Scraper:
         return self.scraped_info
 
 
-    def get_update_info (username):
+    def get_update_info (self, username, max_count = 10):
         """
-        Gets al the needed info to later use with 'get_new_tweets'
+        Gets al the needed info to later use with 'get_new_tweets'. If the tweets of the
+        user haven't been retrieved yet, gets the first 'max_count' of them.
 
         Args:
-            -> username: Name of the user whose tweets will be extracted, performing a
-                request to https://twitter.com/<username>
+            -> username: Name of the user whose tweets will be extracted
+
+            -> max_count (optional): Maximum number of tweets to extract, if the user's
+                    tweets haven't been retrieved yet
 
         Returns:
             -> A dictionary with the following keys:
-                    - html: The parsed HTML, as a BeautifulSoup object
-                    - max_pos: The ID of the newer tweet
+                    - cursor: The "top" cursor, used to request the newer tweets
+                    - tweets: List with the tweets already retrieved
             or
-            -> None, if the user hasn't been found
+            -> None, if the user hasn't been found (or its timeline couldn't be
+            retrieved, so there's no cursor to get updates from)
         """
-        tweet_map = {}
         logger = logging.getLogger (__name__ + ".get_update_info")
 
-    #    try:
-    #        response = urllib2.urlopen (
-    #                        build_twitter_url (username)
-    #                        , timeout = timeout
-    #                    ).read ()
-    #
-    #    except urllib2.HTTPError as e:
-    #        logger.error ("No user found: '" + username + "' => " + str (e))
-    #        return None
-    #
-    #    except urllib2.URLError as e:
-    #        logger.error ("Timeout expired getting tweets of '" + username + "' => "
-    #                        + str (e)
-    #        )
-    #        return None
-    #
-    #    except ssl.SSLError as e:
-    #        logger.error ("Connection getting tweets of '" + username + "' => "
-    #                        + str (e)
-    #        )
-    #        return None
-        return None # TODO: NOT IMPLEMENTED
+        user = self.scraped_info.get (username)
+
+        if not user or not user ["cursor"]["top"]:
+            logger.info ("Getting initial tweets from '" + username + "'")
+
+            if self.get_user_tweets (username, max_count) is None:
+                return None
+
+            user = self.scraped_info [username]
 
-        parsed = BeautifulSoup (response, "html.parser")
-        max_position = parsed.select (".stream-container") [0]["data-max-position"]
+            # The first page failed: get_new_tweets() would have nothing to start from
+            if not user ["cursor"]["top"]:
+                logger.error ("Couldn't get the timeline of '" + username + "'")
+                return None
 
-        return {"html": parsed, "max_pos": max_position}
+        return { "cursor": user ["cursor"]["top"], "tweets": user ["tweets"] }
 
 
 
-    def get_new_tweets (username, min_position, full_html):
+    def get_new_tweets (self, username, count = 20):
         """
-        Queries the server for update info (new tweets)
+        Queries the server for update info (new tweets), using the "top" cursor stored on
+        self.scraped_info by a previous call to 'get_update_info' (or 'get_user_tweets').
+        The new tweets are added to self.scraped_info, and the cursor is moved to the
+        newest one.
 
         Args:
-            -> username: Name of the user whose tweets will be extracted, performing a
-                request to https://twitter.com/<username>
+            -> username: Name of the user whose tweets will be extracted
 
-            -> min_position: Parameter to perform the request
-
-            -> full_html: BeautifulSoup object with the main HTML, to extract some global
-                    data of the user, like the user's avatar
+            -> count (optional): Maximum number of new tweets to request
 
         Returns:
-            -> A dictionary with the extracted tweets (it may be empy, if no new tweets were
-            found),
+            -> A dictionary with the extracted tweets by their ID, from newest to oldest (it
+            may be empy, if no new tweets were found),
             or
-            -> None, if the user hasn't been found
+            -> None, if the user hasn't been found (or there was no cursor to start from)
         """
-        tweet_map = {}
         logger = logging.getLogger (__name__ + ".get_new_tweets")
 
+        user = self.scraped_info.get (username)
+        if not user or not user ["cursor"]["top"]:
+            logger.error ("No info to get updates from '" + username + "'")
+            return None
+
+        min_position = user ["cursor"]["top"]
         logger.info ("Updating tweets from " + username + ", starting from "
                     + str (min_position)
         )
 
-    #    try:
-    #        response = urllib2.urlopen (
-    #                        build_update_url (username, min_position)
-    #                        , timeout = timeout
-    #                ).read ()
-    #
-    #    except urllib2.HTTPError as e:
-    #        logger.error ("No user found: '" + username + "' => " + str (e))
-    #        return None
-    #
-    #    except urllib2.URLError as e:
-    #        logger.error ("Timeout expired getting tweets of '" + username + "' => "
-    #                        + str (e)
-    #        )
-    #        return None
-    #
-    #    except ssl.SSLError as e:
-    #        logger.error ("Connection getting tweets of '" + username + "' => "
-    #                        + str (e)
-    #        )
-    #        return None
-        return None # TODO: NOT IMPLEMENTED
+        page = self.get_next_page (username, user ["rest_id"], min_position, count)
+        if page is None:
+            return None
+
+        # Even the tweets already seen have their stats updated
+        if self.engagement:
+            self.engagement.record (username, page ["tweets"])
+
+        with self._update_lock:
+            # Another thread may have already moved the cursor with the same tweets
+            if user ["cursor"]["top"] != min_position:
+                logger.info ("Cursor of '" + username + "' already updated")
+                return {}
+
+            # The pinned tweet (or any already seen) may be sent again. Without the
+            # previous tweets, at least the pinned one can be discarded
+            new_tweets = [ t for t in page ["tweets"]
+                            if t ["tweet_id"] not in user ["tweets"]
+                                and (self.keep_tweets or not t ["pinned"])
+            ]
+
+            if page ["cursor"]["top"]:
+                user ["cursor"]["top"] = page ["cursor"]["top"]
+
+            if self.keep_tweets:
+                user ["tweets"].merge (new_tweets)
+
+            if self.store:
+                with self.store.batch ():
+                    self.store.add_tweets (username, new_tweets)
+                    self.store.add_profile (username, user)
+
+        if self.archive:
+            self.archive.write (username, new_tweets)
+
+        if self.index:
+            self.index.add (username, new_tweets)
+
+        logger.info ("Got " + str (len (new_tweets)) + " new tweets from " + username)
+        return { t ["tweet_id"]: t for t in new_tweets }
+
+
+class AsyncScraper (Scraper):
+    """
+    Scraper that gets the tweets of many users at the same time, instead of waiting for
+    each user to finish before starting with the next one.
+
+    The blocking requests are executed on a pool of threads, with at most 'concurrency'
+    users being fetched at the same time.
+    """
+
+    """
+    Maximum number of users whose tweets are being fetched at the same time
+    """
+    concurrency = 8
+
+    def __init__ (self, concurrency = None, **kwargs):
+        """
+        Initializes the HTTP session and the limit of concurrent requests.
+
+        Args:
+            -> concurrency (optional): Maximum number of users to fetch at the same time
+
+            -> kwargs: Any other argument accepted by Scraper. If 'pool_size' is lower
+                    than 'concurrency', the latter is used instead
+        """
+        if concurrency:
+            self.concurrency = concurrency
+
+        # Every worker needs its own connection, or they would wait for each other
+        kwargs ["pool_size"] = max (kwargs.get ("pool_size") or self.pool_size
+                                    , self.concurrency
+        )
+
+        super ().__init__ (**kwargs)
+
+
+    def stream_tweets (self, users, max_count = 10, older_age = None, workers = None):
+        """
+        Same as Scraper.stream_tweets(), but with 'concurrency' workers by default.
+        """
+        return super ().stream_tweets (users
+                                    , max_count
+                                    , older_age
+                                    , workers if workers else self.concurrency
+        )
+
+
+    async def fetch_tweets (self, users, max_count = 10, older_age = None):
+        """
+        Coroutine to get the tweets of all the specified users, up to 'max' elements; or
+        until the max old date is reached (whatever comes first).
+        An error getting the tweets of one user doesn't stop the rest.
+
+        Args:
+            -> users: A list with the name of the users whose tweets will be extracted
+
+            -> max_count (optional): Maximum number of tweets to extract
+
+            -> older_age (optional): Age of the oldest tweets to extract; in
+                    UNIX epoch format
+
+        Returns:
+            A dictionary with the extracted tweets, with the users in the same order as
+            in 'users'
+        """
+        from tqdm import tqdm
+
+        logger = logging.getLogger (__name__ + ".fetch_tweets")
+
+        loop = asyncio.get_running_loop ()
+        semaphore = asyncio.Semaphore (self.concurrency)
+        progress = tqdm (total = len (users))
+
+        async def fetch (username):
+            async with semaphore:
+                logger.info ("Getting tweets of '" + username + "'")
+                try:
+                    return await loop.run_in_executor (executor
+                                                    , self.get_user_tweets
+                                                    , username
+                                                    , max_count
+                                                    , older_age
+                    )
+                finally:
+                    progress.update ()
+
+        with ThreadPoolExecutor (max_workers = self.concurrency) as executor:
+            # Resolves all the users at once, instead of one request per user
+            await loop.run_in_executor (executor, self.get_users_rest_ids, users)
+
+            results = await asyncio.gather (* [ fetch (u) for u in users ]
+                                            , return_exceptions = True
+            )
+
+        progress.close ()
 
-        resp_map = json.JSONDecoder ().decode (response)
+        for username, data in zip (users, results):
+            if isinstance (data, Exception):
+                logger.error ("Failed to get tweets of '" + username + "' => "
+                                + str (data)
+                )
+            elif not data:
+                logger.info ("No data retrieved from '" + username + "'")
+
+        # The users are added to scraped_info as their requests finish, so they are
+        # moved back to the order in which they were requested
+        for username in dict.fromkeys (users):
+            if username in self.scraped_info:
+                self.scraped_info [username] = self.scraped_info.pop (username)
 
-        # If 'new_latent_count' is 0, no new tweets were recieved
-        if resp_map ["new_latent_count"] == 0:
-            # Returns an empty dictionary
-            return tweet_map
+        return self.scraped_info
 
-        html = BeautifulSoup (resp_map ["items_html"], "html.parser")
 
-        # Deletes the old tweets on the page and adds the new ones
-        container = full_html.select ("#stream-items-id")[0]
-        container.clear ()
-        container.append (html)
+    def get_tweets (self, users, max_count = 10, older_age = None):
+        """
+        Synchronous wrapper around fetch_tweets(), with the same interface as
+        Scraper.get_tweets(). It can't be called from a running event loop (await
+        fetch_tweets() directly, instead).
 
-        html = str (full_html)
+        Args:
+            -> users: A list with the name of the users whose tweets will be extracted
 
-        # Gets the map with the tweets
-        data = process_html (html, max_count = resp_map ["new_latent_count"])
+            -> max_count (optional): Maximum number of tweets to extract
 
-        tweet_map = data ["tweet_map"]
+            -> older_age (optional): Age of the oldest tweets to extract; in
+                    UNIX epoch format
 
-        return tweet_map
+        Returns:
+            A dictionary with the extracted tweets.
+        """
+        return asyncio.run (self.fetch_tweets (users, max_count, older_age))
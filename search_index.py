@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Full-text search over the retrieved tweets.
+"""
+import bisect \
+    , heapq \
+    , re \
+    , threading
+
+from array import array
+
+
+"""
+Words of a text, as they're indexed and searched
+"""
+TOKEN_RE = re.compile (r"\w+")
+
+"""
+Parts of a query: "quoted phrases" or single words
+"""
+QUERY_RE = re.compile (r'"([^"]*)"|(\S+)')
+
+"""
+Bits of the key of each tweet after its 'tweet_age' (see TweetIndex.key())
+"""
+SEQUENCE_BITS = 22
+
+
+def tokenize (text):
+    """
+    Splits a text into its words, in lowercase
+
+    Args:
+        -> text: The text
+
+    Returns:
+        -> A list with the words, in the same order
+    """
+    return TOKEN_RE.findall (text.lower ())
+
+
+class TweetIndex:
+    """
+    Inverted index of the text of the tweets: for each word, a posting list with the
+    tweets that contain it, ordered by their date (each tweet has a key with its
+    'tweet_age' on the highest bits, see key()). The new tweets are usually newer than the
+    indexed ones, so adding them just appends their keys at the end of each list (the
+    lists that get older tweets are sorted again before the next search). Each user also
+    has a posting list with all its tweets.
+
+    A query finds the tweets with all its words (and "quoted phrases") by walking the
+    shortest posting list (or the lists of the requested users, if they're shorter) from
+    the newest tweet, looking for each of its tweets on the other lists with a binary
+    search; so it stops as soon as 'limit' tweets are found. The time range is just
+    another binary search on each list, to walk only the tweets inside it.
+    """
+
+    def __init__ (self):
+        self.lock = threading.Lock ()
+
+        # Word -> array with the keys of the tweets, from oldest to newest
+        self.postings = {}
+
+        # Key -> (user, tweet ID as integer, tweet_age, text)
+        self.docs = {}
+
+        # ID of the tweet (as integer) -> key
+        self.keys = {}
+
+        self.users = []
+        self.user_index = {}
+        # Array with the keys of the tweets of each user, from oldest to newest
+        self.user_postings = []
+
+        # Words and users whose posting lists have to be sorted again
+        self.unsorted_words = set ()
+        self.unsorted_users = set ()
+
+
+    def key (self, tweet_id, tweet_age):
+        """
+        Gets an unused key for a tweet: its 'tweet_age' followed by SEQUENCE_BITS bits
+        (taken from its ID, unless another tweet of the same second already has them)
+
+        Args:
+            -> tweet_id: ID of the tweet, as an integer
+
+            -> tweet_age: Date of the tweet, in UNIX epoch format
+
+        Returns:
+            -> The key, as an integer
+        """
+        base = int (tweet_age) << SEQUENCE_BITS
+        mask = (1 << SEQUENCE_BITS) - 1
+
+        for i in range (mask + 1):
+            key = base | ((tweet_id + i) & mask)
+            if key not in self.docs:
+                return key
+
+        raise OverflowError ("Too many tweets on the same second")
+
+
+    @staticmethod
+    def append (posting, key):
+        """
+        Adds a key at the end of a posting list
+
+        Args:
+            -> posting: The posting list
+
+            -> key: The key to add
+
+        Returns:
+            -> False if the list is no longer ordered
+        """
+        ordered = not posting or key > posting [-1]
+        posting.append (key)
+
+        return ordered
+
+
+    def sort_postings (self, words, users):
+        """
+        Sorts again the posting lists that got older tweets, if they're needed
+
+        Args:
+            -> words: The words whose lists will be read
+
+            -> users: The indexes of the users whose lists will be read
+        """
+        for word in self.unsorted_words.intersection (words):
+            self.postings [word] = array ("q", sorted (self.postings [word]))
+            self.unsorted_words.discard (word)
+
+        for user in self.unsorted_users.intersection (users):
+            self.user_postings [user] = array ("q", sorted (self.user_postings [user]))
+            self.unsorted_users.discard (user)
+
+
+    def add (self, screen_name, tweets):
+        """
+        Indexes the given tweets. Those already indexed are skipped
+
+        Args:
+            -> screen_name: User from whose timeline the tweets were retrieved
+
+            -> tweets: List with the tweets (dictionaries or model.Tweet)
+        """
+        with self.lock:
+            user = self.user_index.get (screen_name)
+            if user is None:
+                user = self.user_index [screen_name] = len (self.users)
+                self.users.append (screen_name)
+                self.user_postings.append (array ("q"))
+
+            for tweet in tweets:
+                tweet_id = int (tweet ["tweet_id"])
+                if tweet_id in self.keys:
+                    continue
+
+                text = tweet ["text"]
+                key = self.key (tweet_id, tweet ["tweet_age"])
+
+                self.keys [tweet_id] = key
+                self.docs [key] = (user, tweet_id, tweet ["tweet_age"], text)
+                if not self.append (self.user_postings [user], key):
+                    self.unsorted_users.add (user)
+
+                for word in set (tokenize (text)):
+                    posting = self.postings.get (word)
+
+                    if posting is None:
+                        self.postings [word] = array ("q", [key])
+                    elif not self.append (posting, key):
+                        self.unsorted_words.add (word)
+
+
+    @staticmethod
+    def parse_query (query):
+        """
+        Splits a query into its words and phrases
+
+        Args:
+            -> query: Words and "quoted phrases", separated by spaces
+
+        Returns:
+            -> A tuple (words, phrases), where 'words' has every word on the query (also
+                the ones on the phrases) and 'phrases' has each phrase as a list of words
+        """
+        words = set ()
+        phrases = []
+
+        for phrase, word in QUERY_RE.findall (query):
+            tokens = tokenize (phrase if phrase else word)
+            words.update (tokens)
+
+            if len (tokens) > 1:
+                phrases.append (tokens)
+
+        return (words, phrases)
+
+
+    def search (self, query, users = None, since = None, until = None, limit = None
+                , tweet_ids = None):
+        """
+        Finds the tweets with all the words and phrases of the query
+
+        Args:
+            -> query: Words and "quoted phrases", separated by spaces (case-insensitive)
+
+            -> users (optional): List with the users whose tweets can be found. By
+                    default, all of them
+
+            -> since (optional): Age of the oldest tweets to find; in UNIX epoch format
+
+            -> until (optional): Age of the newest tweets to find; in UNIX epoch format
+
+            -> limit (optional): Maximum number of tweets to find (the newest ones)
+
+            -> tweet_ids (optional): Only these tweets can be found
+
+        Returns:
+            -> A list of dictionaries with the keys "tweet_id", "screen_name",
+                "tweet_age" and "text", from newest to oldest
+        """
+        words, phrases = self.parse_query (query)
+        if not words:
+            return []
+
+        # Range of keys of the tweets between 'since' and 'until'
+        low = (int (since) << SEQUENCE_BITS) if since is not None else None
+        high = ((int (until) + 1) << SEQUENCE_BITS) if until is not None else None
+
+        def bounds (posting):
+            return (bisect.bisect_left (posting, low) if low is not None else 0
+                    , bisect.bisect_left (posting, high) if high is not None
+                        else len (posting)
+            )
+
+        def newest_first (posting):
+            start, end = bounds (posting)
+            return (posting [i] for i in range (end - 1, start - 1, -1))
+
+        with self.lock:
+            allowed = None
+            if users is not None:
+                allowed = { self.user_index [u] for u in users if u in self.user_index }
+                if not allowed:
+                    return []
+
+            self.sort_postings (words, allowed if allowed is not None else ())
+
+            lists = []
+            for word in words:
+                posting = self.postings.get (word)
+                if not posting:
+                    return []
+                lists.append ((posting, bounds (posting)))
+
+            lists.sort (key = lambda l: l [1][1] - l [1][0])
+            shortest = lists [0][0]
+            others = [ posting for posting, _ in lists [1:] ]
+
+            # Number of tweets of the requested users inside the time range
+            user_tweets = None
+            if allowed is not None:
+                user_tweets = sum (end - start for start, end in (
+                                    bounds (self.user_postings [u]) for u in allowed
+                ))
+
+            if tweet_ids is not None:
+                candidates = sorted ((self.keys [int (t)] for t in tweet_ids
+                                        if int (t) in self.keys
+                                    )
+                                    , reverse = True
+                )
+                others.append (shortest)
+
+            elif user_tweets is not None \
+                    and user_tweets < lists [0][1][1] - lists [0][1][0]:
+                # The requested users have less tweets than the rarest word
+                candidates = heapq.merge (* [ newest_first (self.user_postings [u])
+                                                for u in allowed ]
+                                        , reverse = True
+                )
+                others.append (shortest)
+                allowed = None
+
+            else:
+                candidates = newest_first (shortest)
+
+            results = []
+            for key in candidates:
+                if limit is not None and len (results) >= limit:
+                    break
+
+                if (low is not None and key < low) or (high is not None and key >= high):
+                    continue
+
+                if not all (self.contains (p, key) for p in others):
+                    continue
+
+                user, tweet_id, tweet_age, text = self.docs [key]
+
+                if allowed is not None and user not in allowed:
+                    continue
+
+                if phrases:
+                    tokens = tokenize (text)
+                    if not all (self.has_phrase (tokens, p) for p in phrases):
+                        continue
+
+                results.append ({
+                    "tweet_id": str (tweet_id)
+                    , "screen_name": self.users [user]
+                    , "tweet_age": tweet_age
+                    , "text": text
+                })
+
+        return results
+
+
+    @staticmethod
+    def contains (posting, key):
+        """
+        Checks if a tweet is on a posting list
+
+        Args:
+            -> posting: The posting list
+
+            -> key: Key of the tweet
+        """
+        i = bisect.bisect_left (posting, key)
+        return i < len (posting) and posting [i] == key
+
+
+    @staticmethod
+    def has_phrase (tokens, phrase):
+        """
+        Checks if the words of a phrase are together, in the same order, on a text
+
+        Args:
+            -> tokens: The words of the text
+
+            -> phrase: The words of the phrase
+        """
+        n = len (phrase)
+        return any (tokens [i:i + n] == phrase
+                        for i in range (len (tokens) - n + 1)
+                            if tokens [i] == phrase [0]
+        )
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Measurement of the time spent on each phase of the startup of the CLI (imports,
+arguments, initialization...), to keep an eye on how long a one-shot run takes.
+"""
+import sys \
+    , time
+
+
+class StartupProfile:
+    """
+    Splits the time since the startup began on consecutive phases, each one ending when
+    mark() is called with its name.
+    """
+
+    def __init__ (self, started = None):
+        """
+        Args:
+            -> started (optional): Value of time.perf_counter() when the startup began.
+                    By default, now
+        """
+        self.started = started if started is not None else time.perf_counter ()
+        self.last = self.started
+
+        # Tuples (name, seconds), in the order in which they finished
+        self.phases = []
+
+
+    def mark (self, name):
+        """
+        Ends a phase, which started when the previous one ended
+
+        Args:
+            -> name: Name of the phase
+        """
+        now = time.perf_counter ()
+
+        self.phases.append ((name, now - self.last))
+        self.last = now
+
+
+    def total (self):
+        """
+        Gets the time since the startup began until the last phase ended
+
+        Returns:
+            -> The time, in seconds
+        """
+        return self.last - self.started
+
+
+    def report (self, stream = None):
+        """
+        Writes the time spent on each phase
+
+        Args:
+            -> stream (optional): Text stream where the report is written. By default,
+                    sys.stderr
+        """
+        stream = stream if stream else sys.stderr
+
+        lines = [ "Startup profile:" ]
+        for name, seconds in self.phases:
+            lines.append ("  {0:<30} {1:>9.1f} ms".format (name, seconds * 1000))
+
+        lines.append ("  {0:<30} {1:>9.1f} ms".format ("Total", self.total () * 1000))
+
+        stream.write ("\n".join (lines) + "\n")
+        stream.flush ()
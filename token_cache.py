@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache for the authorization tokens, so they don't have to be requested again
+on every run.
+"""
+import logging \
+    , json \
+    , time \
+    , os \
+    , tempfile \
+    , threading
+
+from cache_files import default_path
+
+
+class TokenCache:
+    """
+    Stores the bearer and guest tokens on a JSON file, with the following structure:
+
+    {
+        "<URL of the file where the bearer token was found>": {
+            "bearer": { "value": "<token>", "time": <(NUM) UNIX epoch when it was stored> }
+            , "guest": [
+                { "value": "<token>", "time": <(NUM) UNIX epoch when it was stored> }
+                # ... (the rest of the pool of guest tokens)
+            ]
+        }
+        # ... (more URLs)
+    }
+
+    The bearer token is hard-coded on a file whose name changes with its contents, so it
+    can be kept for a long time. The guest tokens, on the other hand, expire after a few
+    hours; all the tokens of the pool are kept (see add()), so it's full again right
+    after starting.
+    """
+
+    """
+    Seconds before a cached bearer token has to be requested again
+    """
+    bearer_ttl = 7 * 24 * 60 * 60
+
+    """
+    Seconds before a cached guest token has to be requested again
+    """
+    guest_ttl = 2 * 60 * 60
+
+    def __init__ (self, path = None, bearer_ttl = None, guest_ttl = None):
+        """
+        Initializes the location of the cache file. The file is not read until a token is
+        requested.
+
+        Args:
+            -> path (optional): Path of the JSON file. By default, 'tweet-feed/tokens.json'
+                    inside $XDG_CACHE_HOME (or ~/.cache)
+
+            -> bearer_ttl (optional): Seconds to keep the bearer token
+
+            -> guest_ttl (optional): Seconds to keep the guest token
+        """
+        if not path:
+            path = default_path ("tokens.json")
+
+        self.path = path
+
+        if bearer_ttl is not None:
+            self.bearer_ttl = bearer_ttl
+
+        if guest_ttl is not None:
+            self.guest_ttl = guest_ttl
+
+        self.lock = threading.Lock ()
+
+
+    def load (self):
+        """
+        Reads the contents of the cache file
+
+        Returns:
+            -> A dictionary with the cached tokens (empty, if the file couldn't be read)
+        """
+        logger = logging.getLogger (__name__ + ".load")
+
+        try:
+            with open (self.path, "r") as in_file:
+                return json.load (in_file)
+
+        except FileNotFoundError:
+            return {}
+
+        except Exception as e:
+            logger.warning ("Ignoring unreadable token cache '" + self.path + "' => "
+                            + str (e)
+            )
+            return {}
+
+
+    def ttl (self, kind):
+        """
+        Gets the time to keep a type of token
+
+        Args:
+            -> kind: Type of token: "bearer" or "guest"
+
+        Returns:
+            -> The seconds to keep it
+        """
+        return self.bearer_ttl if kind == "bearer" else self.guest_ttl
+
+
+    @staticmethod
+    def entries (data, url, kind):
+        """
+        Gets the stored tokens of a type, whether there's one of them (set()) or a list
+        (add())
+
+        Args:
+            -> data: Contents of the cache file, as returned by load()
+
+            -> url: URL of the file where the bearer token is obtained
+
+            -> kind: Type of token: "bearer" or "guest"
+
+        Returns:
+            -> A list with the entries { "value": <token>, "time": <UNIX epoch> }
+        """
+        entry = data.get (url, {}).get (kind)
+        if not entry:
+            return []
+
+        return entry if isinstance (entry, list) else [ entry ]
+
+
+    def get_all (self, url, kind):
+        """
+        Gets all the tokens of a type that haven't expired yet
+
+        Args:
+            -> url: URL of the file where the bearer token is obtained
+
+            -> kind: Type of token: "bearer" or "guest"
+
+        Returns:
+            -> A list with tuples (token, UNIX epoch when it was stored), from the oldest
+                to the newest one
+        """
+        ttl = self.ttl (kind)
+        now = time.time ()
+
+        with self.lock:
+            entries = self.entries (self.load (), url, kind)
+
+        return [ (e ["value"], e ["time"]) for e in entries
+                    if e ["value"] and (now - e ["time"]) <= ttl
+        ]
+
+
+    def get (self, url, kind, with_time = False):
+        """
+        Gets a token from the cache (the newest one, if there are many), if it hasn't
+        expired yet
+
+        Args:
+            -> url: URL of the file where the bearer token is obtained
+
+            -> kind: Type of token: "bearer" or "guest"
+
+            -> with_time (optional): If True, also returns when the token was stored
+
+        Returns:
+            -> The token (or a tuple (token, UNIX epoch when it was stored), with
+                'with_time'), or None if it wasn't cached (or it has expired)
+        """
+        tokens = self.get_all (url, kind)
+        if not tokens:
+            return None
+
+        newest = max (tokens, key = lambda t: t [1])
+
+        return newest if with_time else newest [0]
+
+
+    def set (self, url, kind, value):
+        """
+        Stores a token on the cache file, replacing the ones of the same type
+
+        Args:
+            -> url: URL of the file where the bearer token is obtained
+
+            -> kind: Type of token: "bearer" or "guest"
+
+            -> value: The token to store
+        """
+        with self.lock:
+            data = self.load ()
+            data.setdefault (url, {})[kind] = { "value": value, "time": time.time () }
+
+            self.save (data)
+
+
+    def add (self, url, kind, value, keep = None):
+        """
+        Stores a token on the cache file, along with those of the same type that haven't
+        expired yet (like the guest tokens of a pool)
+
+        Args:
+            -> url: URL of the file where the bearer token is obtained
+
+            -> kind: Type of token: "bearer" or "guest"
+
+            -> value: The token to store
+
+            -> keep (optional): Maximum number of tokens of this type to keep (the
+                    oldest ones are removed)
+        """
+        ttl = self.ttl (kind)
+
+        with self.lock:
+            data = self.load ()
+            now = time.time ()
+
+            entries = [ e for e in self.entries (data, url, kind)
+                            if e ["value"] and e ["value"] != value
+                                and (now - e ["time"]) <= ttl
+            ]
+            entries.append ({ "value": value, "time": now })
+
+            if keep:
+                entries = entries [-keep:]
+
+            data.setdefault (url, {})[kind] = entries
+            self.save (data)
+
+
+    def save (self, data):
+        """
+        Writes the cache file. Must be called with 'lock' held
+
+        Args:
+            -> data: Contents of the cache file
+        """
+        logger = logging.getLogger (__name__ + ".save")
+
+        try:
+            directory = os.path.dirname (self.path) or "."
+            os.makedirs (directory, exist_ok = True)
+
+            # Writes to a temporary file and then replaces the old one, so other
+            # processes never read a half-written cache
+            fd, tmp_path = tempfile.mkstemp (dir = directory, suffix = ".tmp")
+            with os.fdopen (fd, "w") as out_file:
+                json.dump (data, out_file)
+
+            os.replace (tmp_path, self.path)
+
+        except Exception as e:
+            logger.warning ("Couldn't write token cache '" + self.path + "' => "
+                            + str (e)
+            )
+
+
+    def invalidate (self, url, kind, value = None):
+        """
+        Removes a token from the cache (for example, because the server rejected it)
+
+        Args:
+            -> url: URL of the file where the bearer token is obtained
+
+            -> kind: Type of token: "bearer" or "guest"
+
+            -> value (optional): The token to remove. By default, all the tokens of
+                    this type are removed
+        """
+        with self.lock:
+            data = self.load ()
+            entries = self.entries (data, url, kind)
+
+            remaining = [ e for e in entries if value is not None and e ["value"] != value ]
+            if len (remaining) == len (entries):
+                return
+
+            data [url][kind] = remaining
+            self.save (data)
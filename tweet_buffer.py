@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+List of tweets of a user, without duplicates and with a limited size.
+"""
+import time
+
+
+class TweetBuffer (list):
+    """
+    List with the tweets of a user, ordered from newest (index 0) to oldest by their ID
+    (which grows with time).
+
+    It's still a list, so it can be read (and serialized with json.dumps) as usual; but
+    it must be updated only with merge(), which:
+        - Keeps an index with the IDs, so adding a tweet already stored just updates it
+            (no duplicates), without looking through the whole list
+        - Removes the oldest tweets once there are more than 'max_count', or they're
+            older than 'max_age' seconds
+    """
+
+    def __init__ (self, tweets = (), max_count = None, max_age = None):
+        """
+        Args:
+            -> tweets (optional): Initial tweets, in any order
+
+            -> max_count (optional): Maximum number of tweets to keep
+
+            -> max_age (optional): Seconds after which a tweet is removed (by its
+                    'tweet_age')
+        """
+        super ().__init__ ()
+
+        self.max_count = max_count
+        self.max_age = max_age
+        self.index = {}
+
+        self.merge (tweets)
+
+
+    def __contains__ (self, item):
+        """
+        Checks if a tweet is on the list
+
+        Args:
+            -> item: The tweet, or its ID
+        """
+        if not isinstance (item, str):
+            item = item ["tweet_id"]
+
+        return item in self.index
+
+
+    def position (self, tweet_id):
+        """
+        Finds where a tweet is, or should be, on the list
+
+        Args:
+            -> tweet_id: ID of the tweet
+
+        Returns:
+            -> The index of the first tweet that isn't newer than the given one
+        """
+        key = int (tweet_id)
+        low, high = 0, len (self)
+
+        while low < high:
+            mid = (low + high) // 2
+            if int (self [mid]["tweet_id"]) > key:
+                low = mid + 1
+            else:
+                high = mid
+
+        return low
+
+
+    def merge (self, tweets):
+        """
+        Adds the given tweets, replacing those that were already stored
+
+        Args:
+            -> tweets: List with the tweets (usually, ordered from newest to oldest)
+
+        Returns:
+            -> A list with the tweets that weren't stored before
+        """
+        # By their ID, so a tweet repeated on the same batch (like on overlapping pages)
+        # is added only once, with its last copy
+        new_tweets = {}
+
+        for tweet in tweets:
+            tweet_id = tweet ["tweet_id"]
+
+            if tweet_id in self.index:
+                # Updated info (like the stats) of the same tweet
+                super ().__setitem__ (self.position (tweet_id), tweet)
+                self.index [tweet_id] = tweet
+            else:
+                new_tweets [tweet_id] = tweet
+
+        if not new_tweets:
+            return []
+
+        new_tweets = list (new_tweets.values ())
+        new_tweets.sort (key = lambda t: int (t ["tweet_id"]), reverse = True)
+
+        if not self or int (new_tweets [-1]["tweet_id"]) > int (self [0]["tweet_id"]):
+            # The usual case: all of them are newer than the stored ones
+            self [0:0] = new_tweets
+        elif int (new_tweets [0]["tweet_id"]) < int (self [-1]["tweet_id"]):
+            # Older pages
+            self.extend (new_tweets)
+        else:
+            for tweet in new_tweets:
+                self.insert (self.position (tweet ["tweet_id"]), tweet)
+
+        for tweet in new_tweets:
+            self.index [tweet ["tweet_id"]] = tweet
+
+        self.trim ()
+
+        return [ t for t in new_tweets if t ["tweet_id"] in self.index ]
+
+
+    def trim (self):
+        """
+        Removes the tweets over 'max_count' and those older than 'max_age'
+        """
+        end = len (self)
+
+        if self.max_count is not None:
+            end = min (end, self.max_count)
+
+        if self.max_age is not None:
+            threshold = time.time () - self.max_age
+
+            while end > 0 and self [end - 1]["tweet_age"] < threshold:
+                end -= 1
+
+        for tweet in self [end:]:
+            del self.index [tweet ["tweet_id"]]
+
+        del self [end:]
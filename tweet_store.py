@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent storage of the retrieved tweets and profiles, to keep them between runs.
+"""
+import json \
+    , threading
+
+from cache_files import connect
+from contextlib import contextmanager
+
+
+class TweetStore:
+    """
+    Stores the tweets and users' profiles on a SQLite database.
+
+    The tweets are stored with the format of Scraper.scraped_info (as JSON), along with
+    some of their fields on their own columns, to query them:
+        - tweet_id: Primary key. Adding a tweet already stored updates it
+        - screen_name: User from whose timeline the tweet was retrieved (the retweeter,
+            on a retweet)
+        - tweet_age, conversation: Indexed, to search by user and date or by
+            conversation
+
+    The profiles are stored with their cursors, so the polling can go on from where the
+    last run ended.
+    """
+
+    def __init__ (self, path):
+        """
+        Opens (and creates, if needed) the database.
+
+        Args:
+            -> path: Path of the SQLite database
+        """
+        self.path = path
+
+        # Held while using the connection. The transactions are handled manually (see
+        # batch())
+        self.lock = threading.RLock ()
+        self.db = connect (path, isolation_level = None)
+        self.depth = 0
+
+        with self.batch ():
+            self.db.execute ("CREATE TABLE IF NOT EXISTS tweets ("
+                            " tweet_id TEXT PRIMARY KEY"
+                            " , screen_name TEXT NOT NULL COLLATE NOCASE"
+                            " , tweet_age INTEGER NOT NULL"
+                            " , conversation TEXT"
+                            " , data TEXT NOT NULL"
+                            ")"
+            )
+            self.db.execute ("CREATE INDEX IF NOT EXISTS tweets_user_age"
+                            " ON tweets (screen_name, tweet_age)"
+            )
+            self.db.execute ("CREATE INDEX IF NOT EXISTS tweets_conversation"
+                            " ON tweets (conversation)"
+            )
+            self.db.execute ("CREATE TABLE IF NOT EXISTS profiles ("
+                            " screen_name TEXT PRIMARY KEY COLLATE NOCASE"
+                            " , data TEXT NOT NULL"
+                            ")"
+            )
+
+
+    @contextmanager
+    def batch (self):
+        """
+        Groups all the writes made inside the 'with' block (from any thread) on a single
+        transaction, which is much faster than one transaction per write. The blocks can
+        be nested: only the outermost one commits.
+        If the block raises an error, the transaction is rolled back; but if it's
+        interrupted (KeyboardInterrupt, a cancelled task...), the writes made until then
+        are committed.
+        """
+        with self.lock:
+            if self.depth == 0:
+                self.db.execute ("BEGIN")
+            self.depth += 1
+
+        try:
+            yield self
+
+        except Exception:
+            with self.lock:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.db.execute ("ROLLBACK")
+            raise
+
+        except BaseException:
+            with self.lock:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.db.execute ("COMMIT")
+            raise
+
+        else:
+            with self.lock:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.db.execute ("COMMIT")
+
+
+    def add_tweets (self, screen_name, tweets):
+        """
+        Stores the given tweets, or updates them if they were already stored
+
+        Args:
+            -> screen_name: User from whose timeline the tweets were retrieved
+
+            -> tweets: List with the tweets (dictionaries or model.Tweet)
+        """
+        rows = []
+        for t in tweets:
+            data = t if isinstance (t, dict) else t.to_dict ()
+            rows.append ((data ["tweet_id"]
+                        , screen_name
+                        , data ["tweet_age"]
+                        , data ["conversation"]
+                        , json.dumps (data)
+            ))
+
+        with self.lock, self.batch ():
+            self.db.executemany ("INSERT INTO tweets VALUES (?, ?, ?, ?, ?)"
+                                " ON CONFLICT (tweet_id) DO UPDATE SET"
+                                "   tweet_age = excluded.tweet_age"
+                                "   , conversation = excluded.conversation"
+                                "   , data = excluded.data"
+                                , rows
+            )
+
+
+    def add_profile (self, screen_name, profile):
+        """
+        Stores the profile of a user (with its cursors), or updates it
+
+        Args:
+            -> screen_name: The handler of the user
+
+            -> profile: Dictionary with the profile, as on Scraper.scraped_info. The
+                    tweets are not stored with it
+        """
+        data = { k: v for k, v in profile.items () if k != "tweets" }
+
+        with self.lock, self.batch ():
+            self.db.execute ("INSERT OR REPLACE INTO profiles VALUES (?, ?)"
+                            , (screen_name, json.dumps (data))
+            )
+
+
+    def get_profile (self, screen_name):
+        """
+        Gets the stored profile of a user
+
+        Args:
+            -> screen_name: The handler of the user
+
+        Returns:
+            -> A dictionary with the profile (and the cursors), or None if it wasn't
+                stored
+        """
+        with self.lock:
+            row = self.db.execute ("SELECT data FROM profiles WHERE screen_name = ?"
+                                    , (screen_name,)
+                ).fetchone ()
+
+        return json.loads (row [0]) if row else None
+
+
+    def get_tweets (self, screen_name, max_count = None, older_age = None
+                    , newer_age = None):
+        """
+        Gets the stored tweets from a user's timeline
+
+        Args:
+            -> screen_name: The handler of the user
+
+            -> max_count (optional): Maximum number of tweets to get (the newest ones)
+
+            -> older_age (optional): Age of the oldest tweets to get; in UNIX epoch
+                    format
+
+            -> newer_age (optional): Age of the newest tweets to get; in UNIX epoch
+                    format
+
+        Returns:
+            -> A list with the tweets, ordered from newest (index 0) to oldest
+        """
+        query = "SELECT data FROM tweets WHERE screen_name = ?"
+        params = [screen_name]
+
+        if older_age is not None:
+            query += " AND tweet_age >= ?"
+            params.append (older_age)
+
+        if newer_age is not None:
+            query += " AND tweet_age <= ?"
+            params.append (newer_age)
+
+        query += " ORDER BY tweet_age DESC"
+
+        if max_count:
+            query += " LIMIT ?"
+            params.append (max_count)
+
+        with self.lock:
+            rows = self.db.execute (query, params).fetchall ()
+
+        return [ json.loads (r [0]) for r in rows ]
+
+
+    def get_conversation (self, conversation):
+        """
+        Gets the stored tweets of a conversation
+
+        Args:
+            -> conversation: The conversation ID
+
+        Returns:
+            -> A list with the tweets, ordered from oldest (index 0) to newest
+        """
+        with self.lock:
+            rows = self.db.execute ("SELECT data FROM tweets WHERE conversation = ?"
+                                    " ORDER BY tweet_age"
+                                    , (str (conversation),)
+                ).fetchall ()
+
+        return [ json.loads (r [0]) for r in rows ]
+
+
+    def close (self):
+        """
+        Closes the database
+        """
+        with self.lock:
+            self.db.close ()